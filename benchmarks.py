@@ -0,0 +1,634 @@
+"""
+Benchmark Suite for React Steering Experiment
+Times the analysis hot paths on synthetic participant cohorts generated from the experiment's
+tunnel conditions and writes the results as JSON so runs can be compared for regressions
+Example usage:
+python benchmarks.py ./benchmark_results.json
+python benchmarks.py ./benchmark_results.json --scales 10 --compare ./baseline_results.json
+"""
+
+import argparse
+import ast
+import json
+import operator
+import os
+import platform
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import matplotlib
+from scipy.ndimage import gaussian_filter1d
+
+from participant_data import build_trial_index, group_trial_index, select_trial_references
+from plot_h1 import (calculate_tangential_acceleration, create_acceleration_frequency_heatmap,
+                     create_acceleration_magnitude_heatmap, create_trajectory_heatmap, is_point_in_tunnel,
+                     process_participant_data_for_heatmaps, process_trial_data_for_heatmaps)
+from speed_profiles import (apply_noise_filtering, apply_noise_filtering_batch, detect_speed_drops,
+                            detect_speed_drops_batch, prepare_speed_profile, prepare_speed_profiles)
+from summary_stats import process_summary_stats
+from trajectory_kinematics import store_tangential_accelerations
+from trajectory_store import ingest_participant_data, iter_store_participants, load_store
+from tunnel_geometry import TUNNEL_END_X, TUNNEL_START_X, cumulative_arc_length, get_tunnel_geometry
+
+
+EXPERIMENT_CONSTANTS = Path(__file__).resolve().parent / "src" / "constants" / "experimentConstants.js"
+BENCHMARK_FORMAT_VERSION = 1
+
+# Size of today's cohort (data/participants and data/participants-mar-26)
+BASELINE_PARTICIPANTS = 25
+DEFAULT_SCALES = (10, 100)
+
+# Synthetic movement model: ~50 ms sampling as recorded by the app and a steering-law
+# movement time T = a + b * path length / width, with per-trial log-normal variation
+SAMPLE_INTERVAL_MS = 50.0
+SAMPLE_JITTER_MS = 3.0
+REPEATED_SAMPLE_PROBABILITY = 0.05  # The app records the same position twice now and then
+MOVEMENT_TIME_INTERCEPT = 0.5  # seconds
+MOVEMENT_TIME_SLOPE = 0.07  # seconds per unit of path length / width
+MOVEMENT_TIME_SPREAD = 0.2  # sigma of the log-normal variation
+MIN_EFFECTIVE_WIDTH = 0.01
+LATERAL_SPREAD = 0.25  # Standard deviation of the lateral offset as a fraction of the width
+FILTER_TYPES = ('savgol', 'gaussian', 'butterworth', 'moving_average', 'median', 'adaptive')
+MIN_FILTER_SAMPLES = 12  # Padding of filtfilt for the default third-order Butterworth filter
+
+# Slowdown of a benchmark's median time, relative to the baseline, reported as a regression
+DEFAULT_REGRESSION_TOLERANCE = 0.2
+
+_ARITHMETIC_OPERATORS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+                         ast.Div: operator.truediv, ast.USub: operator.neg}
+
+
+def evaluate_constant_expression(expression, names):
+    """Evaluate a JavaScript literal or arithmetic expression of known constants.
+
+    Args:
+        expression (str): Expression text, e.g. "0.01", "'corner'", "null" or "4 * D / 6"
+        names (dict): Values of the constants the expression may refer to
+
+    Returns:
+        The value of the expression
+    """
+    expression = expression.strip()
+    if expression == 'null':
+        return None
+    if expression in ('true', 'false'):
+        return expression == 'true'
+
+    def evaluate(node):
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, ast.Name) and node.id in names:
+            return names[node.id]
+        if isinstance(node, ast.BinOp) and type(node.op) in _ARITHMETIC_OPERATORS:
+            return _ARITHMETIC_OPERATORS[type(node.op)](evaluate(node.left), evaluate(node.right))
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _ARITHMETIC_OPERATORS:
+            return _ARITHMETIC_OPERATORS[type(node.op)](evaluate(node.operand))
+        raise ValueError(f"Unsupported expression in experiment constants: {expression}")
+
+    return evaluate(ast.parse(expression, mode='eval').body)
+
+
+def load_experiment_conditions(constants_path=EXPERIMENT_CONSTANTS, name='BASIC_CONDITIONS'):
+    """Read a trial condition list from the experiment app's constants module.
+
+    Only the flat object literals used by the condition lists are understood: numbers,
+    strings, null and arithmetic on constants declared earlier in the file.
+
+    Args:
+        constants_path (str or Path): Path to experimentConstants.js
+        name (str): Name of the exported condition array
+
+    Returns:
+        list: Condition dicts in declaration order, including their 'id' field
+    """
+    source = Path(constants_path).read_text()
+    source = re.sub(r'//[^\n]*', '', source)  # Commented-out condition lists are ignored
+
+    names = {match.group(1): evaluate_constant_expression(match.group(2), {})
+             for match in re.finditer(r'^\s*(?:export\s+)?const\s+(\w+)\s*=\s*([-\d.]+)\s*;', source, re.MULTILINE)}
+
+    match = re.search(rf'export\s+const\s+{name}\s*=\s*\[(.*?)\];', source, re.DOTALL)
+    if match is None:
+        raise ValueError(f"{name} not found in {constants_path}")
+
+    conditions = []
+    for body in re.findall(r'\{(.*?)\}', match.group(1), re.DOTALL):
+        fields = re.findall(r'(\w+)\s*:\s*("[^"]*"|\'[^\']*\'|[^,]+)', body)
+        conditions.append({key: evaluate_constant_expression(value, names) for key, value in fields})
+    return conditions
+
+
+def synthetic_path(geometry):
+    """Path a synthetic participant follows from the start to the target.
+
+    Args:
+        geometry (dict): Geometry as returned by get_tunnel_geometry
+
+    Returns:
+        np.ndarray: (M, 2) polyline
+    """
+    centerline = np.asarray(geometry['centerline'])
+    if geometry['tunnel_type'] == 'constrained_to_unconstrained':
+        # Follow the corridor, then head straight for the target across the open half
+        corridor = centerline[centerline[:, 0] < (TUNNEL_START_X + TUNNEL_END_X) / 2]
+        return np.vstack([corridor, geometry['target']])
+    if len(centerline) < 2:
+        return np.vstack([geometry['start'], geometry['target']])
+    return centerline
+
+
+def synthesize_trial(condition, trial_id, round_number, participant_id, rng, start_time_ms=0):
+    """Generate one trial record shaped like the app's exports.
+
+    The cursor follows the tunnel centerline with a minimum-jerk progress profile, a few
+    random slow-downs and a smooth lateral wander scaled to the tunnel width.
+
+    Args:
+        condition (dict): Trial condition (without its 'id')
+        trial_id (int): Trial ID
+        round_number (int): Repetition number, starting at 1
+        participant_id (str): Participant ID
+        rng (np.random.Generator): Random number generator
+        start_time_ms (float): Timestamp of the first sample in milliseconds
+
+    Returns:
+        dict: Trial record with trajectory, timestamps, speeds, completionTime and condition
+    """
+    geometry = get_tunnel_geometry(condition)
+    path = synthetic_path(geometry)
+    arc_length = cumulative_arc_length(path)
+    path_length = arc_length[-1]
+
+    width = geometry['tunnel_width'] or 2 * condition.get('targetRadius', MIN_EFFECTIVE_WIDTH / 2)
+    width = max(width, MIN_EFFECTIVE_WIDTH)
+    movement_time = (MOVEMENT_TIME_INTERCEPT + MOVEMENT_TIME_SLOPE * path_length / width) \
+        * rng.lognormal(0.0, MOVEMENT_TIME_SPREAD)
+
+    intervals = np.maximum(rng.normal(SAMPLE_INTERVAL_MS, SAMPLE_JITTER_MS,
+                                      max(int(movement_time * 1000 / SAMPLE_INTERVAL_MS), 4)), 1.0)
+    elapsed = np.concatenate([[0.0], np.cumsum(intervals)])
+    tau = elapsed / elapsed[-1]
+
+    # Minimum-jerk velocity with a few Gaussian slow-downs, integrated into arc-length progress
+    velocity = 30 * tau ** 2 * (1 - tau) ** 2 + 1e-3
+    for center in rng.uniform(0.15, 0.85, rng.integers(0, 4)):
+        velocity *= 1 - rng.uniform(0.3, 0.8) * np.exp(-0.5 * ((tau - center) / 0.04) ** 2)
+    progress = np.concatenate([[0.0], np.cumsum((velocity[1:] + velocity[:-1]) / 2 * np.diff(tau))])
+    progress = progress / progress[-1] * path_length
+
+    points = np.column_stack([np.interp(progress, arc_length, path[:, 0]),
+                              np.interp(progress, arc_length, path[:, 1])])
+    tangents = np.gradient(points, axis=0)
+    norms = np.hypot(tangents[:, 0], tangents[:, 1])
+    normals = np.column_stack([-tangents[:, 1], tangents[:, 0]]) / np.where(norms > 0, norms, 1.0)[:, None]
+    wander = gaussian_filter1d(rng.normal(0.0, 1.0, len(points)), sigma=3.0, mode='nearest')
+    wander *= LATERAL_SPREAD * width / max(np.std(wander), 1e-9)
+    wander[[0, -1]] = 0.0
+    points += normals * wander[:, None]
+
+    repeated = np.flatnonzero(rng.random(len(points)) < REPEATED_SAMPLE_PROBABILITY)
+    points[repeated[repeated > 0]] = points[repeated[repeated > 0] - 1]
+
+    steps = np.hypot(*np.diff(points, axis=0).T)
+    speeds = np.concatenate([[0.0], steps / (intervals / 1000)])
+    timestamps = np.round(start_time_ms + elapsed).astype(np.int64)
+
+    return {
+        'condition': condition,
+        'completionTime': round(float(elapsed[-1]) / 1000, 3),
+        'timestamps': timestamps.tolist(),
+        'trajectory': [{'x': float(x), 'y': float(y)} for x, y in points],
+        'speeds': speeds.tolist(),
+        'participantId': participant_id,
+        'trial_id': trial_id,
+        'round': round_number,
+    }
+
+
+def synthesize_participant(participant_id, conditions, rng, repetitions=None):
+    """Generate a participant document with every repetition of every condition.
+
+    Target positions of pointing conditions rotate through top, middle and bottom across
+    repetitions, as the app assigns them at runtime.
+
+    Args:
+        participant_id (str): Participant ID
+        conditions (list): Conditions as returned by load_experiment_conditions
+        rng (np.random.Generator): Random number generator
+        repetitions (int): Repetitions per condition, or None to use each condition's own
+
+    Returns:
+        dict: Participant document in the layout written by extractParticipantData.js
+    """
+    trial_data = []
+    clock_ms = 1.77e12
+    for condition in conditions:
+        trial_condition = {key: value for key, value in condition.items() if key != 'id'}
+        for round_number in range(1, (repetitions or condition.get('repetitions') or 1) + 1):
+            if trial_condition.get('tunnelType') in ('unconstrained_pointing', 'constrained_to_unconstrained'):
+                trial_condition = dict(trial_condition,
+                                       targetPosition=('top', 'middle', 'bottom')[(round_number - 1) % 3])
+            trial = synthesize_trial(trial_condition, condition['id'], round_number, participant_id, rng, clock_ms)
+            clock_ms = trial['timestamps'][-1] + 1500
+            trial_data.append(trial)
+    return {'participantId': participant_id, 'totalSessions': 1,
+            'sessions': [{'documentId': f"synthetic-{participant_id}", 'trialData': trial_data}]}
+
+
+def generate_cohort(output_dir, num_participants, conditions, repetitions=None, seed=0):
+    """Write a synthetic cohort as one participant JSON file per participant.
+
+    Args:
+        output_dir (str or Path): Directory to write the participant files to
+        num_participants (int): Number of participants
+        conditions (list): Conditions as returned by load_experiment_conditions
+        repetitions (int): Repetitions per condition, or None to use each condition's own
+        seed (int): Seed of the random number generator; equal seeds give identical cohorts
+
+    Returns:
+        dict: Cohort size with keys participants, trials and samples
+    """
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    num_trials = num_samples = 0
+    for index in range(num_participants):
+        participant_id = f"S{index:05d}"
+        document = synthesize_participant(participant_id, conditions, rng, repetitions)
+        trials = document['sessions'][0]['trialData']
+        num_trials += len(trials)
+        num_samples += sum(len(trial['trajectory']) for trial in trials)
+        with open(output_path / f"participant_{participant_id}.json", 'w') as f:
+            json.dump(document, f)
+    return {'participants': num_participants, 'trials': num_trials, 'samples': num_samples}
+
+
+def time_call(func, repeat=5):
+    """Time repeated calls of a function.
+
+    Args:
+        func (callable): Function called without arguments
+        repeat (int): Number of timed calls
+
+    Returns:
+        dict: min, median and mean wall time in seconds, and the number of calls
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {'repeat': repeat, 'min_s': min(times), 'median_s': statistics.median(times),
+            'mean_s': statistics.fmean(times)}
+
+
+def benchmark_result(name, func, items, unit, repeat=5):
+    """Time a benchmark and report its per-item cost.
+
+    Args:
+        name (str): Benchmark name
+        func (callable): Function called without arguments
+        items (int): Number of items (points, trials, profiles) processed per call
+        unit (str): What an item is
+        repeat (int): Number of timed calls
+
+    Returns:
+        dict: Result record with name, items, unit, the timings of time_call and
+              per_item_us (median microseconds per item)
+    """
+    timing = time_call(func, repeat)
+    result = {'name': name, 'items': int(items), 'unit': unit, **timing,
+              'per_item_us': timing['median_s'] / max(items, 1) * 1e6}
+    print(f"{name:<48}{timing['median_s'] * 1000:>10.2f} ms{result['per_item_us']:>12.2f} us/{unit}")
+    return result
+
+
+def load_cohort_trials(json_dir):
+    """Load the trials of a cohort written by generate_cohort.
+
+    Args:
+        json_dir (str or Path): Directory of participant JSON files
+
+    Returns:
+        list: Participant documents with a top-level trialData list
+    """
+    documents = []
+    for json_file in sorted(Path(json_dir).glob("*.json")):
+        with open(json_file, 'r') as f:
+            document = json.load(f)
+        documents.append({'participantId': document['participantId'],
+                          'trialData': [trial for session in document['sessions'] for trial in session['trialData']]})
+    return documents
+
+
+def run_micro_benchmarks(documents, work_dir, repeat=5, heatmap_trial_id=3, tunnel_points=2000):
+    """Time the individual analysis functions on a synthetic cohort.
+
+    Args:
+        documents (list): Participant documents as returned by load_cohort_trials
+        work_dir (str or Path): Scratch directory for heatmap images
+        repeat (int): Number of timed calls per benchmark
+        heatmap_trial_id (int): Trial whose heatmaps are timed
+        tunnel_points (int): Number of samples classified by the scalar is_point_in_tunnel
+
+    Returns:
+        list: Result records as returned by benchmark_result
+    """
+    trials = [trial for document in documents for trial in document['trialData']]
+    trajectories = [np.array([(point['x'], point['y']) for point in trial['trajectory']]) for trial in trials]
+    speed_profiles = [np.asarray(trial['speeds'], dtype=float) for trial in trials]
+    num_samples = sum(len(trajectory) for trajectory in trajectories)
+    results = []
+
+    trial_index = build_trial_index(documents)
+    trial_groups = group_trial_index(trial_index)
+    heatmap_group = min(group for group in trial_groups if group[0] == heatmap_trial_id)
+    references = select_trial_references(trial_index, trial_groups[heatmap_group])
+    all_trajectories, all_accelerations, condition = process_trial_data_for_heatmaps(references, heatmap_trial_id)
+    geometry = get_tunnel_geometry(condition)
+    tunnel_path, tunnel_width = geometry['centerline'], geometry['tunnel_width']
+
+    points = np.concatenate(all_trajectories)[:tunnel_points]
+    results.append(benchmark_result(
+        'is_point_in_tunnel', lambda: [is_point_in_tunnel(x, y, tunnel_path, tunnel_width) for x, y in points],
+        len(points), 'point', repeat))
+
+    results.append(benchmark_result(
+        'calculate_tangential_acceleration',
+        lambda: [calculate_tangential_acceleration(trajectory, trial['timestamps'])
+                 for trajectory, trial in zip(trajectories, trials)],
+        num_samples, 'sample', repeat))
+
+    image_dir = Path(work_dir) / "micro_heatmaps"
+    image_dir.mkdir(parents=True, exist_ok=True)
+    results.append(benchmark_result(
+        'create_trajectory_heatmap',
+        lambda: create_trajectory_heatmap(all_trajectories, tunnel_path, tunnel_width,
+                                          save_path=str(image_dir / "trajectory.png"), geometry=geometry),
+        1, 'image', repeat))
+    results.append(benchmark_result(
+        'create_acceleration_frequency_heatmap',
+        lambda: create_acceleration_frequency_heatmap(all_trajectories, all_accelerations, tunnel_path, tunnel_width,
+                                                      save_path=str(image_dir / "frequency.png"),
+                                                      geometry=geometry),
+        1, 'image', repeat))
+    results.append(benchmark_result(
+        'create_acceleration_magnitude_heatmap',
+        lambda: create_acceleration_magnitude_heatmap(all_trajectories, all_accelerations, tunnel_path, tunnel_width,
+                                                      save_path=str(image_dir / "magnitude.png"),
+                                                      geometry=geometry),
+        1, 'image', repeat))
+
+    # filtfilt needs more samples than its padding, so very short profiles are left out
+    filterable_profiles = [speeds for speeds in speed_profiles if len(speeds) > MIN_FILTER_SAMPLES]
+    for filter_type in FILTER_TYPES:
+        results.append(benchmark_result(
+            f'apply_noise_filtering[{filter_type}]',
+            lambda filter_type=filter_type: [apply_noise_filtering(speeds, filter_type)
+                                             for speeds in filterable_profiles],
+            len(filterable_profiles), 'profile', repeat))
+        results.append(benchmark_result(
+            f'apply_noise_filtering_batch[{filter_type}]',
+            lambda filter_type=filter_type: apply_noise_filtering_batch(filterable_profiles, filter_type),
+            len(filterable_profiles), 'profile', repeat))
+
+    filtered_profiles = [prepare_speed_profile(speeds, 'savgol')[2] for speeds in speed_profiles]
+    results.append(benchmark_result(
+        'detect_speed_drops', lambda: [detect_speed_drops(speeds) for speeds in filtered_profiles],
+        len(filtered_profiles), 'profile', repeat))
+    results.append(benchmark_result(
+        'detect_speed_drops_batch', lambda: detect_speed_drops_batch(filtered_profiles),
+        len(filtered_profiles), 'profile', repeat))
+    return results
+
+
+def analyze_store_speed_drops(store_dir, filter_type='savgol'):
+    """Filter every speed profile of a store and detect its speed drops.
+
+    Args:
+        store_dir (str or Path): Trajectory store directory
+        filter_type (str): Noise filter applied before detection
+
+    Returns:
+        int: Number of speed drops found
+    """
+    profiles = [filtered_speeds for _, _, filtered_speeds in prepare_speed_profiles(
+        [trial['speeds'] for document in iter_store_participants(load_store(store_dir))
+         for trial in document['trialData']], filter_type)]
+    return sum(len(drops) for drops, _ in detect_speed_drops_batch(profiles))
+
+
+def run_end_to_end(num_participants, conditions, work_dir, seed=0, jobs=1, plots=True):
+    """Generate a cohort and time each analysis stage on it.
+
+    Stages: ingest (JSON files into a trajectory store), accelerations (tangential
+    accelerations of every sample), heatmaps (plot_h1 over the store, skipped without plots),
+    stats (per-participant summaries) and speed_drops (filtering and drop detection of every
+    speed profile). Generating the cohort is timed separately and not part of the total.
+
+    Args:
+        num_participants (int): Number of synthetic participants
+        conditions (list): Conditions as returned by load_experiment_conditions
+        work_dir (str or Path): Scratch directory, emptied afterwards
+        seed (int): Seed of the cohort generator
+        jobs (int): Worker processes for the heatmap stage
+        plots (bool): Include the heatmap stage
+
+    Returns:
+        dict: Record with participants, trials, samples, generate_s, stages (seconds per stage)
+              and total_s
+    """
+    work_path = Path(work_dir) / f"cohort_{num_participants}"
+    json_dir, store_dir = work_path / "json", work_path / "store"
+    print(f"\nEnd-to-end run with {num_participants} participants")
+
+    start = time.perf_counter()
+    record = generate_cohort(json_dir, num_participants, conditions, seed=seed)
+    record['generate_s'] = time.perf_counter() - start
+    print(f"Generated {record['trials']} trials ({record['samples']} samples) in {record['generate_s']:.1f} s")
+
+    stages = [
+        ('ingest', lambda: ingest_participant_data([json_dir], store_dir)),
+        ('accelerations', lambda: store_tangential_accelerations(load_store(store_dir))),
+        ('heatmaps', lambda: process_participant_data_for_heatmaps(store_dir, work_path / "heatmaps",
+                                                                   cache_dir=work_path / "cache", jobs=jobs,
+                                                                   force=True)),
+        ('stats', lambda: process_summary_stats(store_dir, work_path / "stats")),
+        ('speed_drops', lambda: analyze_store_speed_drops(store_dir)),
+    ]
+    record['stages'] = {}
+    for name, stage in stages:
+        if name == 'heatmaps' and not plots:
+            continue
+        record['stages'][name] = time_call(stage, repeat=1)['min_s']
+    record['total_s'] = sum(record['stages'].values())
+
+    shutil.rmtree(work_path, ignore_errors=True)
+    for name, seconds in record['stages'].items():
+        print(f"  {name:<16}{seconds:>10.2f} s")
+    return record
+
+
+def environment_info():
+    """Describe the interpreter and libraries a benchmark ran with.
+
+    Returns:
+        dict: Platform, Python, NumPy, SciPy and matplotlib versions and the CPU count
+    """
+    import scipy
+    return {'platform': platform.platform(), 'python': platform.python_version(), 'numpy': np.__version__,
+            'scipy': scipy.__version__, 'matplotlib': matplotlib.__version__, 'cpu_count': os.cpu_count()}
+
+
+def compare_results(baseline, current, tolerance=DEFAULT_REGRESSION_TOLERANCE):
+    """Compare two benchmark result files and list the benchmarks that got slower.
+
+    Micro-benchmarks are compared by median time and end-to-end stages by wall time, matched
+    by name and, for end-to-end runs, by cohort size.
+
+    Args:
+        baseline (dict): Earlier results as written by run_benchmarks
+        current (dict): New results
+        tolerance (float): Allowed relative slowdown before a benchmark counts as a regression
+
+    Returns:
+        list: (name, baseline seconds, current seconds) for every regression
+    """
+    def timings(results):
+        found = {result['name']: result['median_s'] for result in results.get('micro', [])}
+        for run in results.get('end_to_end', []):
+            for stage, seconds in run['stages'].items():
+                found[f"end_to_end[{run['participants']}].{stage}"] = seconds
+        return found
+
+    baseline_times, current_times = timings(baseline), timings(current)
+    regressions = []
+    print(f"\n{'benchmark':<48}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for name, seconds in current_times.items():
+        if name not in baseline_times:
+            continue
+        ratio = seconds / baseline_times[name] if baseline_times[name] > 0 else float('inf')
+        flag = ''
+        if ratio > 1 + tolerance:
+            regressions.append((name, baseline_times[name], seconds))
+            flag = '  <- slower'
+        print(f"{name:<48}{baseline_times[name]:>12.4f}{seconds:>12.4f}{ratio:>8.2f}{flag}")
+    return regressions
+
+
+def run_benchmarks(output_file, scales=DEFAULT_SCALES, base_participants=BASELINE_PARTICIPANTS,
+                   micro_participants=BASELINE_PARTICIPANTS, repeat=5, seed=0, jobs=1, plots=True,
+                   micro=True, work_dir=None):
+    """Run the micro-benchmarks and end-to-end runs and write the results as JSON.
+
+    Args:
+        output_file (str or Path): JSON file to write
+        scales (iterable): Cohort sizes of the end-to-end runs, as multiples of base_participants
+        base_participants (int): Participants in today's cohort
+        micro_participants (int): Participants in the cohort used by the micro-benchmarks
+        repeat (int): Number of timed calls per micro-benchmark
+        seed (int): Seed of the cohort generator
+        jobs (int): Worker processes for the end-to-end heatmap stage
+        plots (bool): Include the heatmap stage in end-to-end runs
+        micro (bool): Run the micro-benchmarks
+        work_dir (str or Path): Scratch directory, or None for a temporary directory
+
+    Returns:
+        dict: The results written to output_file
+    """
+    matplotlib.use('Agg', force=True)
+    conditions = load_experiment_conditions()
+    scratch = Path(tempfile.mkdtemp(prefix="steering_benchmark_", dir=work_dir))
+    results = {
+        'version': BENCHMARK_FORMAT_VERSION,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': environment_info(),
+        'config': {'scales': list(scales), 'base_participants': base_participants,
+                   'micro_participants': micro_participants, 'repeat': repeat, 'seed': seed, 'jobs': jobs,
+                   'plots': plots, 'conditions': len(conditions)},
+        'micro': [],
+        'end_to_end': [],
+    }
+
+    try:
+        if micro:
+            micro_dir = scratch / "micro"
+            cohort = generate_cohort(micro_dir / "json", micro_participants, conditions, seed=seed)
+            print(f"Micro-benchmarks on {cohort['participants']} participants, {cohort['trials']} trials, "
+                  f"{cohort['samples']} samples")
+            print("-" * 50)
+            results['micro_cohort'] = cohort
+            results['micro'] = run_micro_benchmarks(load_cohort_trials(micro_dir / "json"), micro_dir, repeat)
+
+        for scale in scales:
+            record = run_end_to_end(int(round(scale * base_participants)), conditions, scratch,
+                                    seed=seed, jobs=jobs, plots=plots)
+            record['scale'] = scale
+            results['end_to_end'].append(record)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    output_path = Path(output_file)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nBenchmark results saved to {output_path}")
+    return results
+
+
+def main(argv=None, prog=None):
+    """Main function to run the benchmark suite from the command line.
+
+    Args:
+        argv (list): Command line arguments, or None to read sys.argv
+        prog (str): Program name shown in the usage message
+    """
+    parser = argparse.ArgumentParser(prog=prog, description='Benchmark the steering analysis on synthetic cohorts')
+    parser.add_argument('output_file', help='JSON file to write the results to')
+    parser.add_argument('--scales', type=float, nargs='*', default=list(DEFAULT_SCALES),
+                        help="End-to-end cohort sizes as multiples of today's cohort (default: 10 100; none skips them)")
+    parser.add_argument('--base-participants', type=int, default=BASELINE_PARTICIPANTS,
+                        help=f"Participants in today's cohort (default: {BASELINE_PARTICIPANTS})")
+    parser.add_argument('--micro-participants', type=int, default=BASELINE_PARTICIPANTS,
+                        help=f'Participants in the micro-benchmark cohort (default: {BASELINE_PARTICIPANTS})')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Timed calls per micro-benchmark (default: 5)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the synthetic cohort generator (default: 0)')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Worker processes for the end-to-end heatmap stage (default: 1, 0 uses every CPU)')
+    parser.add_argument('--no-plots', action='store_true',
+                        help='Leave the heatmap stage out of the end-to-end runs')
+    parser.add_argument('--no-micro', action='store_true',
+                        help='Skip the micro-benchmarks')
+    parser.add_argument('--work-dir', type=str, default=None,
+                        help='Directory for the synthetic cohorts (default: system temporary directory)')
+    parser.add_argument('--compare', type=str, default=None,
+                        help='Earlier results file; exits with status 1 if any benchmark is slower than the tolerance')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_REGRESSION_TOLERANCE,
+                        help='Relative slowdown reported as a regression (default: 0.2)')
+
+    args = parser.parse_args(argv)
+    results = run_benchmarks(args.output_file, scales=args.scales, base_participants=args.base_participants,
+                             micro_participants=args.micro_participants, repeat=args.repeat, seed=args.seed,
+                             jobs=args.jobs, plots=not args.no_plots, micro=not args.no_micro,
+                             work_dir=args.work_dir)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline, results, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than the baseline by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
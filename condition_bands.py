@@ -0,0 +1,351 @@
+"""
+Condition Bands for React Steering Experiment
+Streams all participants once and accumulates, per trial condition, the mean lateral offset and the mean and
+percentile speed along the tunnel centerline, then plots them over the tunnel
+Example usage:
+python condition_bands.py ./trajectory_store/ ./results/bands/
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+from matplotlib import pyplot as plt
+
+from participant_data import condition_key, find_json_files, get_trial_id, iter_participant_documents
+from trajectory_kinematics import offsets_from_lengths
+from trajectory_resampling import DEFAULT_ARC_SAMPLES, reference_path, resample_condition, sample_times
+from trajectory_store import build_columns, is_trajectory_store, iter_store_participants, load_store
+from tunnel_geometry import cumulative_arc_length, draw_tunnel_geometry, get_tunnel_geometry
+
+
+PERCENTILES = (10, 25, 50, 75, 90)
+CONFIDENCE_Z = 1.96  # 95% confidence interval of the mean
+
+# Speed histograms behind the percentiles: fixed bins keep memory independent of the cohort size;
+# faster samples are counted in the last bin
+SPEED_BIN_WIDTH = 0.01  # m/s
+MAX_BINNED_SPEED = 2.0  # m/s
+
+
+def new_running_moments(size):
+    """Create Welford accumulators for the mean and variance at each grid point.
+
+    Args:
+        size (int): Number of grid points
+
+    Returns:
+        dict: count, mean and m2 (sum of squared deviations from the mean) arrays
+    """
+    return {'count': np.zeros(size, dtype=np.int64), 'mean': np.zeros(size), 'm2': np.zeros(size)}
+
+
+def update_running_moments(moments, values):
+    """Fold a batch of trials into running moments, skipping NaN entries.
+
+    Uses the pairwise form of Welford's update (Chan et al.), so a whole batch is merged in
+    one step with the same result as adding its values one at a time.
+
+    Args:
+        moments (dict): Accumulators as returned by new_running_moments, updated in place
+        values (np.ndarray): (trials, grid points) batch
+    """
+    present = np.isfinite(values)
+    batch_count = present.sum(axis=0)
+    merge = batch_count > 0
+    if not np.any(merge):
+        return
+    batch_sum = np.where(present, values, 0.0).sum(axis=0)
+    batch_mean = np.divide(batch_sum, batch_count, out=np.zeros(len(batch_count)), where=merge)
+    batch_m2 = np.where(present, values - batch_mean, 0.0)
+    batch_m2 = np.einsum('ij,ij->j', batch_m2, batch_m2)
+
+    count = moments['count'] + batch_count
+    delta = batch_mean - moments['mean']
+    moments['mean'][merge] += delta[merge] * batch_count[merge] / count[merge]
+    moments['m2'][merge] += (batch_m2[merge]
+                             + delta[merge] ** 2 * moments['count'][merge] * batch_count[merge] / count[merge])
+    moments['count'] = count
+
+
+def finish_running_moments(moments):
+    """Turn running moments into means with confidence intervals.
+
+    Args:
+        moments (dict): Accumulators as returned by new_running_moments
+
+    Returns:
+        dict: count, mean, std (sample standard deviation) and ci_low / ci_high (CONFIDENCE_Z
+              standard errors around the mean); NaN where fewer than two trials contribute
+    """
+    count = moments['count']
+    enough = count >= 2
+    mean = np.where(count > 0, moments['mean'], np.nan)
+    std = np.full(len(count), np.nan)
+    std[enough] = np.sqrt(moments['m2'][enough] / (count[enough] - 1))
+    half_width = CONFIDENCE_Z * std / np.sqrt(np.maximum(count, 1))
+    return {'count': count, 'mean': mean, 'std': std, 'ci_low': mean - half_width, 'ci_high': mean + half_width}
+
+
+def histogram_percentiles(histogram, bin_edges, percentiles=PERCENTILES):
+    """Percentiles at each grid point from per-point histograms, interpolating within bins.
+
+    Args:
+        histogram (np.ndarray): (grid points, bins) sample counts
+        bin_edges (np.ndarray): (bins + 1,) bin edges
+        percentiles (tuple): Percentiles to compute (0-100)
+
+    Returns:
+        np.ndarray: (len(percentiles), grid points) values; NaN where a grid point has no samples
+    """
+    cumulative = np.cumsum(histogram, axis=1)
+    totals = cumulative[:, -1]
+    result = np.full((len(percentiles), len(histogram)), np.nan)
+    points = np.flatnonzero(totals > 0)
+    for k, percentile in enumerate(percentiles):
+        rank = totals[points] * percentile / 100.0
+        # First bin whose cumulative count reaches the rank
+        bins = np.minimum((cumulative[points] < rank[:, None]).sum(axis=1), histogram.shape[1] - 1)
+        below = np.where(bins > 0, cumulative[points, np.maximum(bins - 1, 0)], 0)
+        in_bin = histogram[points, bins]
+        fraction = np.divide(rank - below, in_bin, out=np.zeros(len(points)), where=in_bin > 0)
+        result[k, points] = bin_edges[bins] + np.clip(fraction, 0.0, 1.0) * (bin_edges[bins + 1] - bin_edges[bins])
+    return result
+
+
+def new_band_accumulator(condition, arc_samples=DEFAULT_ARC_SAMPLES):
+    """Create the accumulators of one trial condition.
+
+    Args:
+        condition (dict): Trial condition, which fixes the centerline and arc-length grid
+        arc_samples (int): Grid points along the centerline
+
+    Returns:
+        dict: condition, geometry, trials (count), speed and lateral_offset running moments,
+              and speed_histogram (arc_samples, bins) with its speed_bin_edges
+    """
+    bin_edges = np.arange(0.0, MAX_BINNED_SPEED + SPEED_BIN_WIDTH / 2, SPEED_BIN_WIDTH)
+    return {
+        'condition': condition,
+        'geometry': get_tunnel_geometry(condition),
+        'arc_samples': arc_samples,
+        'trials': 0,
+        'speed': new_running_moments(arc_samples),
+        'lateral_offset': new_running_moments(arc_samples),
+        'speed_histogram': np.zeros((arc_samples, len(bin_edges) - 1), dtype=np.int64),
+        'speed_bin_edges': bin_edges,
+    }
+
+
+def update_band_accumulator(accumulator, arc_speed, arc_lateral_offset):
+    """Fold arc-length resampled trials into a condition's accumulators.
+
+    Args:
+        accumulator (dict): Accumulator as returned by new_band_accumulator, updated in place
+        arc_speed (np.ndarray): (trials, arc_samples) speeds, NaN where a trial has no sample
+        arc_lateral_offset (np.ndarray): (trials, arc_samples) signed lateral offsets
+    """
+    accumulator['trials'] += len(arc_speed)
+    update_running_moments(accumulator['speed'], arc_speed)
+    update_running_moments(accumulator['lateral_offset'], arc_lateral_offset)
+
+    rows, points = np.nonzero(np.isfinite(arc_speed))
+    num_bins = accumulator['speed_histogram'].shape[1]
+    bins = np.clip((arc_speed[rows, points] / SPEED_BIN_WIDTH).astype(np.int64), 0, num_bins - 1)
+    np.add.at(accumulator['speed_histogram'], (points, bins), 1)
+
+
+def accumulate_participant(accumulators, document, arc_samples=DEFAULT_ARC_SAMPLES):
+    """Resample one participant's trials and fold them into the per-condition accumulators.
+
+    Trials are grouped by trial ID and condition, like the trial index of the heatmaps, so every
+    round of a trial is aggregated while trial IDs reused by other app versions stay separate.
+
+    Args:
+        accumulators (dict): Mapping of (trial ID, condition key) to accumulator, updated in place
+        document (dict): Participant document with a trialData list
+        arc_samples (int): Grid points along the centerline of new conditions
+    """
+    columns = build_columns([document])
+    offsets = columns['offsets']
+    times = sample_times(columns)
+    groups = {}
+    for i, trial in enumerate(document.get('trialData', [])):
+        trial_id = get_trial_id(trial)
+        if trial_id is not None:
+            groups.setdefault((trial_id, condition_key(trial.get('condition', {}))), []).append(i)
+
+    for key, trials in groups.items():
+        if key not in accumulators:
+            condition = columns['conditions'][int(columns['condition'][trials[0]])]
+            accumulators[key] = new_band_accumulator(condition, arc_samples)
+        accumulator = accumulators[key]
+
+        samples = np.concatenate([np.arange(offsets[i], offsets[i + 1]) for i in trials])
+        resampled = resample_condition(columns['xy'][samples], times[samples],
+                                       offsets_from_lengths(np.diff(offsets)[trials]), accumulator['geometry'],
+                                       time_samples=2, arc_samples=accumulator['arc_samples'])
+        update_band_accumulator(accumulator, resampled['arc_speed'], resampled['arc_lateral_offset'])
+
+
+def finish_band_accumulator(accumulator):
+    """Compute the bands of one condition from its accumulators.
+
+    Args:
+        accumulator (dict): Accumulator as returned by new_band_accumulator
+
+    Returns:
+        dict: arc_grid (meters along the centerline), trials, per-point count, speed_mean,
+              speed_std, speed_ci_low/high, speed_p<N> for each of PERCENTILES,
+              lateral_offset_mean, lateral_offset_std and lateral_offset_ci_low/high
+    """
+    path = reference_path(accumulator['geometry'])
+    bands = {
+        'arc_grid': np.linspace(0.0, cumulative_arc_length(path)[-1], accumulator['arc_samples']),
+        'trials': accumulator['trials'],
+    }
+    for quantity in ('speed', 'lateral_offset'):
+        for name, values in finish_running_moments(accumulator[quantity]).items():
+            if name == 'count':
+                bands['count'] = values
+            else:
+                bands[f'{quantity}_{name}'] = values
+    speed_percentiles = histogram_percentiles(accumulator['speed_histogram'], accumulator['speed_bin_edges'])
+    for percentile, values in zip(PERCENTILES, speed_percentiles):
+        bands[f'speed_p{percentile}'] = values
+    return bands
+
+
+def offset_path(path, arc_grid, lateral_offsets):
+    """Positions at given arc lengths along a path, shifted sideways by lateral offsets.
+
+    Args:
+        path (np.ndarray): (M, 2) reference path
+        arc_grid (np.ndarray): (K,) arc lengths along the path
+        lateral_offsets (np.ndarray): (K,) offsets along the path normal (-tangent_y, tangent_x)
+
+    Returns:
+        np.ndarray: (K, 2) positions
+    """
+    arc_length = cumulative_arc_length(path)
+    segments = np.clip(np.searchsorted(arc_length, arc_grid, side='right') - 1, 0, len(path) - 2)
+    directions = path[segments + 1] - path[segments]
+    segment_lengths = np.hypot(directions[:, 0], directions[:, 1])
+    along = np.divide(arc_grid - arc_length[segments], segment_lengths, out=np.zeros(len(arc_grid)),
+                      where=segment_lengths > 0)
+    directions /= np.where(segment_lengths > 0, segment_lengths, 1.0)[:, None]
+    normals = np.column_stack([-directions[:, 1], directions[:, 0]])
+    points = path[segments] + along[:, None] * directions * segment_lengths[:, None]
+    return points + lateral_offsets[:, None] * normals
+
+
+def plot_condition_bands(bands, geometry, save_path, title):
+    """Plot the mean trajectory over the tunnel above the speed bands along the centerline.
+
+    Args:
+        bands (dict): Bands as returned by finish_band_accumulator
+        geometry (dict): Tunnel geometry of the condition
+        save_path (str or Path): Path to save image file
+        title (str): Figure title
+    """
+    path = reference_path(geometry)
+    arc_grid = bands['arc_grid']
+    fig, (ax_path, ax_speed) = plt.subplots(2, 1, figsize=(10, 9), gridspec_kw={'height_ratios': [1.2, 1]})
+
+    draw_tunnel_geometry(ax_path, geometry)
+    for bound, style in (('lateral_offset_ci_low', '--'), ('lateral_offset_ci_high', '--')):
+        band_points = offset_path(path, arc_grid, bands[bound])
+        ax_path.plot(band_points[:, 0], band_points[:, 1], color='tab:blue', linestyle=style, linewidth=0.8)
+    mean_points = offset_path(path, arc_grid, bands['lateral_offset_mean'])
+    ax_path.plot(mean_points[:, 0], mean_points[:, 1], color='tab:blue', linewidth=1.5,
+                 label=f"Mean trajectory ({CONFIDENCE_Z:g}-SE band)")
+    ax_path.set_aspect('equal')
+    ax_path.set_xlabel("X Position (m)")
+    ax_path.set_ylabel("Y Position (m)")
+    ax_path.invert_yaxis()  # Screen coordinates, as in the trajectory plots
+    ax_path.legend(loc='upper right', fontsize=8)
+
+    ax_speed.fill_between(arc_grid, bands['speed_p10'], bands['speed_p90'], color='lightgray', label="10th-90th percentile")
+    ax_speed.fill_between(arc_grid, bands['speed_p25'], bands['speed_p75'], color='darkgray', label="25th-75th percentile")
+    ax_speed.plot(arc_grid, bands['speed_p50'], color='black', linewidth=1, linestyle='--', label="Median")
+    ax_speed.fill_between(arc_grid, bands['speed_ci_low'], bands['speed_ci_high'], color='tab:red', alpha=0.3)
+    ax_speed.plot(arc_grid, bands['speed_mean'], color='tab:red', linewidth=1.5,
+                  label=f"Mean ({CONFIDENCE_Z:g}-SE band)")
+    ax_speed.set_xlabel("Distance along centerline (m)")
+    ax_speed.set_ylabel("Speed (m/s)")
+    ax_speed.set_xlim(arc_grid[0], arc_grid[-1])
+    ax_speed.grid(True, alpha=0.3)
+    ax_speed.legend(loc='upper right', fontsize=8)
+
+    fig.suptitle(title)
+    fig.tight_layout()
+    fig.savefig(save_path, dpi=150, bbox_inches='tight')
+    plt.close(fig)
+
+
+def write_condition_bands(accumulators, output_dir, plots=True):
+    """Write the bands of every trial as .npz arrays and overlay plots, plus a JSON index.
+
+    Args:
+        accumulators (dict): Mapping of (trial ID, condition key) to accumulator
+        output_dir (str or Path): Directory to write to
+        plots (bool): Also draw the overlay plots
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    index = []
+    names = {}
+    for trial_id, condition_json in sorted(accumulators):
+        accumulator = accumulators[(trial_id, condition_json)]
+        bands = finish_band_accumulator(accumulator)
+        # Further conditions sharing a trial ID get a numbered name, in condition key order so
+        # names do not depend on which participant showed a condition first
+        names[trial_id] = names.get(trial_id, -1) + 1
+        stem = f"bands_trial_{trial_id}" + (f"_{names[trial_id]}" if names[trial_id] else "")
+        np.savez_compressed(output_dir / f"{stem}.npz", **bands)
+        if plots:
+            description = accumulator['condition'].get('description', 'Unknown condition')
+            plot_condition_bands(bands, accumulator['geometry'], output_dir / f"{stem}.png",
+                                 f"Trial {trial_id}: {description} - Mean Trajectory and Speed ({bands['trials']} trials)")
+        index.append({'trial_id': trial_id, 'trials': bands['trials'], 'condition': accumulator['condition'],
+                      'file': f"{stem}.npz"})
+    with open(output_dir / "index.json", 'w') as f:
+        json.dump(index, f, indent=2)
+
+
+def main(argv=None, prog=None):
+    """Main function to compute condition bands from the command line.
+
+    Args:
+        argv (list): Command line arguments, or None to read sys.argv
+        prog (str): Program name shown in the help, or None for the script name
+    """
+    parser = argparse.ArgumentParser(prog=prog, description='Mean trajectory and speed bands per trial condition')
+    parser.add_argument('input_dir', help='Directory containing participant JSON data files, or a trajectory store')
+    parser.add_argument('output_dir', help='Directory to write the bands and plots to')
+    parser.add_argument('--arc-samples', type=int, default=DEFAULT_ARC_SAMPLES,
+                        help=f'Grid points along each centerline (default: {DEFAULT_ARC_SAMPLES})')
+    parser.add_argument('--no-plots', action='store_true', help='Only write the arrays')
+
+    args = parser.parse_args(argv)
+
+    input_path = Path(args.input_dir)
+    if is_trajectory_store(input_path):
+        documents = iter_store_participants(load_store(input_path))
+    else:
+        documents = (document for document, _ in iter_participant_documents(find_json_files([input_path])))
+
+    # One pass over the participants; only the per-condition accumulators are kept
+    accumulators = {}
+    num_participants = 0
+    for document in documents:
+        accumulate_participant(accumulators, document, args.arc_samples)
+        num_participants += 1
+
+    write_condition_bands(accumulators, args.output_dir, plots=not args.no_plots)
+    print(f"Bands of {len(accumulators)} trial conditions from {num_participants} participants saved to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
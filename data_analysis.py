@@ -0,0 +1,139 @@
+"""
+Analysis Command Line for React Steering Experiment
+Single entry point for the analysis scripts; each subcommand imports only the modules it needs
+Example usage:
+python data_analysis.py trajectories ./participant_data/ ./results/
+python data_analysis.py stats ./trajectory_store/ ./results/
+"""
+
+import argparse
+import importlib
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+# Subcommand -> (module providing main(argv, prog), description); modules load only when run
+COMMANDS = {
+    'heatmaps': ('plot_h1', 'Trajectory and acceleration heatmaps for every trial'),
+    'trajectories': ('plot_trajectories', 'Trajectory and speed profile plots for every participant'),
+    'stats': ('summary_stats', 'Per-participant summary statistics, without plotting libraries'),
+    'ingest': ('trajectory_store', 'Ingest JSON exports into a memory-mapped trajectory store'),
+    'resample': ('trajectory_resampling', 'Resample trials onto uniform time and arc-length grids per condition'),
+    'bands': ('condition_bands', 'Mean trajectory and speed bands per trial condition'),
+    'sweep': ('speed_drop_sweep', 'Speed drop counts and locations over a grid of detection parameters'),
+    'benchmark': ('benchmarks', 'Time the analysis hot paths on synthetic cohorts'),
+}
+
+# Seconds allowed for "<command> --help", including interpreter startup
+STARTUP_BUDGETS = {
+    None: 0.3,
+    'heatmaps': 3.0,
+    'trajectories': 3.0,
+    'stats': 0.5,
+    'ingest': 0.5,
+    'resample': 0.5,
+    'bands': 3.0,
+    'sweep': 0.5,
+    'benchmark': 3.5,
+}
+
+STARTUP_REPEAT = 3
+
+# Subcommands that must run without importing matplotlib
+PLOT_FREE_COMMANDS = ('stats', 'ingest', 'resample', 'sweep')
+
+
+def build_parser():
+    """Build the top-level parser; subcommand options are parsed by the subcommand itself.
+
+    Returns:
+        argparse.ArgumentParser: Parser with one subparser per command
+    """
+    parser = argparse.ArgumentParser(description='Analyze React steering experiment data',
+                                     epilog="Run '%(prog)s <command> --help' for the options of a command.")
+    parser.add_argument('--check-startup', action='store_true',
+                        help='Time the startup of every command against its budget and exit')
+    subparsers = parser.add_subparsers(dest='command', metavar='command')
+    for name, (_, description) in COMMANDS.items():
+        subparsers.add_parser(name, help=description, add_help=False)
+    return parser
+
+
+def measure_startup(command=None, repeat=STARTUP_REPEAT):
+    """Time "<command> --help" in a fresh interpreter.
+
+    Args:
+        command (str): Subcommand to start, or None for the top-level help
+        repeat (int): Number of runs; the fastest is reported, as the others only add noise
+
+    Returns:
+        dict: seconds (wall time of the whole process) and modules (heavy modules it imported)
+    """
+    argv = ([command] if command else []) + ['--help']
+    probe = (
+        "import contextlib, io, json, sys\n"
+        f"sys.path.insert(0, {str(Path(__file__).resolve().parent)!r})\n"
+        "import data_analysis\n"
+        "with contextlib.redirect_stdout(io.StringIO()):\n"
+        "    try:\n"
+        f"        data_analysis.main({argv!r})\n"
+        "    except SystemExit:\n"
+        "        pass\n"
+        "heavy = ('matplotlib', 'scipy', 'seaborn', 'pandas')\n"
+        "print(json.dumps(sorted(name for name in heavy if name in sys.modules)))\n"
+    )
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, check=True)
+        seconds.append(time.perf_counter() - start)
+    return {'seconds': min(seconds), 'modules': json.loads(result.stdout.strip().splitlines()[-1])}
+
+
+def check_startup():
+    """Report the startup time of every command and check it against STARTUP_BUDGETS.
+
+    Returns:
+        int: 0 if every command is within budget and the plot-free commands never load
+             matplotlib, 1 otherwise
+    """
+    failures = 0
+    print(f"{'command':<14}{'seconds':>9}{'budget':>9}  heavy modules")
+    for command, budget in STARTUP_BUDGETS.items():
+        report = measure_startup(command)
+        problems = []
+        if report['seconds'] > budget:
+            problems.append("over budget")
+        if (command is None or command in PLOT_FREE_COMMANDS) and 'matplotlib' in report['modules']:
+            problems.append("imports matplotlib")
+        failures += bool(problems)
+        print(f"{command or '(help)':<14}{report['seconds']:>9.2f}{budget:>9.2f}  "
+              f"{', '.join(report['modules']) or '-'}{'  <- ' + ', '.join(problems) if problems else ''}")
+    return 1 if failures else 0
+
+
+def main(argv=None):
+    """Main function to dispatch an analysis subcommand from the command line.
+
+    Args:
+        argv (list): Command line arguments, or None to read sys.argv
+    """
+    parser = build_parser()
+    args, command_argv = parser.parse_known_args(argv)
+
+    if args.check_startup:
+        sys.exit(check_startup())
+    if args.command is None:
+        parser.print_help()
+        sys.exit(2)
+
+    module_name = COMMANDS[args.command][0]
+    module = importlib.import_module(module_name)
+    module.main(command_argv, prog=f"{parser.prog} {args.command}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Heatmap Grid Binning for React Steering Experiment
+Assigns samples to heatmap cells in one pass and accumulates weighted counts with np.bincount
+"""
+
+import numpy as np
+
+
+def grid_cell_indices(points, window_width, window_height, grid_resolution, snap='floor'):
+    """Compute the heatmap cell of every sample at once.
+
+    Args:
+        points (np.ndarray): (N, 2) array of (x, y) positions
+        window_width (float): Width of the environment
+        window_height (float): Height of the environment
+        grid_resolution (int): Number of cells along each axis
+        snap (str): 'floor' bins the window into equal cells; 'nearest' picks the closest of
+            grid_resolution evenly spaced grid points (np.linspace(0, size, grid_resolution)),
+            preferring the lower one on ties
+
+    Returns:
+        tuple: (x_idx, y_idx) int arrays of column and row indices
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    indices = []
+    for values, size in ((points[:, 0], window_width), (points[:, 1], window_height)):
+        if snap == 'floor':
+            idx = np.clip(values / size * grid_resolution, 0, grid_resolution - 1).astype(np.int64)
+        elif snap == 'nearest':
+            coords = np.linspace(0, size, grid_resolution)
+            upper = np.clip(np.searchsorted(coords, values), 1, grid_resolution - 1)
+            lower = upper - 1
+            idx = np.where(np.abs(coords[lower] - values) <= np.abs(coords[upper] - values), lower, upper)
+        else:
+            raise ValueError(f"Unknown snap mode: {snap}")
+        indices.append(idx)
+    return indices[0], indices[1]
+
+
+def accumulate_grid(x_idx, y_idx, grid_resolution, weights=None):
+    """Sum sample weights (or count samples) per cell.
+
+    Args:
+        x_idx (np.ndarray): Column index of every sample
+        y_idx (np.ndarray): Row index of every sample
+        grid_resolution (int): Number of cells along each axis
+        weights (np.ndarray): Optional per-sample weights
+
+    Returns:
+        np.ndarray: (grid_resolution, grid_resolution) grid indexed [row, column]
+    """
+    cells = np.asarray(y_idx, dtype=np.int64) * grid_resolution + np.asarray(x_idx, dtype=np.int64)
+    grid = np.bincount(cells, weights=weights, minlength=grid_resolution * grid_resolution)
+    return grid.astype(float).reshape(grid_resolution, grid_resolution)
+
+
+def occupancy_grid(x_idx, y_idx, groups, grid_resolution):
+    """Count how many groups (e.g. participants) visit each cell at least once.
+
+    Args:
+        x_idx (np.ndarray): Column index of every sample
+        y_idx (np.ndarray): Row index of every sample
+        groups (np.ndarray): Group number of every sample
+        grid_resolution (int): Number of cells along each axis
+
+    Returns:
+        np.ndarray: (grid_resolution, grid_resolution) grid of distinct group counts
+    """
+    num_cells = grid_resolution * grid_resolution
+    cells = np.asarray(y_idx, dtype=np.int64) * grid_resolution + np.asarray(x_idx, dtype=np.int64)
+    visits = np.unique(np.asarray(groups, dtype=np.int64) * num_cells + cells)
+    return accumulate_grid(visits % grid_resolution, (visits % num_cells) // grid_resolution, grid_resolution)
@@ -0,0 +1,228 @@
+"""
+Heatmap State for React Steering Experiment
+Keeps the running sums behind each trial's heatmaps on disk so new participant files can be folded in
+without re-reading the participants that are already accumulated
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from participant_data import condition_key
+
+
+STATE_FORMAT_VERSION = 2
+STATE_INDEX = "state.json"
+SUM_NAMES = ('occupancy', 'segment_total', 'segment_acceleration', 'segment_deceleration',
+             'acceleration', 'deceleration')
+
+
+def read_state_index(state_dir):
+    """Read the state index, returning None if the state directory has not been written yet.
+
+    Args:
+        state_dir (str or Path): State directory
+
+    Returns:
+        dict: Index with version, parameters and sources, or None
+    """
+    try:
+        with open(Path(state_dir) / STATE_INDEX, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_state_index(state_dir, index):
+    """Atomically replace the state index.
+
+    Args:
+        state_dir (str or Path): State directory
+        index (dict): State index
+    """
+    index_path = Path(state_dir) / STATE_INDEX
+    temp_path = index_path.with_name(f"{STATE_INDEX}.{os.getpid()}.tmp")
+    with open(temp_path, 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(temp_path, index_path)
+
+
+def open_heatmap_state(state_dir, parameters):
+    """Open a state directory, creating its index if it is new.
+
+    Sums accumulated under other analysis parameters cannot be combined with new ones, so a
+    mismatch is an error rather than a silent rebuild.
+
+    Args:
+        state_dir (str or Path): State directory
+        parameters (dict): Analysis parameters the sums depend on (JSON-serializable)
+
+    Returns:
+        dict: State index with version, parameters and sources (path -> size and mtime)
+
+    Raises:
+        ValueError: If the directory holds state built with another format or other parameters
+    """
+    state_dir = Path(state_dir)
+    state_dir.mkdir(parents=True, exist_ok=True)
+    index = read_state_index(state_dir)
+    if index is None:
+        index = {'version': STATE_FORMAT_VERSION, 'parameters': parameters, 'sources': {}}
+        write_state_index(state_dir, index)
+        return index
+
+    if index.get('version') != STATE_FORMAT_VERSION or index.get('parameters') != parameters:
+        raise ValueError(f"Heatmap state in {state_dir} was accumulated with parameters "
+                         f"{index.get('parameters')}, not {parameters}; delete it or choose another "
+                         f"state directory to rebuild")
+    return index
+
+
+def source_fingerprint(json_file):
+    """Identify a version of a participant file by its size and modification time.
+
+    Args:
+        json_file (str or Path): Path to the JSON file
+
+    Returns:
+        dict: {'size', 'mtime_ns'}
+    """
+    stat = Path(json_file).stat()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def pending_sources(index, json_files):
+    """Select the participant files that have not been folded into the state yet.
+
+    Files that changed since they were folded are read again; their participants that are
+    already accumulated are skipped per trial, so only new participants are added.
+
+    Args:
+        index (dict): State index as returned by open_heatmap_state
+        json_files (list): Candidate JSON files
+
+    Returns:
+        list: Files that are new or changed since they were folded
+    """
+    pending = []
+    for json_file in json_files:
+        folded = index['sources'].get(str(Path(json_file).resolve()))
+        if folded is None:
+            pending.append(json_file)
+        elif folded != source_fingerprint(json_file):
+            print(f"Warning: {json_file} changed since it was folded into the heatmap state; "
+                  f"only participants not accumulated yet are added")
+            pending.append(json_file)
+    return pending
+
+
+def mark_sources(state_dir, index, json_files):
+    """Record participant files as folded into the state.
+
+    Args:
+        state_dir (str or Path): State directory
+        index (dict): State index, updated in place
+        json_files (list): JSON files whose participants have been accumulated
+    """
+    for json_file in json_files:
+        index['sources'][str(Path(json_file).resolve())] = source_fingerprint(json_file)
+    write_state_index(state_dir, index)
+
+
+def trial_state_path(state_dir, trial_id, condition_json):
+    """Path of the accumulated sums of one trial condition.
+
+    Args:
+        state_dir (str or Path): State directory
+        trial_id: Trial ID
+        condition_json (str): Condition key of the trial, as returned by condition_key
+
+    Returns:
+        Path: .npz file of the trial condition
+    """
+    condition_hash = hashlib.sha1(condition_json.encode('utf-8')).hexdigest()[:12]
+    return Path(state_dir) / f"trial_{trial_id}_{condition_hash}.npz"
+
+
+def list_trial_states(state_dir):
+    """List the trial conditions that already have accumulated sums.
+
+    Args:
+        state_dir (str or Path): State directory
+
+    Returns:
+        list: (trial_id, condition key) pairs
+    """
+    groups = []
+    for state_path in sorted(Path(state_dir).glob("trial_*.npz")):
+        if state_path.name.endswith('.tmp.npz'):
+            continue
+        with np.load(state_path) as entry:
+            groups.append((json.loads(str(entry['trial_id'])), condition_key(json.loads(str(entry['condition'])))))
+    return groups
+
+
+def load_trial_state(state_dir, trial_id, condition_json):
+    """Read the accumulated sums of a trial condition.
+
+    Args:
+        state_dir (str or Path): State directory
+        trial_id: Trial ID
+        condition_json (str): Condition key of the trial
+
+    Returns:
+        dict: {'condition', 'participants' (IDs already folded in), 'sums'}, or None if the
+              trial condition has no state yet
+    """
+    state_path = trial_state_path(state_dir, trial_id, condition_json)
+    if not state_path.exists():
+        return None
+    with np.load(state_path) as entry:
+        sums = {name: entry[name] for name in SUM_NAMES if name in entry.files}
+        sums['num_trajectories'] = int(entry['num_trajectories'])
+        return {
+            'condition': json.loads(str(entry['condition'])),
+            'participants': json.loads(str(entry['participants'])),
+            'sums': sums,
+        }
+
+
+def save_trial_state(state_dir, trial_id, condition_json, state):
+    """Atomically write the accumulated sums of a trial condition.
+
+    Args:
+        state_dir (str or Path): State directory
+        trial_id: Trial ID
+        condition_json (str): Condition key of the trial
+        state (dict): State as returned by load_trial_state
+    """
+    state_path = trial_state_path(state_dir, trial_id, condition_json)
+    arrays = {name: state['sums'][name] for name in SUM_NAMES if name in state['sums']}
+    arrays['num_trajectories'] = np.array(state['sums']['num_trajectories'])
+    arrays['trial_id'] = np.array(json.dumps(trial_id))
+    arrays['condition'] = np.array(json.dumps(state['condition']))
+    arrays['participants'] = np.array(json.dumps(state['participants']))
+
+    temp_path = state_path.with_name(f"{state_path.stem}.{os.getpid()}.tmp.npz")
+    np.savez(temp_path, **arrays)
+    os.replace(temp_path, state_path)
+
+
+def add_heatmap_sums(total, sums):
+    """Add the heatmap sums of a batch of participants to accumulated sums.
+
+    Args:
+        total (dict): Accumulated sums, or None
+        sums (dict): Sums of the new batch, in the same layout
+
+    Returns:
+        dict: Combined sums; the inputs are left unchanged
+    """
+    if total is None:
+        return dict(sums)
+    combined = {name: total[name] + sums[name] for name in SUM_NAMES if name in total}
+    combined['num_trajectories'] = total['num_trajectories'] + sums['num_trajectories']
+    return combined
@@ -0,0 +1,184 @@
+"""
+Output Manifest for React Steering Experiment
+Records a hash of the inputs behind every group of plots so reruns only regenerate the outputs whose
+trial data, tunnel condition, parameters or analysis code changed
+"""
+
+import hashlib
+import json
+import os
+import sys
+import types
+from pathlib import Path
+
+import numpy as np
+
+from participant_data import condition_key
+from trajectory_store import COLUMNAR_TRIAL_FIELDS, trajectory_to_array
+
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_FORMAT_VERSION = 1
+
+
+def code_version(module):
+    """Hash the source of an analysis module and of the local modules it uses.
+
+    Local modules are those next to the module's file that it imports, directly or through
+    another local module, or whose functions it imports.
+
+    Args:
+        module (module): Module producing the outputs, e.g. sys.modules[__name__]
+
+    Returns:
+        str: Hex digest that changes whenever any of these source files changes
+    """
+    root = Path(module.__file__).resolve().parent
+    sources = {}
+    pending = [module]
+    while pending:
+        current = pending.pop()
+        path = Path(current.__file__).resolve()
+        if path in sources:
+            continue
+        sources[path] = path.read_bytes()
+        for value in vars(current).values():
+            if isinstance(value, types.ModuleType):
+                dependency = value
+            else:
+                dependency = sys.modules.get(getattr(value, '__module__', None) or '')
+            dependency_file = getattr(dependency, '__file__', None)
+            if dependency_file and Path(dependency_file).resolve().parent == root:
+                pending.append(dependency)
+
+    digest = hashlib.sha1()
+    for path in sorted(sources):
+        digest.update(path.name.encode('utf-8'))
+        digest.update(sources[path])
+    return digest.hexdigest()
+
+
+def trial_fingerprint(trial):
+    """Hash the data of one trial independently of the format it was loaded from.
+
+    JSON exports, parse cache entries and trajectory store records of the same trial give
+    the same fingerprint.
+
+    Args:
+        trial (dict): Trial data dictionary
+
+    Returns:
+        str: Hex digest of the trial's samples, condition, completion time and other fields
+    """
+    digest = hashlib.sha1()
+    for samples in (trajectory_to_array(trial.get('trajectory', [])),
+                    np.asarray(trial.get('timestamps', []), dtype=np.float64),
+                    np.asarray(trial.get('speeds', []), dtype=np.float64)):
+        digest.update(str(samples.shape).encode('utf-8'))
+        digest.update(np.ascontiguousarray(samples).tobytes())
+    digest.update(condition_key(trial.get('condition', {})).encode('utf-8'))
+    digest.update(repr(float(trial.get('completionTime', 0) or 0)).encode('utf-8'))
+    extras = {key: value for key, value in trial.items() if key not in COLUMNAR_TRIAL_FIELDS}
+    digest.update(json.dumps(extras, sort_keys=True, default=lambda value: np.asarray(value).tolist()).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def input_hash(code, parameters, fingerprints):
+    """Combine everything an output depends on into one hash.
+
+    Args:
+        code (str): Code version as returned by code_version
+        parameters (dict): Analysis parameters that change the output (JSON-serializable)
+        fingerprints (list): Fingerprints of the input trials, in the order they are used
+
+    Returns:
+        str: Hex digest
+    """
+    payload = json.dumps({'code': code, 'parameters': parameters, 'trials': fingerprints}, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def read_manifest(output_dir):
+    """Read the output manifest, returning an empty one if it is missing or unreadable.
+
+    Args:
+        output_dir (str or Path): Output directory
+
+    Returns:
+        dict: Mapping of target name to {'hash', 'outputs'}
+    """
+    try:
+        with open(Path(output_dir) / MANIFEST_NAME, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get('version') != MANIFEST_FORMAT_VERSION:
+        return {}
+    return manifest['targets']
+
+
+def write_manifest(output_dir, manifest):
+    """Atomically replace the output manifest.
+
+    Args:
+        output_dir (str or Path): Output directory
+        manifest (dict): Mapping of target name to {'hash', 'outputs'}
+    """
+    manifest_path = Path(output_dir) / MANIFEST_NAME
+    temp_path = manifest_path.with_name(f"{MANIFEST_NAME}.{os.getpid()}.tmp")
+    with open(temp_path, 'w') as f:
+        json.dump({'version': MANIFEST_FORMAT_VERSION, 'targets': manifest}, f, indent=2, sort_keys=True)
+    os.replace(temp_path, manifest_path)
+
+
+def stale_reason(manifest, output_dir, target, digest):
+    """Decide whether a target has to be regenerated.
+
+    Args:
+        manifest (dict): Manifest as returned by read_manifest
+        output_dir (str or Path): Output directory the target's outputs are relative to
+        target (str): Target name
+        digest (str): Current input hash of the target
+
+    Returns:
+        str: 'new', 'inputs changed' or 'output missing', or None if the target is up to date
+    """
+    entry = manifest.get(target)
+    if entry is None:
+        return 'new'
+    if entry['hash'] != digest:
+        return 'inputs changed'
+    if not all((Path(output_dir) / output).exists() for output in entry['outputs']):
+        return 'output missing'
+    return None
+
+
+def record_target(manifest, output_dir, target, digest, outputs):
+    """Record a freshly generated target in the manifest.
+
+    Args:
+        manifest (dict): Manifest, updated in place
+        output_dir (str or Path): Output directory
+        target (str): Target name
+        digest (str): Input hash the outputs were generated from
+        outputs (list): Paths relative to output_dir the target may write; only those that
+            exist are recorded, since some inputs produce no plot
+    """
+    manifest[target] = {
+        'hash': digest,
+        'outputs': [str(output) for output in outputs if (Path(output_dir) / output).exists()],
+    }
+
+
+def print_stale_targets(stale):
+    """List the targets a dry run would regenerate.
+
+    Args:
+        stale (dict): Mapping of target name to the reason it is stale
+    """
+    if not stale:
+        print("Dry run: every output is up to date")
+        return
+    print(f"Dry run: {len(stale)} target(s) would be regenerated:")
+    for target, reason in stale.items():
+        print(f"  {target} ({reason})")
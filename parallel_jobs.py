@@ -0,0 +1,102 @@
+"""
+Parallel Job Runner for React Steering Experiment
+Distributes independent per-trial and per-participant plotting work across worker processes
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+MAX_PENDING_PER_WORKER = 2  # Tasks submitted ahead per worker, so inputs are pickled as they are needed
+
+
+def resolve_jobs(jobs):
+    """Resolve a --jobs value to a worker count.
+
+    Args:
+        jobs (int): Requested number of workers; 0 or less uses every CPU
+
+    Returns:
+        int: Number of worker processes to use
+    """
+    if jobs is None:
+        return 1
+    if jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def init_plot_worker():
+    """Switch worker processes to the non-interactive Agg backend before any figure is drawn."""
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+
+
+def run_jobs(func, tasks, jobs=1):
+    """Run independent jobs serially or in a process pool.
+
+    Results are collected in submission order, so output is deterministic
+    regardless of which worker finishes first. A failing job does not stop
+    the others; its error is reported and returned. At most
+    MAX_PENDING_PER_WORKER tasks per worker are in flight at a time, so the
+    inputs of a whole cohort are never queued for the pool at once.
+
+    Args:
+        func (callable): Module-level function to call for each task
+        tasks (iterable): (label, args) pairs; func is called as func(*args).
+            Tasks are consumed lazily, so a generator keeps serial runs streaming
+        jobs (int): Number of worker processes (1 runs in the current process)
+
+    Returns:
+        list: (label, error message) pairs for the jobs that failed, in submission order
+    """
+    jobs = resolve_jobs(jobs)
+    errors = []
+
+    if jobs == 1:
+        for label, args in tasks:
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"Error processing {label}: {e}")
+                errors.append((label, str(e)))
+        return errors
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_plot_worker) as executor:
+        pending = deque()
+        for label, args in tasks:
+            if len(pending) >= jobs * MAX_PENDING_PER_WORKER:
+                collect_job(*pending.popleft(), errors)
+            pending.append((label, executor.submit(func, *args)))
+        while pending:
+            collect_job(*pending.popleft(), errors)
+    return errors
+
+
+def collect_job(label, future, errors):
+    """Wait for a submitted job and record its error, if any.
+
+    Args:
+        label (str): Job label
+        future (Future): Future of the job
+        errors (list): (label, error message) pairs, appended to if the job failed
+    """
+    try:
+        future.result()
+    except Exception as e:
+        print(f"Error processing {label}: {e}")
+        errors.append((label, str(e)))
+
+
+def report_job_errors(errors):
+    """Print a summary of failed jobs.
+
+    Args:
+        errors (list): (label, error message) pairs as returned by run_jobs
+    """
+    if not errors:
+        return
+    print(f"\n{len(errors)} job(s) failed:")
+    for label, message in errors:
+        print(f"  {label}: {message}")
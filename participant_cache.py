@@ -0,0 +1,187 @@
+"""
+Participant Parse Cache for React Steering Experiment
+Keeps already-normalized NumPy columns for each participant JSON file on disk so unchanged files are never re-parsed
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from participant_data import iter_file_documents
+from trajectory_store import build_columns, iter_store_participants
+
+
+DEFAULT_CACHE_BYTES = 512 * 1024 * 1024
+CACHE_INDEX = "index.json"
+CACHE_FORMAT_VERSION = 2
+
+
+def cache_key(json_file):
+    """Compute the cache key of a participant file from its path, size and modification time.
+
+    Any change to the file changes its size or mtime, so stale entries are never hit.
+
+    Args:
+        json_file (str or Path): Path to the JSON file
+
+    Returns:
+        str: Hex digest identifying this version of the file
+    """
+    json_file = Path(json_file).resolve()
+    stat = json_file.stat()
+    identity = f"{CACHE_FORMAT_VERSION}|{json_file}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha1(identity.encode('utf-8')).hexdigest()
+
+
+def read_cache_index(cache_dir):
+    """Read the cache index, returning an empty index if it is missing or unreadable.
+
+    Args:
+        cache_dir (Path): Cache directory
+
+    Returns:
+        dict: Mapping of cache key to {'path', 'bytes', 'last_used'}
+    """
+    try:
+        with open(Path(cache_dir) / CACHE_INDEX, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_cache_index(cache_dir, index):
+    """Atomically replace the cache index.
+
+    Args:
+        cache_dir (Path): Cache directory
+        index (dict): Cache index
+    """
+    index_path = Path(cache_dir) / CACHE_INDEX
+    temp_path = index_path.with_name(f"{CACHE_INDEX}.{os.getpid()}.tmp")
+    with open(temp_path, 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(temp_path, index_path)
+
+
+def evict_cache_entries(cache_dir, index, max_bytes):
+    """Delete least recently used entries until the cache fits its byte budget.
+
+    Args:
+        cache_dir (Path): Cache directory
+        index (dict): Cache index, updated in place
+        max_bytes (int): Byte budget for all entries
+    """
+    total_bytes = sum(entry['bytes'] for entry in index.values())
+    for key in sorted(index, key=lambda k: index[k]['last_used']):
+        if total_bytes <= max_bytes:
+            break
+        total_bytes -= index[key]['bytes']
+        (Path(cache_dir) / f"{key}.npz").unlink(missing_ok=True)
+        del index[key]
+
+
+def save_cache_entry(entry_path, columns):
+    """Write normalized columns to a cache entry file.
+
+    Args:
+        entry_path (Path): Path of the .npz entry
+        columns (dict): Columns as returned by build_columns
+    """
+    arrays = {name: value for name, value in columns.items() if isinstance(value, np.ndarray)}
+    arrays['conditions'] = np.array(json.dumps(columns['conditions']))
+    arrays['extras'] = np.array(json.dumps({str(index): value for index, value in columns['extras'].items()}))
+    arrays['documents'] = np.array(json.dumps(columns['documents']))
+
+    temp_path = entry_path.with_name(f"{entry_path.stem}.{os.getpid()}.tmp.npz")
+    np.savez(temp_path, **arrays)
+    os.replace(temp_path, entry_path)
+
+
+def load_cache_entry(entry_path):
+    """Read normalized columns from a cache entry file.
+
+    Args:
+        entry_path (Path): Path of the .npz entry
+
+    Returns:
+        dict: Columns in the same layout as build_columns
+    """
+    with np.load(entry_path) as entry:
+        columns = {name: entry[name] for name in entry.files}
+    columns['conditions'] = json.loads(str(columns['conditions']))
+    columns['extras'] = {int(index): value for index, value in json.loads(str(columns['extras'])).items()}
+    columns['documents'] = json.loads(str(columns['documents']))
+    return columns
+
+
+def load_cached_participant_documents(json_file, cache_dir, max_bytes=DEFAULT_CACHE_BYTES):
+    """Load participant documents, parsing the JSON file only on a cache miss.
+
+    Args:
+        json_file (str or Path): Path to the JSON file
+        cache_dir (str or Path): Directory holding cache entries
+        max_bytes (int): Byte budget for the cache; least recently used entries are evicted
+
+    Returns:
+        list: Participant documents whose trial arrays are NumPy arrays
+    """
+    json_file = Path(json_file)
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    key = cache_key(json_file)
+    entry_path = cache_dir / f"{key}.npz"
+    index = read_cache_index(cache_dir)
+
+    columns = None
+    if key in index and entry_path.exists():
+        try:
+            columns = load_cache_entry(entry_path)
+        except (OSError, ValueError, KeyError):
+            columns = None
+
+    if columns is None:
+        columns = build_columns(iter_file_documents(json_file))
+        save_cache_entry(entry_path, columns)
+
+        # Drop entries for older versions of the same file
+        resolved = str(json_file.resolve())
+        for stale_key in [k for k, entry in index.items() if entry['path'] == resolved and k != key]:
+            (cache_dir / f"{stale_key}.npz").unlink(missing_ok=True)
+            del index[stale_key]
+
+        index[key] = {'path': resolved, 'bytes': entry_path.stat().st_size, 'last_used': time.time()}
+        evict_cache_entries(cache_dir, index, max_bytes)
+    else:
+        index[key]['last_used'] = time.time()
+
+    write_cache_index(cache_dir, index)
+    return list(iter_store_participants(columns))
+
+
+def iter_cached_participant_documents(json_files, cache_dir, max_bytes=DEFAULT_CACHE_BYTES):
+    """Yield participant documents from JSON files through the parse cache.
+
+    Files that cannot be parsed are reported and skipped.
+
+    Args:
+        json_files (list): Paths to participant JSON files
+        cache_dir (str or Path): Directory holding cache entries
+        max_bytes (int): Byte budget for the cache
+
+    Yields:
+        tuple: (document, json_file) pairs
+    """
+    for json_file in json_files:
+        json_file = Path(json_file)
+        try:
+            documents = load_cached_participant_documents(json_file, cache_dir, max_bytes)
+        except Exception as e:
+            print(f"Error loading {json_file.name}: {e}")
+            continue
+        for document in documents:
+            yield document, json_file
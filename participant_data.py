@@ -0,0 +1,336 @@
+"""
+Participant Data Loading for React Steering Experiment
+Reads participant JSON exports and normalizes them into participant documents with a flat trialData list
+"""
+
+import json
+from pathlib import Path
+
+
+# Characters read at a time when streaming combined export files
+STREAM_CHUNK_SIZE = 1 << 20
+
+def get_trial_id(trial, default=None):
+    """Return the trial ID of a trial record.
+
+    Older exports use ``trialId`` while current exports use ``trial_id``.
+
+    Args:
+        trial (dict): Trial data dictionary
+        default: Value returned when the trial has no ID
+
+    Returns:
+        The trial ID, or default if missing
+    """
+    trial_id = trial.get('trialId')
+    if trial_id is None:
+        trial_id = trial.get('trial_id', default)
+    return trial_id
+
+
+def condition_key(condition):
+    """Serialize a trial condition deterministically so equal conditions compare equal.
+
+    Args:
+        condition (dict): Trial condition
+
+    Returns:
+        str: Canonical JSON representation of the condition
+    """
+    return json.dumps(condition or {}, sort_keys=True)
+
+
+def flatten_sessions(document):
+    """Collect the trials of all sessions into a single trialData list.
+
+    Participant files written by extractParticipantData.js nest trials under
+    ``sessions[].trialData``; legacy documents already carry a top-level
+    ``trialData`` list and are returned unchanged.
+
+    Args:
+        document (dict): Participant document
+
+    Returns:
+        dict: Participant document with a top-level trialData list
+    """
+    if 'trialData' in document or 'sessions' not in document:
+        return document
+
+    trial_data = []
+    for session in document.get('sessions', []):
+        trial_data.extend(session.get('trialData', []))
+
+    flattened = dict(document)
+    flattened['trialData'] = trial_data
+    return flattened
+
+
+def read_past_whitespace(f, chunk_size=STREAM_CHUNK_SIZE):
+    """Read from an open text file until the first character that is not whitespace.
+
+    Args:
+        f (file): Text file opened for reading
+        chunk_size (int): Number of characters read from the file at a time
+
+    Returns:
+        str: The text read so far, starting at the first non-whitespace character, or an
+             empty string if the file holds nothing else
+    """
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return ''
+        buffer = chunk.lstrip()
+        if buffer:
+            return buffer
+
+
+def iter_json_array(json_file, chunk_size=STREAM_CHUNK_SIZE):
+    """Incrementally decode the elements of a top-level JSON array.
+
+    Only the text of the element being decoded is held in memory, so peak
+    memory is bounded by the largest element rather than the whole file.
+
+    Args:
+        json_file (str or Path): Path to a JSON file holding a top-level array
+        chunk_size (int): Number of characters read from the file at a time
+
+    Yields:
+        The decoded elements, in file order
+    """
+    decoder = json.JSONDecoder()
+    with open(json_file, 'r') as f:
+        buffer = read_past_whitespace(f, chunk_size)
+        if not buffer.startswith('['):
+            raise ValueError(f"{json_file} does not contain a top-level JSON array")
+        position = 1
+        eof = False
+        expect_separator = False
+        after_separator = False
+        last_size = 0
+
+        while True:
+            # Skip whitespace and the comma between elements
+            while True:
+                while position < len(buffer) and buffer[position] in ' \t\r\n':
+                    position += 1
+                if position < len(buffer) or eof:
+                    break
+                buffer, position = f.read(chunk_size), 0
+                eof = not buffer
+
+            if position >= len(buffer):
+                raise ValueError(f"Unexpected end of file in {json_file}")
+            if buffer[position] == ']':
+                if after_separator:
+                    raise ValueError(f"Trailing ',' before ']' in {json_file}")
+                return
+            if expect_separator:
+                if buffer[position] != ',':
+                    raise ValueError(f"Expected ',' at character {position} of the current chunk in {json_file}")
+                position += 1
+                expect_separator = False
+                after_separator = True
+                continue
+
+            # Elements tend to be of similar size; top up the buffer first so that
+            # an element is rarely decoded twice
+            if not eof and len(buffer) - position < last_size:
+                more = f.read(max(chunk_size, last_size))
+                eof = not more
+                buffer = buffer[position:] + more
+                position = 0
+
+            # Decode the next element, reading more text until it is complete
+            read_size = chunk_size
+            while True:
+                try:
+                    element, end = decoder.raw_decode(buffer, position)
+                    # A number cut off by the chunk boundary may continue in the next chunk,
+                    # so only accept an element that is followed by a delimiter
+                    if eof or (end < len(buffer) and buffer[end] in ' \t\r\n,]'):
+                        break
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                more = f.read(read_size)
+                eof = not more
+                buffer = buffer[position:] + more
+                position = 0
+                read_size *= 2  # Keep re-decoding of very large elements linear overall
+
+            last_size = end - position
+            yield element
+            buffer, position = buffer[end:], 0
+            expect_separator = True
+            after_separator = False
+
+
+def iter_file_documents(json_file):
+    """Yield the participant documents contained in a JSON file one at a time.
+
+    Handles both individual participant files and combined experiment files
+    (a top-level list of documents, as written by downloadFirebaseData.js).
+    Combined files are streamed so only one participant is decoded at a time.
+
+    Args:
+        json_file (str or Path): Path to the JSON file
+
+    Yields:
+        dict: Participant documents with a top-level trialData list
+    """
+    with open(json_file, 'r') as f:
+        first = read_past_whitespace(f)[:1]
+
+    if first == '[':
+        documents = iter_json_array(json_file)
+    else:
+        with open(json_file, 'r') as f:
+            documents = [json.load(f)]
+
+    for document in documents:
+        if isinstance(document, dict):
+            yield flatten_sessions(document)
+
+
+def load_participant_documents(json_file):
+    """Load all participant documents contained in a JSON file.
+
+    Args:
+        json_file (str or Path): Path to the JSON file
+
+    Returns:
+        list: Participant documents with a top-level trialData list
+    """
+    return list(iter_file_documents(json_file))
+
+
+def find_json_files(inputs):
+    """Expand a list of files and directories into the JSON files they contain.
+
+    Args:
+        inputs (list): Paths to JSON files or directories containing JSON files
+
+    Returns:
+        list: Sorted list of JSON file paths
+    """
+    json_files = []
+    for item in inputs:
+        item = Path(item)
+        if item.is_dir():
+            json_files.extend(sorted(item.glob("*.json")))
+        elif item.suffix == '.json':
+            json_files.append(item)
+    return json_files
+
+
+def iter_participant_documents(json_files):
+    """Yield participant documents from JSON files, loading one document at a time.
+
+    Files that cannot be parsed are reported and skipped from the point of the error.
+
+    Args:
+        json_files (list): Paths to participant JSON files
+
+    Yields:
+        tuple: (document, json_file) pairs
+    """
+    for json_file in json_files:
+        json_file = Path(json_file)
+        try:
+            for document in iter_file_documents(json_file):
+                yield document, json_file
+        except Exception as e:
+            print(f"Error loading {json_file.name}: {e}")
+            continue
+
+
+def build_trial_index(participant_documents):
+    """Index every trial by (trial_id, round, condition key) in a single pass.
+
+    Args:
+        participant_documents (list): Participant documents with a top-level trialData list
+
+    Returns:
+        dict: Mapping of (trial_id, round, condition key) to a list of
+              (participant_index, participant_id, trial) references in load order.
+              Trials without a trial ID are not indexed.
+    """
+    trial_index = {}
+    for participant_index, document in enumerate(participant_documents):
+        participant_id = document.get('participantId', f"participant_{participant_index}")
+        for trial in document.get('trialData', []):
+            trial_id = get_trial_id(trial)
+            if trial_id is None:
+                continue
+            key = (trial_id, trial.get('round'), condition_key(trial.get('condition', {})))
+            trial_index.setdefault(key, []).append((participant_index, participant_id, trial))
+    return trial_index
+
+
+def group_trial_index(trial_index):
+    """Group the keys of a trial index by trial ID and condition.
+
+    The repetitions of a trial in different rounds fall into one group. A trial ID that was
+    run under several conditions gets one group per condition, since each has its own tunnel.
+
+    Args:
+        trial_index (dict): Index as returned by build_trial_index
+
+    Returns:
+        dict: Mapping of (trial_id, condition key) to its index keys, ordered by round
+    """
+    groups = {}
+    for key in trial_index:
+        groups.setdefault((key[0], key[2]), []).append(key)
+    for keys in groups.values():
+        keys.sort(key=lambda key: (key[1] is None, key[1] if key[1] is not None else 0))
+    return groups
+
+
+def trial_group_labels(groups):
+    """Name the (trial ID, condition) groups of a trial index.
+
+    A trial ID run under a single condition is named after the ID alone. A trial ID run under
+    several conditions gets one name per condition, numbered from 1 in condition key order, so
+    the names do not depend on the order participants were loaded in.
+
+    Args:
+        groups (iterable): (trial_id, condition key) pairs
+
+    Returns:
+        dict: Mapping of each pair to its name, e.g. '3' or '3_2'
+    """
+    conditions = {}
+    for trial_id, condition_json in groups:
+        conditions.setdefault(trial_id, set()).add(condition_json)
+    labels = {}
+    for trial_id, condition_jsons in conditions.items():
+        if len(condition_jsons) == 1:
+            labels[(trial_id, next(iter(condition_jsons)))] = str(trial_id)
+            continue
+        for number, condition_json in enumerate(sorted(condition_jsons), start=1):
+            labels[(trial_id, condition_json)] = f"{trial_id}_{number}"
+    return labels
+
+
+def select_trial_references(trial_index, keys, all_rounds=False):
+    """Collect the trial references stored under a group of index keys.
+
+    Args:
+        trial_index (dict): Index as returned by build_trial_index
+        keys (list): Index keys of one (trial ID, condition) group, ordered by round
+        all_rounds (bool): Keep every repetition instead of only each participant's earliest round
+
+    Returns:
+        list: (participant_index, participant_id, trial) references ordered by participant
+    """
+    references = [reference for key in keys for reference in trial_index[key]]
+    if not all_rounds:
+        earliest = {}
+        for reference in references:
+            earliest.setdefault(reference[0], reference)
+        references = list(earliest.values())
+    # Stable sort keeps rounds in order within a participant
+    references.sort(key=lambda reference: reference[0])
+    return references
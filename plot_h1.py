@@ -5,189 +5,127 @@ Example usage:
 python plot_h1.py ./participant_data/ ./results/
 """
 
-import json
-import os
 import numpy as np
 from matplotlib import pyplot as plt
-from matplotlib.patches import Circle
 import argparse
+import sys
 from pathlib import Path
-import glob
 from scipy import ndimage
 from scipy.ndimage import gaussian_filter
-from scipy.stats import gaussian_kde
-import seaborn as sns
+from heatmap_grid import accumulate_grid, grid_cell_indices, occupancy_grid
+from heatmap_state import (add_heatmap_sums, list_trial_states, load_trial_state, mark_sources, open_heatmap_state,
+                           pending_sources, save_trial_state)
+from participant_cache import DEFAULT_CACHE_BYTES, iter_cached_participant_documents
+from output_manifest import (code_version, input_hash, print_stale_targets, read_manifest, record_target,
+                             stale_reason, trial_fingerprint, write_manifest)
+from parallel_jobs import report_job_errors, run_jobs
+from participant_data import (build_trial_index, condition_key, group_trial_index, iter_participant_documents,
+                              select_trial_references, trial_group_labels)
+from stage_profiler import (enable_profiling, finish_profiling, profile_iter, profile_stage, profile_trial,
+                            profiling_enabled)
+from trajectory_kinematics import offsets_from_lengths, split_by_offsets, tangential_accelerations
+from trajectory_store import is_trajectory_store, iter_store_participants, load_store, trajectory_to_array
+from tunnel_distance_field import (DEFAULT_CELL_SIZE, DISTANCE_FIELD_SUBDIR, distance_field_error_bound,
+                                   get_distance_field, load_distance_field, points_in_tunnel_field)
+from tunnel_geometry import (cumulative_arc_length, draw_tunnel_geometry, get_tunnel_geometry,
+                            points_in_tunnel, project_points_to_arc_length, project_points_to_tunnel)
 
 
-def generate_tunnel_path(curvature, tunnel_step=0.002):
-    """Generate tunnel path based on curvature parameter.
+TRAJECTORY_GRID_RESOLUTION = 100  # Cells per side of the trajectory overlap heatmap
+MAGNITUDE_GRID_RESOLUTION = 50  # Cells per side of the acceleration magnitude heatmap
+
+def is_point_in_tunnel(point_x, point_y, tunnel_path, tunnel_width):
+    """Check if a point is within the tunnel boundaries.
     
     Args:
-        curvature (float): Curvature parameter (amplitude of sine wave)
-        tunnel_step (float): Step size for generating path points
+        point_x (float): X coordinate of the point
+        point_y (float): Y coordinate of the point
+        tunnel_path (list): List of (x, y) tuples representing tunnel centerline
+        tunnel_width (float): Width of the tunnel
         
     Returns:
-        list: List of (x, y) tuples representing tunnel centerline
+        bool: True if point is within tunnel, False otherwise
     """
-    tunnel_start_x = 0.0
-    tunnel_end_x = 0.46
-    tunnel_y_base = 0.13
-    amplitude = curvature
-    wavelength = 0.15
-    
-    path = []
-    x = tunnel_start_x
-    while x < tunnel_end_x:
-        y = tunnel_y_base + amplitude * np.sin(2 * np.pi * x / wavelength)
-        path.append((x, y))
-        x += tunnel_step
-        
-    return path
+    _, _, _, inside = project_points_to_tunnel([(point_x, point_y)], tunnel_path, tunnel_width)
+    return bool(inside[0])
 
 
-def generate_sequential_tunnel_path(condition, tunnel_step=0.002):
-    """Generate sequential tunnel path with 2 segments.
+def calculate_tangential_acceleration(trajectory, timestamps):
+    """Calculate signed tangential acceleration from trajectory and timestamps.
     
     Args:
-        condition (dict): Trial condition with segment parameters
-        tunnel_step (float): Step size for generating path points
+        trajectory (list): List of (x, y) position tuples
+        timestamps (list): List of timestamps in milliseconds
         
     Returns:
-        tuple: (path, segment_widths) where path is list of (x, y) tuples and 
-               segment_widths is list of widths for each segment
+        np.ndarray: Signed tangential accelerations (positive = acceleration, negative = deceleration),
+                    empty if there are fewer than 3 samples
     """
-    tunnel_start_x = 0.0
-    tunnel_end_x = 0.46
-    tunnel_y_base = 0.13
-    segment_length = (tunnel_end_x - tunnel_start_x) / 2  # 2 segments instead of 3
-    
-    path = []
-    segment_widths = []
-    
-    # Generate path points
-    x = tunnel_start_x
-    while x < tunnel_end_x:
-        y = tunnel_y_base  # Default horizontal line
-        
-        # Apply curvature for straight-to-curved segments
-        if condition.get('segmentType') == 'curvature':
-            if x < tunnel_start_x + segment_length:
-                # First segment: straight (curvature = 0)
-                y = tunnel_y_base
-            else:
-                # Second segment: curved with single peak
-                segment_x = x - (tunnel_start_x + segment_length)
-                amplitude = condition.get('segment2Curvature', 0)
-                segment_width = segment_length
-                # Create a single peak curve using a quadratic function
-                normalized_x = segment_x / segment_width  # 0 to 1
-                y = tunnel_y_base + amplitude * (1 - (2 * normalized_x - 1) ** 2)
-        
-        path.append((x, y))
-        x += tunnel_step
-    
-    # Determine segment widths for each point
-    for i, (x, y) in enumerate(path):
-        if x < tunnel_start_x + segment_length:
-            segment_widths.append(condition['segment1Width'])
-        else:
-            segment_widths.append(condition['segment2Width'])
+    if len(trajectory) < 3 or len(timestamps) < 3:
+        return np.empty(0)
     
-    return path, segment_widths
+    xy = np.asarray(trajectory, dtype=float).reshape(-1, 2)
+    return tangential_accelerations(xy, offsets_from_lengths([len(xy)]), np.asarray(timestamps))
 
 
-def is_point_in_tunnel(point_x, point_y, tunnel_path, tunnel_width):
-    """Check if a point is within the tunnel boundaries.
+def stack_trajectory_samples(all_trajectories, all_accelerations):
+    """Concatenate the samples of all participants into flat arrays.
     
     Args:
-        point_x (float): X coordinate of the point
-        point_y (float): Y coordinate of the point
-        tunnel_path (list): List of (x, y) tuples representing tunnel centerline
-        tunnel_width (float): Width of the tunnel
+        all_trajectories (list): List of trajectory lists from all participants
+        all_accelerations (list): List of signed tangential acceleration lists from all participants
         
     Returns:
-        bool: True if point is within tunnel, False otherwise
+        tuple: (points, accelerations) where points is an (N, 2) array of positions and
+               accelerations is the matching (N,) array, truncated per participant to the
+               shorter of the two sequences
     """
-    # Find the closest point on the tunnel path
-    min_distance = float('inf')
-    for i in range(len(tunnel_path) - 1):
-        p1 = np.array(tunnel_path[i])
-        p2 = np.array(tunnel_path[i + 1])
-        point = np.array([point_x, point_y])
-        
-        # Calculate distance from point to line segment
-        line_vec = p2 - p1
-        point_vec = point - p1
-        
-        # Project point onto line segment
-        line_len = np.linalg.norm(line_vec)
-        if line_len == 0:
+    point_chunks = []
+    acceleration_chunks = []
+    
+    for trajectory, accelerations in zip(all_trajectories, all_accelerations):
+        if len(trajectory) == 0 or len(accelerations) == 0:
             continue
-            
-        t = np.dot(point_vec, line_vec) / (line_len ** 2)
-        t = max(0, min(1, t))  # Clamp to [0, 1]
         
-        closest_point = p1 + t * line_vec
-        distance = np.linalg.norm(point - closest_point)
-        
-        if distance < min_distance:
-            min_distance = distance
+        # Ensure same length
+        min_len = min(len(trajectory), len(accelerations))
+        point_chunks.append(np.asarray(trajectory, dtype=float)[:min_len])
+        acceleration_chunks.append(np.asarray(accelerations, dtype=float)[:min_len])
+    
+    if not point_chunks:
+        return np.empty((0, 2)), np.empty(0)
     
-    return min_distance <= tunnel_width / 2.0
+    return np.concatenate(point_chunks), np.concatenate(acceleration_chunks)
 
 
-def calculate_tangential_acceleration(trajectory, timestamps):
-    """Calculate signed tangential acceleration from trajectory and timestamps.
+def trajectory_occupancy(all_trajectories, window_width=0.4608, window_height=0.2592, grid_resolution=100):
+    """Count how many trajectories pass through each heatmap cell.
     
     Args:
-        trajectory (list): List of (x, y) position tuples
-        timestamps (list): List of timestamps in milliseconds
+        all_trajectories (list): List of trajectory lists from all participants
+        window_width (float): Width of the environment
+        window_height (float): Height of the environment
+        grid_resolution (int): Resolution of the heatmap grid
         
     Returns:
-        list: List of signed tangential accelerations (positive = acceleration, negative = deceleration)
+        tuple: (occupancy, num_trajectories) - (grid_resolution, grid_resolution) visit counts
+               and the number of non-empty trajectories
     """
-    if len(trajectory) < 3 or len(timestamps) < 3:
-        return []
-    
-    accelerations = []
-    trajectory = np.array(trajectory)
-    timestamps = np.array(timestamps) / 1000.0  # Convert to seconds
-    
-    # Calculate velocities
-    velocities = []
-    for i in range(1, len(trajectory)):
-        dx = trajectory[i][0] - trajectory[i-1][0]
-        dy = trajectory[i][1] - trajectory[i-1][1]
-        dt = timestamps[i] - timestamps[i-1]
-        if dt > 0:
-            vx = dx / dt
-            vy = dy / dt
-            velocities.append((vx, vy))
-        else:
-            velocities.append((0, 0))
-    
-    # Calculate speed (magnitude of velocity)
-    speeds = [np.sqrt(vx**2 + vy**2) for vx, vy in velocities]
-    
-    # Calculate tangential acceleration (change in speed)
-    for i in range(1, len(speeds)):
-        ds = speeds[i] - speeds[i-1]
-        dt = timestamps[i+1] - timestamps[i]
-        if dt > 0:
-            tangential_acceleration = ds / dt
-            accelerations.append(tangential_acceleration)
-        else:
-            accelerations.append(0)
-    
-    # Pad to match trajectory length
-    accelerations = [0] + accelerations + [0]
-    return accelerations
+    trajectories = [np.asarray(trajectory, dtype=float).reshape(-1, 2)
+                    for trajectory in all_trajectories if len(trajectory) > 0]
+    if not trajectories:
+        return np.zeros((grid_resolution, grid_resolution)), 0
+    
+    points = np.concatenate(trajectories)
+    participants = np.repeat(np.arange(len(trajectories)), [len(trajectory) for trajectory in trajectories])
+    x_idx, y_idx = grid_cell_indices(points, window_width, window_height, grid_resolution)
+    return occupancy_grid(x_idx, y_idx, participants, grid_resolution), len(trajectories)
 
 
 def create_trajectory_heatmap(all_trajectories, tunnel_path, tunnel_width, 
                              window_width=0.4608, window_height=0.2592, 
                              grid_resolution=100, save_path="trajectory_heatmap.png", 
-                             title="Trajectory Overlap Density"):
+                             title="Trajectory Overlap Density", geometry=None):
     """Create a heatmap showing trajectory overlap density within the tunnel.
     
     Args:
@@ -199,48 +137,47 @@ def create_trajectory_heatmap(all_trajectories, tunnel_path, tunnel_width,
         grid_resolution (int): Resolution of the heatmap grid
         save_path (str): Path to save the heatmap
         title (str): Title of the heatmap
+        geometry (dict): Optional tunnel geometry from get_tunnel_geometry; when given, its
+            boundary polygons are drawn instead of offsetting tunnel_path vertically
     """
-    # Create grid
-    x = np.linspace(0, window_width, grid_resolution)
-    y = np.linspace(0, window_height, grid_resolution)
-    X, Y = np.meshgrid(x, y)
-    
-    # Initialize overlap density grid
-    overlap_density = np.zeros_like(X)
-    
-    # Process each participant's trajectory separately
-    participant_grids = []
-    
-    for trajectory in all_trajectories:
-        if not trajectory:
-            continue
-            
-        trajectory = np.array(trajectory)
-        
-        # Create a binary grid for this participant's trajectory
-        participant_grid = np.zeros_like(X)
-        
-        # Mark trajectory points on the grid
-        for point in trajectory:
-            x_idx = int(np.clip(point[0] / window_width * grid_resolution, 0, grid_resolution-1))
-            y_idx = int(np.clip(point[1] / window_height * grid_resolution, 0, grid_resolution-1))
-            participant_grid[y_idx, x_idx] = 1
-        
-        # Apply Gaussian smoothing to create a smooth trajectory representation
-        participant_grid = ndimage.gaussian_filter(participant_grid, sigma=2.0)
-        participant_grids.append(participant_grid)
+    with profile_stage('metrics'):
+        # Mark the cells visited by each participant's trajectory
+        occupancy, num_trajectories = trajectory_occupancy(all_trajectories, window_width, window_height,
+                                                           grid_resolution)
+    render_trajectory_heatmap(occupancy, num_trajectories, tunnel_path, tunnel_width, window_width, window_height,
+                              save_path, title, geometry)
+
+
+def render_trajectory_heatmap(occupancy, num_trajectories, tunnel_path, tunnel_width,
+                              window_width=0.4608, window_height=0.2592, save_path="trajectory_heatmap.png",
+                              title="Trajectory Overlap Density", geometry=None):
+    """Draw the trajectory overlap heatmap from accumulated cell visit counts.
     
-    if not participant_grids:
+    Args:
+        occupancy (np.ndarray): Visit counts as returned by trajectory_occupancy, possibly
+            summed over several batches of participants
+        num_trajectories (int): Number of trajectories behind the counts
+        tunnel_path (list): List of (x, y) tuples representing tunnel centerline
+        tunnel_width (float): Width of the tunnel
+        window_width (float): Width of the environment
+        window_height (float): Height of the environment
+        save_path (str): Path to save the heatmap
+        title (str): Title of the heatmap
+        geometry (dict): Optional tunnel geometry from get_tunnel_geometry
+    """
+    if num_trajectories == 0:
         print("Warning: No trajectory data found for heatmap")
         return
     
-    # Calculate overlap density by summing all participant grids
-    # Areas where more participants passed through will have higher values
-    overlap_density = np.sum(participant_grids, axis=0)
+    with profile_stage('metrics'):
+        # Calculate overlap density: number of participants passing through each cell,
+        # smoothed into a continuous trajectory representation (the Gaussian filter is
+        # linear, so smoothing the sum equals summing the per-participant smoothed grids)
+        overlap_density = ndimage.gaussian_filter(occupancy, sigma=2.0)
     
-    # Normalize to show overlap percentage
-    max_possible_overlap = len(participant_grids)
-    overlap_percentage = overlap_density / max_possible_overlap
+        # Normalize to show overlap percentage
+        max_possible_overlap = num_trajectories
+        overlap_percentage = overlap_density / max_possible_overlap
     
     # Create the plot
     fig, ax = plt.subplots(figsize=(12, 8))
@@ -260,15 +197,18 @@ def create_trajectory_heatmap(all_trajectories, tunnel_path, tunnel_width,
                    vmin=0, vmax=max_overlap_threshold)
     
     # Draw tunnel boundaries
-    tunnel_path = np.array(tunnel_path)
-    xs, ys = tunnel_path[:, 0], tunnel_path[:, 1]
-    half_width = tunnel_width / 2.0
-    upper_boundary = ys + half_width
-    lower_boundary = ys - half_width
-    
-    ax.plot(xs, upper_boundary, color='black', linestyle='-', linewidth=2, label="Tunnel Boundary")
-    ax.plot(xs, lower_boundary, color='black', linestyle='-', linewidth=2)
-    ax.fill_between(xs, lower_boundary, upper_boundary, color='lightgray', alpha=0.3)
+    if geometry is not None:
+        draw_tunnel_geometry(ax, geometry)
+    else:
+        tunnel_path = np.array(tunnel_path)
+        xs, ys = tunnel_path[:, 0], tunnel_path[:, 1]
+        half_width = tunnel_width / 2.0
+        upper_boundary = ys + half_width
+        lower_boundary = ys - half_width
+        
+        ax.plot(xs, upper_boundary, color='black', linestyle='-', linewidth=2, label="Tunnel Boundary")
+        ax.plot(xs, lower_boundary, color='black', linestyle='-', linewidth=2)
+        ax.fill_between(xs, lower_boundary, upper_boundary, color='lightgray', alpha=0.3)
     
     # Add colorbar with percentage labels
     cbar = plt.colorbar(im, ax=ax)
@@ -283,114 +223,171 @@ def create_trajectory_heatmap(all_trajectories, tunnel_path, tunnel_width,
     ax.set_ylim(0, window_height)
     ax.set_xlabel("X position (m)")
     ax.set_ylabel("Y position (m)")
-    ax.set_title(f"{title}\n({len(participant_grids)} participants)")
+    ax.set_title(f"{title}\n({num_trajectories} participants)")
     ax.legend()
     
     # Add text showing number of participants
-    ax.text(0.02, 0.98, f'Participants: {len(participant_grids)}', 
+    ax.text(0.02, 0.98, f'Participants: {num_trajectories}', 
             transform=ax.transAxes, fontsize=10, verticalalignment='top',
             bbox=dict(boxstyle='round', facecolor='white', alpha=0.9, edgecolor='black'))
     
     plt.tight_layout()
-    plt.savefig(save_path, dpi=300, bbox_inches='tight')
+    with profile_stage('savefig'):
+        plt.savefig(save_path, dpi=300, bbox_inches='tight')
     plt.close()
     print(f"Trajectory overlap heatmap saved to {save_path}")
 
 
-def create_acceleration_frequency_heatmap(all_trajectories, all_accelerations, tunnel_path, tunnel_width,
-                                         window_width=0.4608, window_height=0.2592,
-                                         num_segments=20, save_path="acceleration_frequency_heatmap.png",
-                                         title="Acceleration/Deceleration Frequency Hot Spots"):
-    """Create a heatmap showing acceleration/deceleration frequency for tunnel segments.
+def tunnel_segments(tunnel_path, tunnel_width, num_segments=20, geometry=None):
+    """Split the tunnel into segments of equal arc length along its centerline.
     
     Args:
-        all_trajectories (list): List of trajectory lists from all participants
-        all_accelerations (list): List of signed tangential acceleration lists from all participants
         tunnel_path (list): List of (x, y) tuples representing tunnel centerline
         tunnel_width (float): Width of the tunnel
-        window_width (float): Width of the environment
-        window_height (float): Height of the environment
         num_segments (int): Number of tunnel segments to create
-        save_path (str): Path to save the heatmap
-        title (str): Title of the heatmap
+        geometry (dict): Optional tunnel geometry from get_tunnel_geometry; when given,
+            segments follow its walls
+        
+    Returns:
+        tuple: (segment_edges, segments, upper_boundary, lower_boundary) - arc lengths of the
+               segment ends, one dict per segment (center, start_arc, end_arc, outline, width)
+               and the two walls
     """
-    # Create tunnel segments
     tunnel_path = np.array(tunnel_path)
     xs, ys = tunnel_path[:, 0], tunnel_path[:, 1]
+    arc_length = cumulative_arc_length(tunnel_path)
+    if geometry is not None and len(geometry['upper_boundary']) == len(tunnel_path):
+        upper_boundary, lower_boundary = geometry['upper_boundary'], geometry['lower_boundary']
+    else:
+        # Walls only cover part of partially unconstrained tunnels; segments keep a nominal width
+        half_width = tunnel_width / 2.0
+        upper_boundary = np.column_stack([xs, ys + half_width])
+        lower_boundary = np.column_stack([xs, ys - half_width])
+    segment_edges = np.linspace(0, arc_length[-1], num_segments + 1)
     
-    # Create segments along the tunnel path
-    segment_length = len(xs) / num_segments
     segments = []
-    
     for i in range(num_segments):
-        start_idx = int(i * segment_length)
-        end_idx = int((i + 1) * segment_length)
-        if end_idx >= len(xs):
-            end_idx = len(xs) - 1
+        start_arc, end_arc = segment_edges[i], segment_edges[i + 1]
         
-        # Get segment center and boundaries
-        segment_x = np.mean(xs[start_idx:end_idx+1])
-        segment_y = np.mean(ys[start_idx:end_idx+1])
-        segment_width = tunnel_width
+        # Segment outline: both walls at the interpolated end points and the centerline points in between
+        interior = (arc_length > start_arc) & (arc_length < end_arc)
+        walls = []
+        for boundary in (upper_boundary, lower_boundary):
+            walls.append(np.vstack([[np.interp(start_arc, arc_length, boundary[:, 0]),
+                                     np.interp(start_arc, arc_length, boundary[:, 1])],
+                                    boundary[interior],
+                                    [np.interp(end_arc, arc_length, boundary[:, 0]),
+                                     np.interp(end_arc, arc_length, boundary[:, 1])]]))
         
         segments.append({
-            'center': (segment_x, segment_y),
-            'start_idx': start_idx,
-            'end_idx': end_idx,
-            'width': segment_width,
-            'acceleration_count': 0,
-            'deceleration_count': 0,
-            'total_count': 0
+            'center': (np.interp((start_arc + end_arc) / 2, arc_length, xs),
+                       np.interp((start_arc + end_arc) / 2, arc_length, ys)),
+            'start_arc': start_arc,
+            'end_arc': end_arc,
+            'outline': np.vstack([walls[0], walls[1][::-1]]),
+            'width': tunnel_width,
         })
+    return segment_edges, segments, upper_boundary, lower_boundary
+
+
+def segment_acceleration_counts(all_trajectories, all_accelerations, tunnel_path, tunnel_width, num_segments=20,
+                                geometry=None, distance_field=None):
+    """Count the in-tunnel samples, and those accelerating or decelerating, in each tunnel segment.
     
-    # Process each participant's data
-    for trajectory, accelerations in zip(all_trajectories, all_accelerations):
-        if not trajectory or not accelerations:
-            continue
-            
-        trajectory = np.array(trajectory)
-        accelerations = np.array(accelerations)
+    Args:
+        all_trajectories (list): List of trajectory lists from all participants
+        all_accelerations (list): List of signed tangential acceleration lists from all participants
+        tunnel_path (list): List of (x, y) tuples representing tunnel centerline
+        tunnel_width (float): Width of the tunnel
+        num_segments (int): Number of equal arc-length tunnel segments
+        geometry (dict): Optional tunnel geometry; when given, samples are tested against its
+            boundary polygons
+        distance_field (dict): Optional distance field from get_distance_field; when given, the
+            inside test is a bilinear lookup instead of a geometric query
         
-        # Ensure same length
-        min_len = min(len(trajectory), len(accelerations))
-        trajectory = trajectory[:min_len]
-        accelerations = accelerations[:min_len]
+    Returns:
+        tuple: (total_counts, acceleration_counts, deceleration_counts) arrays of num_segments
+    """
+    tunnel_path = np.array(tunnel_path)
+    segment_edges = np.linspace(0, cumulative_arc_length(tunnel_path)[-1], num_segments + 1)
+    
+    # Assign every in-tunnel sample to the arc-length bin of its projection onto the centerline
+    points, point_accelerations = stack_trajectory_samples(all_trajectories, all_accelerations)
+    arc_positions, inside = project_points_to_arc_length(points, tunnel_path, tunnel_width)
+    if distance_field is not None:
+        inside = points_in_tunnel_field(distance_field, points)
+    elif geometry is not None:
+        inside = points_in_tunnel(geometry, points)
+    
+    segment_ids = np.clip(np.searchsorted(segment_edges, arc_positions[inside], side='right') - 1,
+                          0, num_segments - 1)
+    inside_accelerations = point_accelerations[inside]
+    
+    total_counts = np.bincount(segment_ids, minlength=num_segments)
+    acceleration_counts = np.bincount(segment_ids[inside_accelerations > 0], minlength=num_segments)
+    deceleration_counts = np.bincount(segment_ids[inside_accelerations < 0], minlength=num_segments)
+    return total_counts, acceleration_counts, deceleration_counts
+
+
+def create_acceleration_frequency_heatmap(all_trajectories, all_accelerations, tunnel_path, tunnel_width,
+                                         window_width=0.4608, window_height=0.2592,
+                                         num_segments=20, save_path="acceleration_frequency_heatmap.png",
+                                         title="Acceleration/Deceleration Frequency Hot Spots", geometry=None, distance_field=None):
+    """Create a heatmap showing acceleration/deceleration frequency for tunnel segments.
+    
+    Args:
+        all_trajectories (list): List of trajectory lists from all participants
+        all_accelerations (list): List of signed tangential acceleration lists from all participants
+        tunnel_path (list): List of (x, y) tuples representing tunnel centerline
+        tunnel_width (float): Width of the tunnel
+        window_width (float): Width of the environment
+        window_height (float): Height of the environment
+        num_segments (int): Number of tunnel segments to create
+        save_path (str): Path to save the heatmap
+        title (str): Title of the heatmap
+        geometry (dict): Optional tunnel geometry from get_tunnel_geometry; when given, samples
+            are tested against its boundary polygons and segments follow its walls
+        distance_field (dict): Optional distance field from get_distance_field; when given, the
+            inside test is a bilinear lookup instead of a geometric query
+    """
+    with profile_stage('metrics'):
+        segment_counts = segment_acceleration_counts(all_trajectories, all_accelerations, tunnel_path, tunnel_width,
+                                                     num_segments, geometry, distance_field)
+    render_acceleration_frequency_heatmap(segment_counts, len(all_trajectories), tunnel_path, tunnel_width,
+                                          window_width, window_height, num_segments, save_path, title, geometry)
+
+
+def render_acceleration_frequency_heatmap(segment_counts, num_trajectories, tunnel_path, tunnel_width,
+                                          window_width=0.4608, window_height=0.2592, num_segments=20,
+                                          save_path="acceleration_frequency_heatmap.png",
+                                          title="Acceleration/Deceleration Frequency Hot Spots", geometry=None):
+    """Draw the acceleration/deceleration frequency heatmap from accumulated segment counts.
+    
+    Args:
+        segment_counts (tuple): (total_counts, acceleration_counts, deceleration_counts) as
+            returned by segment_acceleration_counts, possibly summed over several batches
+        num_trajectories (int): Number of trajectories behind the counts
+        tunnel_path (list): List of (x, y) tuples representing tunnel centerline
+        tunnel_width (float): Width of the tunnel
+        window_width (float): Width of the environment
+        window_height (float): Height of the environment
+        num_segments (int): Number of tunnel segments
+        save_path (str): Path to save the heatmap
+        title (str): Title of the heatmap
+        geometry (dict): Optional tunnel geometry from get_tunnel_geometry
+    """
+    with profile_stage('metrics'):
+        _, segments, upper_boundary, lower_boundary = tunnel_segments(tunnel_path, tunnel_width, num_segments, geometry)
+        total_counts, acceleration_counts, deceleration_counts = segment_counts
         
-        # For each trajectory point, find which segment it belongs to
-        for point, acc in zip(trajectory, accelerations):
-            point_x, point_y = point
-            
-            # Find the closest segment
-            min_distance = float('inf')
-            closest_segment = None
-            
-            for segment in segments:
-                seg_x, seg_y = segment['center']
-                distance = np.sqrt((point_x - seg_x)**2 + (point_y - seg_y)**2)
-                
-                # Check if point is within tunnel width of the segment
-                if distance <= tunnel_width / 2:
-                    if distance < min_distance:
-                        min_distance = distance
-                        closest_segment = segment
-            
-            # If point is within a segment, count the acceleration/deceleration
-            if closest_segment is not None:
-                closest_segment['total_count'] += 1
-                if acc > 0:
-                    closest_segment['acceleration_count'] += 1
-                elif acc < 0:
-                    closest_segment['deceleration_count'] += 1
-    
-    # Calculate frequencies for each segment
-    num_participants = len(all_trajectories)
-    for segment in segments:
-        if segment['total_count'] > 0:
-            segment['acceleration_freq'] = segment['acceleration_count'] / num_participants
-            segment['deceleration_freq'] = segment['deceleration_count'] / num_participants
-        else:
-            segment['acceleration_freq'] = 0
-            segment['deceleration_freq'] = 0
+        # Calculate frequencies for each segment
+        for i, segment in enumerate(segments):
+            if total_counts[i] > 0:
+                segment['acceleration_freq'] = int(acceleration_counts[i]) / num_trajectories
+                segment['deceleration_freq'] = int(deceleration_counts[i]) / num_trajectories
+            else:
+                segment['acceleration_freq'] = 0
+                segment['deceleration_freq'] = 0
     
     # Create the plot
     fig, ax = plt.subplots(figsize=(12, 8))
@@ -399,12 +396,6 @@ def create_acceleration_frequency_heatmap(all_trajectories, all_accelerations, t
     
     # Draw each segment with appropriate color, following the tunnel path
     for i, segment in enumerate(segments):
-        # Get segment path points
-        start_idx = segment['start_idx']
-        end_idx = segment['end_idx']
-        segment_xs = xs[start_idx:end_idx+1]
-        segment_ys = ys[start_idx:end_idx+1]
-        
         # Calculate color based on frequency
         acc_freq = segment['acceleration_freq']
         dec_freq = segment['deceleration_freq']
@@ -428,22 +419,12 @@ def create_acceleration_frequency_heatmap(all_trajectories, all_accelerations, t
             # Constant speed or very low frequency
             color = (1.0, 1.0, 1.0)  # Pure white
         
-        # Create segment boundaries following the tunnel path
-        half_width = tunnel_width / 2.0
-        upper_boundary = segment_ys + half_width
-        lower_boundary = segment_ys - half_width
-        
-        # Fill the segment area
-        ax.fill_between(segment_xs, lower_boundary, upper_boundary, 
-                       color=color, alpha=0.8, edgecolor='none')
+        # Fill the segment area between the tunnel walls
+        ax.fill(segment['outline'][:, 0], segment['outline'][:, 1], color=color, alpha=0.8, edgecolor='none')
     
     # Draw tunnel boundaries
-    half_width = tunnel_width / 2.0
-    upper_boundary = ys + half_width
-    lower_boundary = ys - half_width
-    
-    ax.plot(xs, upper_boundary, color='black', linestyle='-', linewidth=2, label="Tunnel Boundary")
-    ax.plot(xs, lower_boundary, color='black', linestyle='-', linewidth=2)
+    ax.plot(upper_boundary[:, 0], upper_boundary[:, 1], color='black', linestyle='-', linewidth=2, label="Tunnel Boundary")
+    ax.plot(lower_boundary[:, 0], lower_boundary[:, 1], color='black', linestyle='-', linewidth=2)
     
     # Add colorbar showing both red and blue gradients
     from matplotlib.colors import LinearSegmentedColormap
@@ -468,24 +449,69 @@ def create_acceleration_frequency_heatmap(all_trajectories, all_accelerations, t
     ax.set_ylim(0, window_height)
     ax.set_xlabel("X position (m)")
     ax.set_ylabel("Y position (m)")
-    ax.set_title(f"{title}\n({len(all_trajectories)} participants, {num_segments} segments)")
+    ax.set_title(f"{title}\n({num_trajectories} participants, {num_segments} segments)")
     ax.legend()
     
     # Add text showing number of participants and segments
-    ax.text(0.02, 0.98, f'Participants: {len(all_trajectories)}\nSegments: {num_segments}', 
+    ax.text(0.02, 0.98, f'Participants: {num_trajectories}\nSegments: {num_segments}', 
             transform=ax.transAxes, fontsize=10, verticalalignment='top',
             bbox=dict(boxstyle='round', facecolor='white', alpha=0.9, edgecolor='black'))
     
     plt.tight_layout()
-    plt.savefig(save_path, dpi=300, bbox_inches='tight')
+    with profile_stage('savefig'):
+        plt.savefig(save_path, dpi=300, bbox_inches='tight')
     plt.close()
     print(f"Acceleration/Deceleration frequency heatmap saved to {save_path}")
 
 
+def acceleration_magnitude_sums(all_trajectories, all_accelerations, tunnel_path, tunnel_width,
+                                window_width=0.4608, window_height=0.2592, grid_resolution=50,
+                                geometry=None, distance_field=None):
+    """Sum the positive and negative accelerations of the in-tunnel samples at each grid point.
+    
+    Args:
+        all_trajectories (list): List of trajectory lists from all participants
+        all_accelerations (list): List of signed tangential acceleration lists from all participants
+        tunnel_path (list): List of (x, y) tuples representing tunnel centerline
+        tunnel_width (float): Width of the tunnel
+        window_width (float): Width of the window in meters
+        window_height (float): Height of the window in meters
+        grid_resolution (int): Resolution of the grid for the heatmap
+        geometry (dict): Optional tunnel geometry; when given, samples are tested against its
+            boundary polygons
+        distance_field (dict): Optional distance field from get_distance_field; when given, the
+            inside test is a bilinear lookup instead of a geometric query
+        
+    Returns:
+        tuple: (acceleration_grid, deceleration_grid) - unsmoothed sums of acceleration and of
+               deceleration magnitude, (grid_resolution, grid_resolution) each
+    """
+    # Check all participants' samples against the tunnel in one batched query
+    points, point_accelerations = stack_trajectory_samples(all_trajectories, all_accelerations)
+    if distance_field is not None:
+        inside = points_in_tunnel_field(distance_field, points)
+    elif geometry is not None:
+        inside = points_in_tunnel(geometry, points)
+    else:
+        _, _, _, inside = project_points_to_tunnel(points, tunnel_path, tunnel_width)
+    points = points[inside]
+    point_accelerations = point_accelerations[inside]
+    
+    # Sum positive and negative acceleration at the closest grid point of each in-tunnel sample
+    x_idx, y_idx = grid_cell_indices(points, window_width, window_height, grid_resolution, snap='nearest')
+    accelerating = point_accelerations > 0
+    decelerating = point_accelerations < 0
+    acceleration_grid = accumulate_grid(x_idx[accelerating], y_idx[accelerating], grid_resolution,
+                                        weights=point_accelerations[accelerating])
+    deceleration_grid = accumulate_grid(x_idx[decelerating], y_idx[decelerating], grid_resolution,
+                                        weights=-point_accelerations[decelerating])
+    return acceleration_grid, deceleration_grid
+
+
 def create_acceleration_magnitude_heatmap(all_trajectories, all_accelerations, tunnel_path, tunnel_width,
                                          window_width=0.4608, window_height=0.2592,
                                          grid_resolution=50, save_path="acceleration_magnitude_heatmap.png",
-                                         title="Acceleration/Deceleration Magnitude Hot Spots"):
+                                         title="Acceleration/Deceleration Magnitude Hot Spots", geometry=None, distance_field=None):
     """Create a heatmap showing acceleration/deceleration magnitude using grid-based approach.
     
     Args:
@@ -498,54 +524,49 @@ def create_acceleration_magnitude_heatmap(all_trajectories, all_accelerations, t
         grid_resolution (int): Resolution of the grid for the heatmap
         save_path (str): Path to save the heatmap
         title (str): Title for the heatmap
+        geometry (dict): Optional tunnel geometry from get_tunnel_geometry; when given, samples
+            are tested against its boundary polygons, which are also drawn
+        distance_field (dict): Optional distance field from get_distance_field; when given, the
+            inside test is a bilinear lookup instead of a geometric query
     """
-    # Create coordinate arrays
-    x_coords = np.linspace(0, window_width, grid_resolution)
-    y_coords = np.linspace(0, window_height, grid_resolution)
-    X, Y = np.meshgrid(x_coords, y_coords)
+    with profile_stage('metrics'):
+        acceleration_grid, deceleration_grid = acceleration_magnitude_sums(
+            all_trajectories, all_accelerations, tunnel_path, tunnel_width, window_width, window_height,
+            grid_resolution, geometry, distance_field)
+    render_acceleration_magnitude_heatmap(acceleration_grid, deceleration_grid, len(all_trajectories), tunnel_path,
+                                          tunnel_width, window_width, window_height, save_path, title, geometry)
+
+
+def render_acceleration_magnitude_heatmap(acceleration_grid, deceleration_grid, num_trajectories, tunnel_path,
+                                          tunnel_width, window_width=0.4608, window_height=0.2592,
+                                          save_path="acceleration_magnitude_heatmap.png",
+                                          title="Acceleration/Deceleration Magnitude Hot Spots", geometry=None):
+    """Draw the acceleration/deceleration magnitude heatmap from accumulated grid sums.
     
-    # Initialize grids for positive and negative acceleration
-    acceleration_grid = np.zeros((grid_resolution, grid_resolution))
-    deceleration_grid = np.zeros((grid_resolution, grid_resolution))
+    Args:
+        acceleration_grid (np.ndarray): Acceleration sums as returned by acceleration_magnitude_sums,
+            possibly summed over several batches of participants
+        deceleration_grid (np.ndarray): Matching deceleration magnitude sums
+        num_trajectories (int): Number of trajectories behind the sums
+        tunnel_path (list): List of (x, y) tuples representing tunnel centerline
+        tunnel_width (float): Width of the tunnel
+        window_width (float): Width of the window in meters
+        window_height (float): Height of the window in meters
+        save_path (str): Path to save the heatmap
+        title (str): Title for the heatmap
+        geometry (dict): Optional tunnel geometry from get_tunnel_geometry
+    """
+    with profile_stage('metrics'):
+        # Smooth the grids
+        acceleration_grid = gaussian_filter(acceleration_grid, sigma=1.0)
+        deceleration_grid = gaussian_filter(deceleration_grid, sigma=1.0)
     
-    # Process each participant's data
-    for trajectory, accelerations in zip(all_trajectories, all_accelerations):
-        if not trajectory or not accelerations:
-            continue
-            
-        trajectory = np.array(trajectory)
-        accelerations = np.array(accelerations)
-        
-        # Ensure same length
-        min_len = min(len(trajectory), len(accelerations))
-        trajectory = trajectory[:min_len]
-        accelerations = accelerations[:min_len]
-        
-        # For each trajectory point, add to the appropriate grid
-        for point, acc in zip(trajectory, accelerations):
-            point_x, point_y = point
-            
-            # Find the closest grid point
-            x_idx = np.argmin(np.abs(x_coords - point_x))
-            y_idx = np.argmin(np.abs(y_coords - point_y))
-            
-            # Check if point is within tunnel boundaries
-            if is_point_in_tunnel(point_x, point_y, tunnel_path, tunnel_width):
-                if acc > 0:
-                    acceleration_grid[y_idx, x_idx] += acc
-                elif acc < 0:
-                    deceleration_grid[y_idx, x_idx] += abs(acc)
-    
-    # Smooth the grids
-    acceleration_grid = gaussian_filter(acceleration_grid, sigma=1.0)
-    deceleration_grid = gaussian_filter(deceleration_grid, sigma=1.0)
-    
-    # Combine grids (positive for acceleration, negative for deceleration)
-    combined_grid = acceleration_grid - deceleration_grid
-    
-    # Set reasonable boundaries for consistent visualization
-    max_acceleration_value = 20.0
-    combined_grid = np.clip(combined_grid, -max_acceleration_value, max_acceleration_value)
+        # Combine grids (positive for acceleration, negative for deceleration)
+        combined_grid = acceleration_grid - deceleration_grid
+    
+        # Set reasonable boundaries for consistent visualization
+        max_acceleration_value = 20.0
+        combined_grid = np.clip(combined_grid, -max_acceleration_value, max_acceleration_value)
     
     # Create the plot
     fig, ax = plt.subplots(figsize=(12, 8))
@@ -558,13 +579,16 @@ def create_acceleration_magnitude_heatmap(all_trajectories, all_accelerations, t
                    vmin=-max_acceleration_value, vmax=max_acceleration_value, alpha=0.8)
     
     # Draw tunnel boundaries
-    xs, ys = zip(*tunnel_path)
-    half_width = tunnel_width / 2.0
-    upper_boundary = np.array(ys) + half_width
-    lower_boundary = np.array(ys) - half_width
-    
-    ax.plot(xs, upper_boundary, color='black', linestyle='-', linewidth=2, label="Tunnel Boundary")
-    ax.plot(xs, lower_boundary, color='black', linestyle='-', linewidth=2)
+    if geometry is not None:
+        draw_tunnel_geometry(ax, geometry, fill_color=None)
+    else:
+        xs, ys = zip(*tunnel_path)
+        half_width = tunnel_width / 2.0
+        upper_boundary = np.array(ys) + half_width
+        lower_boundary = np.array(ys) - half_width
+        
+        ax.plot(xs, upper_boundary, color='black', linestyle='-', linewidth=2, label="Tunnel Boundary")
+        ax.plot(xs, lower_boundary, color='black', linestyle='-', linewidth=2)
     
     # Add colorbar
     cbar = plt.colorbar(im, ax=ax)
@@ -583,252 +607,501 @@ def create_acceleration_magnitude_heatmap(all_trajectories, all_accelerations, t
     ax.legend()
     
     # Add participant count
-    num_participants = len(all_trajectories)
-    ax.text(0.02, 0.98, f'Participants: {num_participants}', transform=ax.transAxes, 
+    ax.text(0.02, 0.98, f'Participants: {num_trajectories}', transform=ax.transAxes, 
             fontsize=12, verticalalignment='top', horizontalalignment='left',
             bbox=dict(boxstyle='round', facecolor='white', alpha=0.9, edgecolor='black'))
     
     plt.tight_layout()
-    plt.savefig(save_path, dpi=300, bbox_inches='tight')
+    with profile_stage('savefig'):
+        plt.savefig(save_path, dpi=300, bbox_inches='tight')
     plt.close()
     print(f"Acceleration/Deceleration magnitude heatmap saved to {save_path}")
 
 
-def process_trial_data_for_heatmaps(trial_data_list, trial_id):
+def process_trial_data_for_heatmaps(trial_references, trial_id):
     """Process trial data from multiple participants for heatmap generation.
     
     Args:
-        trial_data_list (list): List of trial data from all participants
+        trial_references (list): (participant_index, participant_id, trial) references
+            for one trial condition, as returned by select_trial_references
         trial_id (int): Trial ID to process
         
     Returns:
         tuple: (all_trajectories, all_accelerations, condition) or (None, None, None) if no data
     """
     all_trajectories = []
-    all_accelerations = []
+    trial_timestamps = []
     condition = None
     
-    for participant_data in trial_data_list:
-        # Find the specific trial
-        trial_data = None
-        for trial in participant_data.get('trialData', []):
-            if trial.get('trialId') == trial_id:
-                trial_data = trial
-                break
-        
-        if not trial_data:
-            continue
-            
+    for _, _, trial_data in trial_references:
         # Extract trajectory
         trajectory = trial_data.get('trajectory', [])
-        if not trajectory:
+        if len(trajectory) == 0:
             continue
-            
-        # Convert trajectory format
-        if isinstance(trajectory[0], dict):
-            trajectory = [(point['x'], point['y']) for point in trajectory]
-        
-        all_trajectories.append(trajectory)
-        
-        # Calculate tangential accelerations
-        timestamps = trial_data.get('timestamps', [])
-        if timestamps and len(timestamps) == len(trajectory):
-            accelerations = calculate_tangential_acceleration(trajectory, timestamps)
-        else:
-            # Fallback: calculate from trajectory only
-            accelerations = []
-            for i in range(2, len(trajectory)):
-                p1 = np.array(trajectory[i-2])
-                p2 = np.array(trajectory[i-1])
-                p3 = np.array(trajectory[i])
-                
-                # Calculate speed changes as approximation of tangential acceleration
-                speed1 = np.linalg.norm(p2 - p1)
-                speed2 = np.linalg.norm(p3 - p2)
-                acc = speed2 - speed1  # Signed tangential acceleration
-                accelerations.append(acc)
-            accelerations = [0, 0] + accelerations  # Pad to match trajectory length
         
-        all_accelerations.append(accelerations)
+        all_trajectories.append(trajectory_to_array(trajectory))
+        trial_timestamps.append(trial_data.get('timestamps', []))
         
-        # Store condition (should be the same for all participants)
+        # References of one group share their condition
         if condition is None:
             condition = trial_data.get('condition', {})
     
     if not all_trajectories:
         return None, None, None
-        
+    
+    # Calculate tangential accelerations for every participant in one batch;
+    # trials without matching timestamps fall back to changes in step length
+    lengths = [len(trajectory) for trajectory in all_trajectories]
+    offsets = offsets_from_lengths(lengths)
+    timed = np.array([len(timestamps) > 0 and len(timestamps) == length
+                      for timestamps, length in zip(trial_timestamps, lengths)])
+    timestamps = np.zeros(offsets[-1])
+    for i in np.flatnonzero(timed):
+        timestamps[offsets[i]:offsets[i + 1]] = trial_timestamps[i]
+    
+    accelerations = tangential_accelerations(np.concatenate(all_trajectories), offsets, timestamps, timed)
+    all_accelerations = split_by_offsets(accelerations, offsets)
+    
+    # Timed trials that are too short have no accelerations
+    for i in np.flatnonzero(timed & (np.array(lengths) < 3)):
+        all_accelerations[i] = all_accelerations[i][:0]
+    
     return all_trajectories, all_accelerations, condition
 
 
-def analyze_trial_heatmaps(trial_data_list, output_dir, trial_id):
-    """Generate heatmaps for a specific trial across all participants.
+def compute_heatmap_sums(all_trajectories, all_accelerations, geometry, distance_field=None, num_segments=20):
+    """Compute the additive sums behind a trial's three heatmaps.
+    
+    Sums of separate batches of participants can be added up with add_heatmap_sums and
+    rendered with render_trial_heatmaps as if the batches had been analyzed together.
     
     Args:
-        trial_data_list (list): List of participant data
-        output_dir (str): Directory to save heatmaps
-        trial_id (int): Trial ID to analyze
+        all_trajectories (list): List of trajectory arrays from all participants
+        all_accelerations (list): List of signed tangential acceleration arrays from all participants
+        geometry (dict): Tunnel geometry from get_tunnel_geometry
+        distance_field (dict): Optional distance field from get_distance_field
+        num_segments (int): Number of arc-length segments in the acceleration frequency heatmap
+        
+    Returns:
+        dict: num_trajectories, occupancy (trajectory heatmap cell visits), segment_total,
+              segment_acceleration and segment_deceleration (only for tunnels with a centerline)
+              and the unsmoothed acceleration and deceleration magnitude grids
     """
-    # Process trial data
-    all_trajectories, all_accelerations, condition = process_trial_data_for_heatmaps(trial_data_list, trial_id)
-    
-    if all_trajectories is None:
-        print(f"No data found for trial {trial_id}")
-        return
-    
-    print(f"Processing trial {trial_id} with {len(all_trajectories)} participants")
+    tunnel_path = geometry['centerline']
+    tunnel_width = geometry['tunnel_width']
+    sums = {}
+    sums['occupancy'], sums['num_trajectories'] = trajectory_occupancy(
+        all_trajectories, grid_resolution=TRAJECTORY_GRID_RESOLUTION)
+    if len(tunnel_path) > 1:
+        sums['segment_total'], sums['segment_acceleration'], sums['segment_deceleration'] = \
+            segment_acceleration_counts(all_trajectories, all_accelerations, tunnel_path, tunnel_width,
+                                        num_segments, geometry, distance_field)
+    sums['acceleration'], sums['deceleration'] = acceleration_magnitude_sums(
+        all_trajectories, all_accelerations, tunnel_path, tunnel_width,
+        grid_resolution=MAGNITUDE_GRID_RESOLUTION, geometry=geometry, distance_field=distance_field)
+    return sums
+
+
+def trial_heatmap_outputs(label):
+    """Paths of a trial condition's heatmaps relative to the output directory.
     
-    # Generate tunnel path
-    tunnel_type = condition.get('tunnelType', 'curved')
-    tunnel_path = None
-    tunnel_width = None
+    Args:
+        label (str): Name of the trial condition, as returned by trial_group_labels
+        
+    Returns:
+        list: Trajectory, acceleration frequency and acceleration magnitude heatmap paths
+    """
+    trial_dir = Path(f"trial_{label}")
+    return [trial_dir / f"trajectory_heatmap_trial_{label}.png",
+            trial_dir / f"acceleration_frequency_heatmap_trial_{label}.png",
+            trial_dir / f"acceleration_magnitude_heatmap_trial_{label}.png"]
+
+
+def render_trial_heatmaps(sums, condition, geometry, output_dir, trial_id, num_segments=20, label=None):
+    """Draw the three heatmaps of a trial condition from its (possibly accumulated) sums.
     
-    if tunnel_type == 'sequential':
-        tunnel_path, segment_widths = generate_sequential_tunnel_path(condition)
-        tunnel_width = np.mean(segment_widths)  # Use average width
-    else:
-        tunnel_curvature = condition.get('curvature', 0.01)
-        tunnel_width = condition.get('tunnelWidth', 0.015)
-        tunnel_path = generate_tunnel_path(tunnel_curvature)
+    Args:
+        sums (dict): Sums as returned by compute_heatmap_sums
+        condition (dict): Trial condition, for the titles
+        geometry (dict): Tunnel geometry from get_tunnel_geometry
+        output_dir (str): Directory to save heatmaps
+        trial_id (int): Trial ID, for the titles
+        num_segments (int): Number of arc-length segments in the acceleration frequency heatmap
+        label (str): Name of the trial condition in the output paths (default: the trial ID)
+    """
+    label = str(trial_id) if label is None else label
+    tunnel_path = geometry['centerline']
+    tunnel_width = geometry['tunnel_width']
+    num_trajectories = sums['num_trajectories']
+    description = condition.get('description', 'Unknown condition')
     
     # Create output directory for this trial
-    trial_output_dir = Path(output_dir) / f"trial_{trial_id}"
+    trajectory_path, frequency_path, magnitude_path = (Path(output_dir) / output
+                                                       for output in trial_heatmap_outputs(label))
+    trial_output_dir = trajectory_path.parent
     trial_output_dir.mkdir(parents=True, exist_ok=True)
     
     # Generate trajectory heatmap
-    trajectory_heatmap_path = trial_output_dir / f"trajectory_heatmap_trial_{trial_id}.png"
-    trajectory_title = f"Trial {trial_id}: {condition.get('description', 'Unknown condition')} - Trajectory Overlap"
-    
-    create_trajectory_heatmap(
-        all_trajectories=all_trajectories,
-        tunnel_path=tunnel_path,
-        tunnel_width=tunnel_width,
-        save_path=str(trajectory_heatmap_path),
-        title=trajectory_title
-    )
-    
-    # Generate acceleration frequency heatmap
-    acceleration_freq_heatmap_path = trial_output_dir / f"acceleration_frequency_heatmap_trial_{trial_id}.png"
-    acceleration_freq_title = f"Trial {trial_id}: {condition.get('description', 'Unknown condition')} - Acceleration/Deceleration Frequency"
-    
-    create_acceleration_frequency_heatmap(
-        all_trajectories=all_trajectories,
-        all_accelerations=all_accelerations,
-        tunnel_path=tunnel_path,
-        tunnel_width=tunnel_width,
-        num_segments=20,
-        save_path=str(acceleration_freq_heatmap_path),
-        title=acceleration_freq_title
-    )
+    with profile_stage('draw'):
+        render_trajectory_heatmap(
+            sums['occupancy'], num_trajectories, tunnel_path, tunnel_width,
+            save_path=str(trajectory_path),
+            title=f"Trial {trial_id}: {description} - Trajectory Overlap",
+            geometry=geometry
+        )
+    
+    # Generate acceleration frequency heatmap (only tunnels with a centerline have arc-length segments)
+    if 'segment_total' in sums:
+        with profile_stage('draw'):
+            render_acceleration_frequency_heatmap(
+                (sums['segment_total'], sums['segment_acceleration'], sums['segment_deceleration']),
+                num_trajectories, tunnel_path, tunnel_width, num_segments=num_segments,
+                save_path=str(frequency_path),
+                title=f"Trial {trial_id}: {description} - Acceleration/Deceleration Frequency",
+                geometry=geometry
+            )
     
     # Generate acceleration magnitude heatmap
-    acceleration_mag_heatmap_path = trial_output_dir / f"acceleration_magnitude_heatmap_trial_{trial_id}.png"
-    acceleration_mag_title = f"Trial {trial_id}: {condition.get('description', 'Unknown condition')} - Acceleration/Deceleration Magnitude"
-    
-    create_acceleration_magnitude_heatmap(
-        all_trajectories=all_trajectories,
-        all_accelerations=all_accelerations,
-        tunnel_path=tunnel_path,
-        tunnel_width=tunnel_width,
-        grid_resolution=50,
-        save_path=str(acceleration_mag_heatmap_path),
-        title=acceleration_mag_title
-    )
+    with profile_stage('draw'):
+        render_acceleration_magnitude_heatmap(
+            sums['acceleration'], sums['deceleration'], num_trajectories, tunnel_path, tunnel_width,
+            save_path=str(magnitude_path),
+            title=f"Trial {trial_id}: {description} - Acceleration/Deceleration Magnitude",
+            geometry=geometry
+        )
+    
+    print(f"Heatmaps for trial {label} saved to {trial_output_dir}")
+
+
+def analyze_trial_heatmaps(trial_references, output_dir, trial_id, label=None, num_segments=20,
+                           cell_size=None, distance_field_dir=None, state_dir=None, condition_json=None):
+    """Generate heatmaps for one condition of a trial across all participants.
     
-    print(f"Heatmaps for trial {trial_id} saved to {trial_output_dir}")
+    Args:
+        trial_references (list): (participant_index, participant_id, trial) references for the
+            trial condition, as returned by select_trial_references
+        output_dir (str): Directory to save heatmaps
+        trial_id (int): Trial ID to analyze
+        label (str): Name of the trial condition in the output paths, as returned by
+            trial_group_labels (default: the trial ID)
+        num_segments (int): Number of arc-length segments in the acceleration frequency heatmap
+        cell_size (float): Grid spacing of the tunnel distance field in meters, or None to test
+            samples against the exact tunnel polygons
+        distance_field_dir (str): Directory of the distance fields built by the main process; a
+            field that is missing there is not built, the exact polygons are used instead
+        state_dir (str): Heatmap state directory; when given, the references are folded into the
+            trial condition's accumulated sums (skipping participants already in them) and the
+            heatmaps are rendered from the accumulated state
+        condition_json (str): Condition key of the trial condition; required with state_dir
+    """
+    label = str(trial_id) if label is None else label
+    with profile_trial(f"trial {label}", trial_id):
+        state = None
+        if state_dir is not None:
+            with profile_stage('load'):
+                state = load_trial_state(state_dir, trial_id, condition_json)
+            if state is not None:
+                folded = set(state['participants'])
+                trial_references = [reference for reference in trial_references if reference[1] not in folded]
+                if not trial_references:
+                    # Heatmaps whose files are missing, e.g. after the trial was renamed, are
+                    # drawn again from the state
+                    if all((Path(output_dir) / output).exists() for output in trial_heatmap_outputs(label)):
+                        print(f"No new participants for trial {label}")
+                        return
+                    print(f"Redrawing trial {label} from its state")
+                    condition = state['condition']
+                    with profile_stage('geometry'):
+                        geometry = get_tunnel_geometry(condition)
+                    render_trial_heatmaps(state['sums'], condition, geometry, output_dir, trial_id, num_segments,
+                                          label)
+                    return
+    
+        # Process trial data
+        with profile_stage('metrics'):
+            all_trajectories, all_accelerations, condition = process_trial_data_for_heatmaps(trial_references, trial_id)
+    
+        if all_trajectories is None:
+            print(f"No data found for trial {label}")
+            return
+    
+        num_participants = len({reference[0] for reference in trial_references})
+        if len(all_trajectories) == num_participants:
+            print(f"Processing trial {label} with {num_participants} participants")
+        else:
+            print(f"Processing trial {label} with {len(all_trajectories)} repetitions from {num_participants} participants")
+    
+        # Look up the shared tunnel geometry; its boundary polygons, or its prebuilt distance
+        # field, decide which samples are inside
+        with profile_stage('geometry'):
+            geometry = get_tunnel_geometry(condition)
+            distance_field = load_distance_field(condition, cell_size, distance_field_dir) if cell_size else None
+    
+        with profile_stage('metrics'):
+            sums = compute_heatmap_sums(all_trajectories, all_accelerations, geometry, distance_field, num_segments)
+    
+        if state_dir is not None:
+            participants = list(dict.fromkeys(reference[1] for reference in trial_references))
+            if state is None:
+                state = {'condition': condition, 'participants': [], 'sums': None}
+            state['participants'].extend(participants)
+            state['sums'] = sums = add_heatmap_sums(state['sums'], sums)
+            with profile_stage('save'):
+                save_trial_state(state_dir, trial_id, condition_json, state)
+            print(f"Trial {label} state now holds {len(state['participants'])} participants")
+    
+        render_trial_heatmaps(sums, condition, geometry, output_dir, trial_id, num_segments, label)
 
 
-def process_participant_data_for_heatmaps(input_dir, output_dir):
+def process_participant_data_for_heatmaps(input_dir, output_dir, cache_dir=None,
+                                         cache_bytes=DEFAULT_CACHE_BYTES, jobs=1, all_rounds=False,
+                                         num_segments=20, cell_size=None, state_dir=None,
+                                         force=False, dry_run=False):
     """Process all participant data files and generate heatmaps for each trial.
     
     Args:
         input_dir (str): Directory containing participant JSON files
         output_dir (str): Directory to store heatmap results
+        cache_dir (str): Directory of the parse cache, or None to always parse the JSON files
+        cache_bytes (int): Byte budget of the parse cache
+        jobs (int): Number of worker processes for trials (1 runs serially, 0 uses every CPU)
+        all_rounds (bool): Aggregate every repetition of a trial instead of each participant's first
+        num_segments (int): Number of arc-length segments in the acceleration frequency heatmap
+        cell_size (float): Grid spacing of the tunnel distance fields in meters, or None to test
+            samples against the exact tunnel polygons; fields are built in this process before
+            the trials run and stored next to the parse cache, so cache_dir is required
+        state_dir (str): Directory of persisted heatmap sums; when given, only participants not
+            accumulated yet are folded in and the trials they add to are re-rendered from the state
+        force (bool): Regenerate every trial even if the output manifest says it is up to date
+        dry_run (bool): Only list the trials whose heatmaps would be regenerated
+        
+    Returns:
+        list: (trial, error message) pairs for trials that failed
     """
     input_path = Path(input_dir)
     output_path = Path(output_dir)
     
     if not input_path.exists():
         print(f"Error: Input directory not found: {input_dir}")
-        return
+        return []
+    if cell_size and not cache_dir:
+        raise ValueError("Tunnel distance fields are stored in the cache directory; give a cache_dir to use them")
     
     # Create output directory if it doesn't exist
     output_path.mkdir(parents=True, exist_ok=True)
     
-    # Find all JSON files in the input directory
-    json_files = list(input_path.glob("*.json"))
-    
-    if not json_files:
-        print(f"No JSON files found in {input_dir}")
-        return
-    
-    print(f"Found {len(json_files)} JSON files to process")
-    print(f"Output directory: {output_path}")
-    print("-" * 50)
+    state_index = None
+    if state_dir:
+        state_index = open_heatmap_state(state_dir, {
+            'num_segments': num_segments,
+            'cell_size': cell_size,
+            'all_rounds': all_rounds,
+            'trajectory_grid_resolution': TRAJECTORY_GRID_RESOLUTION,
+            'magnitude_grid_resolution': MAGNITUDE_GRID_RESOLUTION,
+        })
     
-    # Load all participant data
+    # Load all participant data, either from a trajectory store or from JSON files
     all_participant_data = []
-    for json_file in json_files:
-        try:
-            with open(json_file, 'r') as f:
-                data = json.load(f)
-            
-            # Handle both individual participant files and combined experiment files
-            if isinstance(data, list):
-                # Combined experiment file - add each experiment as a separate participant
-                for experiment in data:
-                    all_participant_data.append(experiment)
-                    participant_id = experiment.get('participantId', 'unknown')
-                    print(f"Loaded data for participant: {participant_id}")
-            else:
-                # Individual participant file
-                all_participant_data.append(data)
-                participant_id = data.get('participantId', json_file.stem)
-                print(f"Loaded data for participant: {participant_id}")
-        except Exception as e:
-            print(f"Error loading {json_file.name}: {e}")
-            continue
+    if is_trajectory_store(input_path):
+        print(f"Reading trajectory store: {input_path}")
+        print(f"Output directory: {output_path}")
+        print("-" * 50)
+        all_participant_data = list(profile_iter('load', iter_store_participants(load_store(input_path))))
+    else:
+        # Find all JSON files in the input directory
+        json_files = list(input_path.glob("*.json"))
+        
+        if not json_files:
+            print(f"No JSON files found in {input_dir}")
+            return []
+        
+        if state_index is not None:
+            num_found = len(json_files)
+            json_files = pending_sources(state_index, json_files)
+            print(f"{num_found - len(json_files)} of {num_found} JSON files already folded into the heatmap state")
+            if not json_files:
+                print("Heatmap state is up to date")
+                return []
+        
+        print(f"Found {len(json_files)} JSON files to process")
+        print(f"Output directory: {output_path}")
+        print("-" * 50)
+        
+        # Handles both individual participant files and combined experiment files
+        if cache_dir:
+            participant_sources = iter_cached_participant_documents(json_files, cache_dir, cache_bytes)
+        else:
+            participant_sources = iter_participant_documents(json_files)
+        
+        for participant_data, json_file in profile_iter('load', participant_sources):
+            all_participant_data.append(participant_data)
+            participant_id = participant_data.get('participantId', json_file.stem)
+            print(f"Loaded data for participant: {participant_id}")
     
     if not all_participant_data:
         print("No valid participant data found")
-        return
+        return []
     
-    # Find all unique trial IDs across all participants
-    all_trial_ids = set()
-    for participant_data in all_participant_data:
-        for trial in participant_data.get('trialData', []):
-            trial_id = trial.get('trialId')
-            if trial_id is not None:
-                all_trial_ids.add(trial_id)
-    
-    print(f"Found {len(all_trial_ids)} unique trials: {sorted(all_trial_ids)}")
-    
-    # Generate heatmaps for each trial
-    for trial_id in sorted(all_trial_ids):
-        try:
-            analyze_trial_heatmaps(all_participant_data, output_path, trial_id)
-        except Exception as e:
-            print(f"Error processing trial {trial_id}: {e}")
-            continue
+    # Index all trials once by (trial ID, round, condition); each condition of a trial ID is
+    # analyzed on its own, over all of its rounds
+    with profile_stage('index'):
+        trial_index = build_trial_index(all_participant_data)
+        trial_groups = group_trial_index(trial_index)
+    
+    # With a heatmap state, conditions accumulated in earlier runs keep their names; a trial
+    # condition renamed because its trial ID gained another condition is redrawn from its state
+    state_groups = list_trial_states(state_dir) if state_dir else []
+    labels = trial_group_labels(list(trial_groups) + state_groups)
+    groups = sorted(trial_groups)
+    previous_labels = trial_group_labels(state_groups)
+    for group in state_groups:
+        if labels[group] != previous_labels[group]:
+            print(f"Trial {group[0]} gained a condition; the heatmaps in trial_{previous_labels[group]} "
+                  f"are now in trial_{labels[group]}")
+            if group not in trial_groups:
+                groups.append(group)
+                trial_groups[group] = []
+    groups.sort()
+    
+    print(f"Found {len(trial_groups)} unique trial conditions: {[labels[group] for group in groups]}")
+    
+    distance_field_dir = Path(cache_dir) / DISTANCE_FIELD_SUBDIR if cache_dir else None
+    if cell_size:
+        print(f"Tunnel distance fields: {cell_size * 1000:g} mm cells, "
+              f"inside tests within {distance_field_error_bound(cell_size) * 1000:.2f} mm of the walls")
+    else:
+        print("Inside tests: exact tunnel polygons")
+    
+    if profiling_enabled() and jobs != 1:
+        print("Profiling runs the trials serially so every stage is measured in this process")
+        jobs = 1
+    
+    trial_references = {group: select_trial_references(trial_index, trial_groups[group], all_rounds)
+                        for group in groups}
+    
+    # Skip trials whose data, tunnel, parameters and code are unchanged since their heatmaps were
+    # written; with a heatmap state, trials without new participants are skipped instead
+    manifest = None
+    if state_dir is None:
+        with profile_stage('index'):
+            manifest = read_manifest(output_path)
+            code = code_version(sys.modules[__name__])
+            parameters = {'num_segments': num_segments, 'cell_size': cell_size, 'all_rounds': all_rounds}
+            digests = {group: input_hash(code, parameters,
+                                         [(reference[1], trial_fingerprint(reference[2]))
+                                          for reference in trial_references[group]])
+                       for group in groups}
+            stale = {}
+            for group in groups:
+                reason = stale_reason(manifest, output_path, f"trial_{labels[group]}", digests[group])
+                if reason is not None or force:
+                    stale[f"trial_{labels[group]}"] = reason or 'forced'
+        print(f"{len(groups) - len(stale)} of {len(groups)} trial conditions up to date")
+        if dry_run:
+            print_stale_targets(stale)
+            return []
+        groups = [group for group in groups if f"trial_{labels[group]}" in stale]
+    
+    # Build missing distance fields here, once per condition, so worker processes only load them
+    if cell_size:
+        with profile_stage('geometry'):
+            conditions = {condition_key(reference[2].get('condition', {})): reference[2].get('condition', {})
+                          for group in groups for reference in trial_references[group]}
+            for condition in conditions.values():
+                get_distance_field(condition, cell_size, distance_field_dir)
+    
+    # Generate heatmaps for each trial condition
+    tasks = ((f"trial {labels[group]}",
+              (trial_references[group], output_path, group[0], labels[group],
+               num_segments, cell_size, distance_field_dir, state_dir, group[1]))
+             for group in groups)
+    errors = run_jobs(analyze_trial_heatmaps, tasks, jobs)
+    
+    if manifest is not None:
+        failed = {label for label, _ in errors}
+        for group in groups:
+            if f"trial {labels[group]}" not in failed:
+                record_target(manifest, output_path, f"trial_{labels[group]}", digests[group],
+                              trial_heatmap_outputs(labels[group]))
+        write_manifest(output_path, manifest)
+    
+    # Files are only skipped next time once every trial has folded them in; trials that
+    # succeeded already skip their participants on a retry
+    if state_index is not None and not errors and not is_trajectory_store(input_path):
+        mark_sources(state_dir, state_index, json_files)
     
     print("\n" + "=" * 50)
     print("Heatmap analysis complete!")
     print(f"Results saved in: {output_path}")
+    report_job_errors(errors)
+    return errors
 
 
-def main():
-    """Main function to run heatmap analysis from command line."""
-    parser = argparse.ArgumentParser(description='Generate trajectory and acceleration heatmaps for steering experiment')
-    parser.add_argument('input_dir', help='Directory containing participant JSON data files')
-    parser.add_argument('output_dir', help='Directory to store heatmap results')
+def main(argv=None, prog=None):
+    """Main function to run heatmap analysis from command line.
     
-    args = parser.parse_args()
+    Args:
+        argv (list): Command line arguments, or None to read sys.argv
+        prog (str): Program name shown in the usage message
+    """
+    parser = argparse.ArgumentParser(prog=prog, description='Generate trajectory and acceleration heatmaps for steering experiment')
+    parser.add_argument('input_dir', help='Directory containing participant JSON data files, or a trajectory store')
+    parser.add_argument('output_dir', help='Directory to store heatmap results')
+    parser.add_argument('--cache-dir', type=str, default=None,
+                       help='Directory for the participant parse cache (default: no cache)')
+    parser.add_argument('--cache-size-mb', type=float, default=DEFAULT_CACHE_BYTES / 2**20,
+                       help='Maximum size of the parse cache in MB (default: 512)')
+    parser.add_argument('--jobs', type=int, default=1,
+                       help='Number of worker processes for trials (default: 1, 0 uses every CPU)')
+    parser.add_argument('--all-rounds', action='store_true',
+                       help='Aggregate every repetition of each trial instead of only the first round')
+    parser.add_argument('--num-segments', type=int, default=20,
+                       help='Number of equal arc-length tunnel segments in the acceleration frequency heatmap (default: 20)')
+    parser.add_argument('--field-cell-mm', type=float, default=None,
+                       help='Test samples against tunnel distance fields with this grid spacing in mm (e.g. '
+                            f'{DEFAULT_CELL_SIZE * 1000:g}) instead of the exact polygons; lookups are within 0.71x this '
+                            'of the exact wall distance. Fields are built once per condition and stored in '
+                            '--cache-dir, which is required (default: exact polygons)')
+    parser.add_argument('--state-dir', type=str, default=None,
+                       help='Directory of accumulated heatmap sums; new participant files are folded into it '
+                            'and only the trials they add to are re-rendered (default: no state)')
+    parser.add_argument('--force', action='store_true',
+                       help='Regenerate every heatmap even if its inputs are unchanged since the last run')
+    parser.add_argument('--dry-run', action='store_true',
+                       help='List the trials whose heatmaps would be regenerated without rendering them')
+    parser.add_argument('--profile', type=str, default=None, metavar='REPORT',
+                       help='Record time, calls and peak memory of every stage and trial and write them to this JSON file')
+    parser.add_argument('--profile-no-memory', action='store_true',
+                       help='Leave out memory tracing, which slows Python-heavy stages down, when profiling')
+    parser.add_argument('--profile-trial', type=int, default=None,
+                       help='Also run this trial ID under cProfile and dump the statistics next to the report')
+    
+    args = parser.parse_args(argv)
+    if args.state_dir and (args.force or args.dry_run):
+        parser.error("--force and --dry-run apply to the output manifest, which --state-dir runs do not use")
+    if args.field_cell_mm is not None and not args.cache_dir:
+        parser.error("--field-cell-mm stores the distance fields in --cache-dir, which is missing")
+    
+    if args.profile:
+        enable_profiling(trace_memory=not args.profile_no_memory, cprofile_trial=args.profile_trial,
+                         cprofile_path=Path(args.profile).with_suffix(f".trial_{args.profile_trial}.prof"))
     
     try:
-        process_participant_data_for_heatmaps(args.input_dir, args.output_dir)
+        process_participant_data_for_heatmaps(args.input_dir, args.output_dir,
+                                              cache_dir=args.cache_dir,
+                                              cache_bytes=int(args.cache_size_mb * 2**20),
+                                              jobs=args.jobs,
+                                              all_rounds=args.all_rounds,
+                                              num_segments=args.num_segments,
+                                              cell_size=args.field_cell_mm / 1000 if args.field_cell_mm else None,
+                                              state_dir=args.state_dir,
+                                              force=args.force,
+                                              dry_run=args.dry_run)
     except Exception as e:
         print(f"Error processing data: {e}")
         raise
+    finally:
+        finish_profiling(args.profile)
 
 
 if __name__ == "__main__":
@@ -5,209 +5,83 @@ Example usage:
 python data_analysis.py ./participant_data/ ./results/
 """
 
-import json
-import os
+import textwrap
 import numpy as np
 from matplotlib import pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from matplotlib.patches import Circle
 import argparse
+import sys
 from pathlib import Path
-import glob
-from scipy.signal import find_peaks, savgol_filter, butter, filtfilt
-from scipy.ndimage import gaussian_filter1d
+from participant_cache import DEFAULT_CACHE_BYTES, iter_cached_participant_documents
+from output_manifest import (code_version, input_hash, print_stale_targets, read_manifest, record_target,
+                             stale_reason, trial_fingerprint, write_manifest)
+from parallel_jobs import report_job_errors, run_jobs
+from participant_data import get_trial_id, iter_file_documents, iter_participant_documents
+from speed_profiles import (FILTER_TYPES, detect_speed_drops, parse_filter_params, prepare_speed_profile,
+                            prepare_speed_profiles)
+from stage_profiler import (enable_profiling, finish_profiling, profile_iter, profile_stage, profile_trial,
+                            profiling_enabled)
+from summary_stats import generate_summary_stats
+from trajectory_store import is_trajectory_store, iter_store_participants, load_store
+from tunnel_excursions import trial_excursions
+from tunnel_geometry import draw_tunnel_geometry, get_tunnel_geometry
 
 
-def apply_noise_filtering(speeds, filter_type='savgol', **kwargs):
-    """Apply various noise filtering techniques to speed data.
-    
-    Args:
-        speeds (np.ndarray): Raw speed data
-        filter_type (str): Type of filter to apply
-        **kwargs: Additional parameters for specific filters
-        
-    Returns:
-        np.ndarray: Filtered speed data
-    """
-    if len(speeds) < 3:
-        return speeds
-    
-    speeds_array = np.array(speeds)
-    
-    if filter_type == 'savgol':
-        # Savitzky-Golay filter - preserves peaks while smoothing
-        window_length = kwargs.get('window_length', min(11, len(speeds_array) // 3 * 2 + 1))
-        if window_length % 2 == 0:
-            window_length += 1  # Must be odd
-        # Ensure window length doesn't exceed data length
-        window_length = min(window_length, len(speeds_array))
-        if window_length < 3:
-            return speeds_array  # Too short for filtering
-        polyorder = kwargs.get('polyorder', min(3, window_length - 1))
-        return savgol_filter(speeds_array, window_length, polyorder)
-    
-    elif filter_type == 'gaussian':
-        # Gaussian filter - smooth but may blur sharp features
-        sigma = kwargs.get('sigma', 1.0)
-        return gaussian_filter1d(speeds_array, sigma)
-    
-    elif filter_type == 'butterworth':
-        # Butterworth low-pass filter - good frequency domain filtering
-        cutoff = kwargs.get('cutoff', 0.1)  # Normalized frequency
-        order = kwargs.get('order', 3)
-        b, a = butter(order, cutoff, btype='low', analog=False)
-        return filtfilt(b, a, speeds_array)
-    
-    elif filter_type == 'moving_average':
-        # Simple moving average
-        window_size = kwargs.get('window_size', 5)
-        return np.convolve(speeds_array, np.ones(window_size)/window_size, mode='same')
-    
-    elif filter_type == 'median':
-        # Median filter - good for removing outliers
-        kernel_size = kwargs.get('kernel_size', 5)
-        from scipy.ndimage import median_filter
-        return median_filter(speeds_array, size=kernel_size)
-    
-    elif filter_type == 'adaptive':
-        # Adaptive filtering - combines multiple methods
-        # First apply median to remove outliers
-        from scipy.ndimage import median_filter
-        cleaned = median_filter(speeds_array, size=3)
-        # Then apply Savitzky-Golay for smoothing
-        window_length = min(11, len(cleaned) // 3 * 2 + 1)
-        if window_length % 2 == 0:
-            window_length += 1
-        return savgol_filter(cleaned, window_length, 3)
-    
-    else:
-        return speeds_array
+FIGURE_DPI = 300
+ATLAS_MODES = ('none', 'grid', 'pdf')
+ATLAS_COLUMNS = 6  # Trials per atlas row
+ATLAS_ROWS_PER_PAGE = 4  # Rows of trials on each page of a PDF atlas
+ATLAS_DPI = 100
 
-
-def parse_filter_params(param_string):
-    """Parse filter parameters from command line string.
-    
-    Args:
-        param_string (str): Comma-separated key=value pairs
-        
-    Returns:
-        dict: Parsed parameters
-    """
-    if not param_string:
-        return {}
-    
-    params = {}
-    for pair in param_string.split(','):
-        if '=' in pair:
-            key, value = pair.strip().split('=', 1)
-            # Try to convert to appropriate type
-            try:
-                if '.' in value:
-                    params[key] = float(value)
-                else:
-                    params[key] = int(value)
-            except ValueError:
-                params[key] = value
-    return params
+# Template figures reused across trials, see get_trajectory_template and get_speed_template
+_trajectory_templates = {}
+_speed_templates = {}
 
 
-def detect_speed_drops(speeds, min_drop_ratio=0.3, min_drop_duration=3, debug=False):
-    """Detect significant speed drops in the speed profile.
-    
-    Simple approach: For each peak, find the very next local minimum that follows it.
-    The time between peak and valley is the duration, and the proportional difference is the ratio.
+def draw_speed_markers(ax, filtered_indices, filtered_speeds, speed_drop_indices=None, speed_peak_indices=None):
+    """Mark speed drops and peaks on a speed profile.
     
     Args:
-        speeds (list or np.ndarray): Speed values over time
-        min_drop_ratio (float): Minimum ratio of speed drop to be considered significant (0-1)
-        min_drop_duration (int): Minimum duration of drop in time steps
-        debug (bool): Whether to print debug information
+        ax (matplotlib.axes.Axes): Axes holding the speed profile
+        filtered_indices (np.ndarray): Time steps of the plotted speeds
+        filtered_speeds (np.ndarray): Plotted speeds
+        speed_drop_indices (list, optional): Time steps of speed drops. Defaults to None.
+        speed_peak_indices (list, optional): Time steps of speed peaks. Defaults to None.
         
     Returns:
-        tuple: (drop_indices, peak_indices) - Indices where significant speed drops occur and their corresponding peaks
+        list: Artists added to the axes
     """
-    if len(speeds) < 3:
-        return [], []
-    
-    speeds_array = np.array(speeds)
-    
-    if debug:
-        print(f"Debug: Analyzing {len(speeds_array)} speed points")
-        print(f"Debug: Min drop ratio: {min_drop_ratio}, Min duration: {min_drop_duration}")
-    
-    # Step 1: Find all local peaks
-    peaks, peak_properties = find_peaks(speeds_array, distance=min_drop_duration, prominence=0.001)
-    
-    if debug:
-        print(f"Debug: Found {len(peaks)} potential peaks at indices: {peaks}")
-    
-    significant_drops = []
-    corresponding_peaks = []
-    
-    # Step 2: For each peak, find the very next local minimum
-    for peak_idx in peaks:
-        if peak_idx >= len(speeds_array) - 1:
-            if debug:
-                print(f"Debug: Skipping peak {peak_idx} (at or near end)")
+    artists = []
+    for marker_indices, name, color, label, text_offset in (
+            (speed_drop_indices, 'Drop', 'blue', "Speed Drops", (5, 5)),
+            (speed_peak_indices, 'Peak', 'red', "Speed Peaks", (5, -15))):
+        if marker_indices is None:
             continue
+        # Find which filtered indices correspond to the markers
+        indices_in_filtered = []
+        for marker_idx in marker_indices:
+            if marker_idx in filtered_indices:
+                indices_in_filtered.append(np.where(filtered_indices == marker_idx)[0][0])
         
-        peak_speed = speeds_array[peak_idx]
-        
-        # Find the next local minimum after this peak
-        # Look from peak+1 to the end of the array
-        search_start = peak_idx + 1
-        search_end = len(speeds_array)
-        
-        if search_start >= search_end:
-            if debug:
-                print(f"Debug: Skipping peak {peak_idx} (no data after peak)")
-            continue
-        
-        # Find local minima in the region after the peak
-        after_peak = speeds_array[search_start:search_end]
-        valleys_after, _ = find_peaks(-after_peak, prominence=0.001)
-        
-        if len(valleys_after) == 0:
-            if debug:
-                print(f"Debug: No valleys found after peak {peak_idx}")
-            continue
-        
-        # Take the first (closest) valley after the peak
-        first_valley_offset = valleys_after[0]
-        valley_idx = search_start + first_valley_offset
-        valley_speed = speeds_array[valley_idx]
-        
-        # Calculate duration (time steps between peak and valley)
-        duration = valley_idx - peak_idx
-        
-        # Calculate drop ratio
-        if peak_speed > 0:
-            drop_ratio = (peak_speed - valley_speed) / peak_speed
-        else:
-            drop_ratio = 0
-        
-        if debug:
-            print(f"Debug: Peak {peak_idx} -> Valley {valley_idx}: duration={duration}, ratio={drop_ratio:.3f}")
-        
-        # Check if this peak-valley pair meets our criteria
-        if duration >= min_drop_duration and drop_ratio >= min_drop_ratio:
-            significant_drops.append(valley_idx)
-            corresponding_peaks.append(peak_idx)
-            if debug:
-                print(f"Debug: VALID DROP: peak={peak_speed:.3f}, valley={valley_speed:.3f}, duration={duration}, ratio={drop_ratio:.3f}")
-        else:
-            if debug:
-                print(f"Debug: REJECTED DROP: duration={duration} (min={min_drop_duration}), ratio={drop_ratio:.3f} (min={min_drop_ratio})")
-    
-    if debug:
-        print(f"Debug: Final significant drops: {significant_drops}")
-        print(f"Debug: Corresponding peaks: {corresponding_peaks}")
-    
-    return significant_drops, corresponding_peaks
+        if indices_in_filtered:
+            marker_speeds = filtered_speeds[indices_in_filtered]
+            marker_time_steps = filtered_indices[indices_in_filtered]
+            artists.append(ax.scatter(marker_time_steps, marker_speeds, color=color, s=50,
+                                      label=label, zorder=10, marker='X', alpha=0.6))
+            
+            # Add annotations for each marker
+            for i, (ts, sp) in enumerate(zip(marker_time_steps, marker_speeds)):
+                artists.append(ax.annotate(f'{name} {i+1}', (ts, sp), xytext=text_offset,
+                                           textcoords='offset points', fontsize=8, color=color))
+    return artists
 
 
 def draw_speed_profile(speeds, save_path="speed_profile.png", title="Speed Profile", 
                       show_connections=False, speed_drop_indices=None, speed_peak_indices=None,
-                      filter_type='none', filter_params=None):
+                      filter_type='none', filter_params=None, dpi=FIGURE_DPI, reuse_figure=False,
+                      speed_profile=None):
     """Draws a speed profile plot from a list of speeds.
 
     Args:
@@ -218,24 +92,29 @@ def draw_speed_profile(speeds, save_path="speed_profile.png", title="Speed Profi
         speed_drop_indices (list, optional): Indices of speed drops to highlight. Defaults to None.
         filter_type (str, optional): Type of noise filtering to apply. Defaults to 'none'.
         filter_params (dict, optional): Parameters for the filter. Defaults to None.
+        dpi (int, optional): Resolution of the saved image. Defaults to FIGURE_DPI.
+        reuse_figure (bool, optional): Render on a shared template figure instead of building
+            a new one. Defaults to False.
+        speed_profile (tuple, optional): These speeds as already returned by prepare_speed_profile,
+            so they are not filtered again. Defaults to None.
     """
-    # Filter out zero values to remove noise
-    speeds_array = np.array(speeds)
-    non_zero_mask = speeds_array > 0
-    filtered_speeds = speeds_array[non_zero_mask]
-    filtered_indices = np.where(non_zero_mask)[0]
+    if speed_profile is None:
+        speed_profile = prepare_speed_profile(speeds, filter_type, filter_params)
+    filtered_indices, raw_speeds, filtered_speeds = speed_profile
+    if not show_connections:
+        speed_drop_indices = speed_peak_indices = None
     
-    # Apply noise filtering if requested
-    if filter_type != 'none' and len(filtered_speeds) > 3:
-        filter_params = filter_params or {}
-        filtered_speeds = apply_noise_filtering(filtered_speeds, filter_type, **filter_params)
+    if reuse_figure:
+        render_speed_template(get_speed_template(filter_type != 'none'), filtered_indices, raw_speeds,
+                              filtered_speeds, save_path, title, speed_drop_indices, speed_peak_indices, dpi)
+        print(f"Speed profile saved to {save_path}")
+        return
     
     fig, ax = plt.subplots(figsize=(8, 4.5))
     
     if len(filtered_speeds) > 0:
         # Plot raw data if filtering is applied
         if filter_type != 'none':
-            raw_speeds = speeds_array[non_zero_mask]
             ax.plot(filtered_indices, raw_speeds, label="Raw Speed", linewidth=0.5, color='lightgray', alpha=0.7)
             ax.plot(filtered_indices, filtered_speeds, label="Filtered Speed", linewidth=2, color='black')
         else:
@@ -243,43 +122,8 @@ def draw_speed_profile(speeds, save_path="speed_profile.png", title="Speed Profi
         
         ax.scatter(filtered_indices, filtered_speeds, color='black', s=10, label="Time Steps", zorder=5)
         
-        # Highlight speed drops if requested
-        if show_connections and speed_drop_indices is not None:
-            # Find which filtered indices correspond to speed drops
-            drop_indices_in_filtered = []
-            for drop_idx in speed_drop_indices:
-                if drop_idx in filtered_indices:
-                    drop_indices_in_filtered.append(np.where(filtered_indices == drop_idx)[0][0])
-            
-            if drop_indices_in_filtered:
-                drop_speeds = filtered_speeds[drop_indices_in_filtered]
-                drop_time_steps = filtered_indices[drop_indices_in_filtered]
-                ax.scatter(drop_time_steps, drop_speeds, color='blue', s=50, 
-                          label="Speed Drops", zorder=10, marker='X', alpha=0.6)
-                
-                # Add annotations for each speed drop
-                for i, (ts, sp) in enumerate(zip(drop_time_steps, drop_speeds)):
-                    ax.annotate(f'Drop {i+1}', (ts, sp), xytext=(5, 5), 
-                              textcoords='offset points', fontsize=8, color='blue')
-        
-        # Highlight speed peaks (start of slowdowns) if requested
-        if show_connections and speed_peak_indices is not None:
-            # Find which filtered indices correspond to speed peaks
-            peak_indices_in_filtered = []
-            for peak_idx in speed_peak_indices:
-                if peak_idx in filtered_indices:
-                    peak_indices_in_filtered.append(np.where(filtered_indices == peak_idx)[0][0])
-            
-            if peak_indices_in_filtered:
-                peak_speeds = filtered_speeds[peak_indices_in_filtered]
-                peak_time_steps = filtered_indices[peak_indices_in_filtered]
-                ax.scatter(peak_time_steps, peak_speeds, color='red', s=50, 
-                          label="Speed Peaks", zorder=10, marker='X', alpha=0.6)
-                
-                # Add annotations for each speed peak
-                for i, (ts, sp) in enumerate(zip(peak_time_steps, peak_speeds)):
-                    ax.annotate(f'Peak {i+1}', (ts, sp), xytext=(5, -15), 
-                              textcoords='offset points', fontsize=8, color='red')
+        # Highlight speed drops and peaks (start of slowdowns) if requested
+        draw_speed_markers(ax, filtered_indices, filtered_speeds, speed_drop_indices, speed_peak_indices)
     else:
         # If all speeds are zero, plot empty data
         ax.plot([], [], label="Speed", linewidth=1, color='black')
@@ -291,16 +135,70 @@ def draw_speed_profile(speeds, save_path="speed_profile.png", title="Speed Profi
     ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
     ax.grid(True)
     plt.tight_layout()
-    plt.savefig(save_path, dpi=300, bbox_inches='tight')
+    with profile_stage('savefig'):
+        plt.savefig(save_path, dpi=dpi, bbox_inches='tight')
     plt.close()
     print(f"Speed profile saved to {save_path}")
     
 
+def draw_trajectory_markers(ax, cursor_x, cursor_y, speed_drop_indices=None, speed_peak_indices=None):
+    """Mark the positions of speed drops and peaks on a trajectory plot.
+    
+    Args:
+        ax (matplotlib.axes.Axes): Axes holding the trajectory
+        cursor_x (np.ndarray): Cursor X trajectory
+        cursor_y (np.ndarray): Cursor Y trajectory
+        speed_drop_indices (list, optional): Trajectory indices of speed drops. Defaults to None.
+        speed_peak_indices (list, optional): Trajectory indices of speed peaks. Defaults to None.
+        
+    Returns:
+        list: Artists added to the axes
+    """
+    artists = []
+    for marker_indices, name, color, label, text_offset in (
+            (speed_drop_indices, 'Drop', 'blue', "Speed Drop", (10, 10)),
+            (speed_peak_indices, 'Peak', 'red', "Speed Peak", (10, -15))):
+        if marker_indices is None:
+            continue
+        for i, marker_idx in enumerate(marker_indices):
+            if 0 <= marker_idx < len(cursor_x):
+                artists.append(ax.scatter(cursor_x[marker_idx], cursor_y[marker_idx],
+                                          color=color, s=100, marker='X', zorder=10,
+                                          alpha=0.6, label=label if i == 0 else ""))
+                # Add annotation
+                artists.append(ax.annotate(f'{name} {i+1}', (cursor_x[marker_idx], cursor_y[marker_idx]),
+                                           xytext=text_offset, textcoords='offset points',
+                                           fontsize=8, color=color, bbox=dict(boxstyle="round,pad=0.3",
+                                           facecolor='white', alpha=0.7)))
+    return artists
+
+
+def draw_pause_markers(ax, pause_coordinates, window_width, window_height):
+    """Draw hollow circles around the excursion points of a trajectory.
+    
+    Args:
+        ax (matplotlib.axes.Axes): Axes holding the trajectory
+        pause_coordinates (list): (x, y) positions of the excursions
+        window_width (float): Width of the environment (m)
+        window_height (float): Height of the environment (m)
+        
+    Returns:
+        list: Artists added to the axes
+    """
+    artists = []
+    pause_radius = 0.008 * max(window_width, window_height)
+    for x, y in pause_coordinates or []:
+        circ = Circle((x, y), pause_radius, fill=False, edgecolor="orange", linewidth=1.0, zorder=7)
+        artists.append(ax.add_patch(circ))
+    return artists
+
+
 def draw_trajectory(cursor_x, cursor_y, target_pos, radius,
                     window_width, window_height,
                     tunnel_path=None, tunnel_width=None, segment_widths=None, 
                     pause_coordinates=None, save_path="trajectory.png", title="Cursor Trajectory",
-                    show_connections=False, speed_drop_indices=None, speed_peak_indices=None):
+                    show_connections=False, speed_drop_indices=None, speed_peak_indices=None,
+                    geometry=None, dpi=FIGURE_DPI, reuse_figure=False):
     """
     Draws the cursor trajectory, target, and tunnel boundaries.
 
@@ -318,10 +216,24 @@ def draw_trajectory(cursor_x, cursor_y, target_pos, radius,
         title (str): Title of the plot.
         show_connections (bool, optional): Whether to highlight speed drop positions. Defaults to False.
         speed_drop_indices (list, optional): Indices of speed drops to highlight. Defaults to None.
+        geometry (dict, optional): Tunnel geometry from get_tunnel_geometry. When given, its
+            boundary polygons are drawn instead of tunnel_path and the widths. Defaults to None.
+        dpi (int, optional): Resolution of the saved image. Defaults to FIGURE_DPI.
+        reuse_figure (bool, optional): Render on the shared template figure of the tunnel
+            instead of building a new one; needs geometry. Defaults to False.
     """
     cursor_x = np.array(cursor_x)
     cursor_y = np.array(cursor_y)
     target_x, target_y = target_pos
+    if not show_connections:
+        speed_drop_indices = speed_peak_indices = None
+    
+    if reuse_figure and geometry is not None:
+        template = get_trajectory_template(geometry, target_pos, radius, window_width, window_height)
+        render_trajectory_template(template, cursor_x, cursor_y, pause_coordinates, save_path, title,
+                                   speed_drop_indices, speed_peak_indices, dpi)
+        print(f"Trajectory saved to {save_path}")
+        return
 
     fig, ax = plt.subplots(figsize=(8, 4.5))
 
@@ -330,31 +242,8 @@ def draw_trajectory(cursor_x, cursor_y, target_pos, radius,
     ax.scatter(cursor_x[0], cursor_y[0], color='green', label="Start", zorder=5)
     ax.scatter(cursor_x[-1], cursor_y[-1], color='blue', label="End", zorder=5)
     
-    # Highlight speed drop positions if requested
-    if show_connections and speed_drop_indices is not None:
-        for i, drop_idx in enumerate(speed_drop_indices):
-            if 0 <= drop_idx < len(cursor_x):
-                ax.scatter(cursor_x[drop_idx], cursor_y[drop_idx], 
-                          color='blue', s=100, marker='X', zorder=10, 
-                          alpha=0.6, label="Speed Drop" if i == 0 else "")
-                # Add annotation
-                ax.annotate(f'Drop {i+1}', (cursor_x[drop_idx], cursor_y[drop_idx]), 
-                          xytext=(10, 10), textcoords='offset points', 
-                          fontsize=8, color='blue', bbox=dict(boxstyle="round,pad=0.3", 
-                          facecolor='white', alpha=0.7))
-    
-    # Highlight speed peak positions (start of slowdowns) if requested
-    if show_connections and speed_peak_indices is not None:
-        for i, peak_idx in enumerate(speed_peak_indices):
-            if 0 <= peak_idx < len(cursor_x):
-                ax.scatter(cursor_x[peak_idx], cursor_y[peak_idx], 
-                          color='red', s=100, marker='X', zorder=10, 
-                          alpha=0.6, label="Speed Peak" if i == 0 else "")
-                # Add annotation
-                ax.annotate(f'Peak {i+1}', (cursor_x[peak_idx], cursor_y[peak_idx]), 
-                          xytext=(10, -15), textcoords='offset points', 
-                          fontsize=8, color='red', bbox=dict(boxstyle="round,pad=0.3", 
-                          facecolor='white', alpha=0.7))
+    # Highlight speed drop and peak (start of slowdown) positions if requested
+    draw_trajectory_markers(ax, cursor_x, cursor_y, speed_drop_indices, speed_peak_indices)
 
     # Draw target
     target_circle = plt.Circle((target_x, target_y), radius, color='red', alpha=0.5, label="Target")
@@ -362,7 +251,9 @@ def draw_trajectory(cursor_x, cursor_y, target_pos, radius,
     ax.scatter([target_x], [target_y], color='red', edgecolor='black', zorder=5)
 
     # Draw tunnel boundaries if provided
-    if tunnel_path is not None:
+    if geometry is not None:
+        draw_tunnel_geometry(ax, geometry, color='gray', linestyle='--', linewidth=0.7)
+    elif tunnel_path is not None:
         tunnel_path = np.array(tunnel_path)
         xs, ys = tunnel_path[:, 0], tunnel_path[:, 1]
         
@@ -414,15 +305,7 @@ def draw_trajectory(cursor_x, cursor_y, target_pos, radius,
             ax.fill_between(xs, lower_boundary, upper_boundary, color='lightgray', alpha=0.3)
 
     # --- Pause markers (excursion points) ---
-    if pause_coordinates is not None:
-        # Draw hollow circles around pause points
-        pause_radius = 0.008 * max(window_width, window_height)
-        pause_edgecolor = "orange"
-        pause_linewidth = 1.0
-        for x, y in pause_coordinates:
-            circ = Circle((x, y), pause_radius, fill=False,
-                          edgecolor=pause_edgecolor, linewidth=pause_linewidth, zorder=7)
-            ax.add_patch(circ)
+    draw_pause_markers(ax, pause_coordinates, window_width, window_height)
 
     # Set environment limits
     ax.set_xlim(0, window_width)
@@ -437,86 +320,337 @@ def draw_trajectory(cursor_x, cursor_y, target_pos, radius,
     ax.grid(False)
 
     plt.tight_layout()
-    plt.savefig(save_path, dpi=300, bbox_inches='tight')
+    with profile_stage('savefig'):
+        plt.savefig(save_path, dpi=dpi, bbox_inches='tight')
     plt.close()
     print(f"Trajectory saved to {save_path}")
 
 
-def generate_tunnel_path(curvature, tunnel_step=0.002):
-    """Generate tunnel path based on curvature parameter.
+def save_template_figure(fig, save_path, dpi=FIGURE_DPI):
+    """Save a template figure cropped like bbox_inches='tight', with a single draw.
+    
+    savefig would render the whole figure at full resolution once just to measure it; the
+    artist extents come from the figure's own renderer instead.
     
     Args:
-        curvature (float): Curvature parameter (amplitude of sine wave)
-        tunnel_step (float): Step size for generating path points
+        fig (matplotlib.figure.Figure): Template figure
+        save_path (str): Path to save image file
+        dpi (int): Resolution of the saved image
+    """
+    tight_bbox = fig.get_tightbbox(fig.canvas.get_renderer())
+    with profile_stage('savefig'):
+        fig.savefig(save_path, dpi=dpi, bbox_inches=tight_bbox.padded(plt.rcParams['savefig.pad_inches']))
+
+
+def get_trajectory_template(geometry, target_pos, radius, window_width, window_height):
+    """Return the template figure for trajectories in one tunnel, building it on first use.
+    
+    The tunnel, target, limits, labels and layout are drawn once per tunnel condition; each
+    trial only swaps its data into the trajectory line and start/end markers.
+    
+    Args:
+        geometry (dict): Tunnel geometry from get_tunnel_geometry
+        target_pos (tuple): (x, y) position of the target
+        radius (float): Target radius
+        window_width (float): Width of the environment (m)
+        window_height (float): Height of the environment (m)
         
     Returns:
-        list: List of (x, y) tuples representing tunnel centerline
+        dict: Template with keys figure, ax, trajectory (line), start and end (scatters), the
+              legend handles drawn before (handles_before) and after (handles_after) the
+              per-trial markers, window_width and window_height
     """
-    tunnel_start_x = 0.0
-    tunnel_end_x = 0.46
-    tunnel_y_base = 0.13
-    amplitude = curvature
-    wavelength = 0.15
+    key = (geometry['key'], tuple(float(value) for value in target_pos), radius, window_width, window_height)
+    if key in _trajectory_templates:
+        return _trajectory_templates[key]
+    
+    # Figures outside pyplot stay open without counting against its open-figure limit
+    fig = Figure(figsize=(8, 4.5))
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    trajectory, = ax.plot([], [], label="Cursor Trajectory", linewidth=0.5, color='black')
+    start = ax.scatter([], [], color='green', label="Start", zorder=5)
+    end = ax.scatter([], [], color='blue', label="End", zorder=5)
+    
+    target_x, target_y = target_pos
+    target_circle = Circle((target_x, target_y), radius, color='red', alpha=0.5, label="Target")
+    ax.add_patch(target_circle)
+    ax.scatter([target_x], [target_y], color='red', edgecolor='black', zorder=5)
+    draw_tunnel_geometry(ax, geometry, color='gray', linestyle='--', linewidth=0.7)
     
-    path = []
-    x = tunnel_start_x
-    while x < tunnel_end_x:
-        y = tunnel_y_base + amplitude * np.sin(2 * np.pi * x / wavelength)
-        path.append((x, y))
-        x += tunnel_step
+    ax.set_xlim(0, window_width)
+    ax.set_ylim(0, window_height)
+    ax.set_aspect('equal')
+    ax.set_xlabel("X position (m)")
+    ax.set_ylabel("Y position (m)")
+    ax.invert_yaxis()  # Flip the trajectory plot upside down
+    ax.grid(False)
+    handles, _ = ax.get_legend_handles_labels()
+    
+    # Lay out once; trials only change the title text, which keeps its height
+    ax.set_title("Trial")
+    ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+    fig.tight_layout()
+    fig.set_layout_engine(None)  # The placeholder left by tight_layout makes savefig draw twice
+    
+    template = {
+        'figure': fig,
+        'ax': ax,
+        'trajectory': trajectory,
+        'start': start,
+        'end': end,
+        'handles_before': handles[:3],
+        'handles_after': handles[3:],
+        'window_width': window_width,
+        'window_height': window_height,
+    }
+    _trajectory_templates[key] = template
+    return template
+
+
+def render_trajectory_template(template, cursor_x, cursor_y, pause_coordinates, save_path, title,
+                               speed_drop_indices=None, speed_peak_indices=None, dpi=FIGURE_DPI):
+    """Draw one trial on a trajectory template, save it and restore the template.
+    
+    Args:
+        template (dict): Template as returned by get_trajectory_template
+        cursor_x (np.ndarray): Cursor X trajectory
+        cursor_y (np.ndarray): Cursor Y trajectory
+        pause_coordinates (list): (x, y) positions of the excursions
+        save_path (str): Path to save image file
+        title (str): Title of the plot
+        speed_drop_indices (list, optional): Trajectory indices of speed drops. Defaults to None.
+        speed_peak_indices (list, optional): Trajectory indices of speed peaks. Defaults to None.
+        dpi (int, optional): Resolution of the saved image. Defaults to FIGURE_DPI.
+    """
+    ax = template['ax']
+    template['trajectory'].set_data(cursor_x, cursor_y)
+    template['start'].set_offsets([[cursor_x[0], cursor_y[0]]])
+    template['end'].set_offsets([[cursor_x[-1], cursor_y[-1]]])
+    
+    markers = draw_trajectory_markers(ax, cursor_x, cursor_y, speed_drop_indices, speed_peak_indices)
+    markers += draw_pause_markers(ax, pause_coordinates, template['window_width'], template['window_height'])
+    
+    marker_handles = [artist for artist in markers if artist.get_label() and not artist.get_label().startswith('_')]
+    ax.legend(handles=template['handles_before'] + marker_handles + template['handles_after'],
+              bbox_to_anchor=(1.05, 1), loc='upper left')
+    ax.set_title(title)
+    try:
+        save_template_figure(template['figure'], save_path, dpi)
+    finally:
+        for artist in markers:
+            artist.remove()
+
+
+def get_speed_template(filtered):
+    """Return the template figure for speed profiles, building it on first use.
+    
+    Args:
+        filtered (bool): Whether the profiles show raw and noise-filtered speeds
         
-    return path
+    Returns:
+        dict: Template with keys figure, ax, raw (line or None), speed (line) and time_steps
+              (scatter)
+    """
+    if filtered in _speed_templates:
+        return _speed_templates[filtered]
+    
+    fig = Figure(figsize=(8, 4.5))
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    raw = None
+    if filtered:
+        raw, = ax.plot([], [], label="Raw Speed", linewidth=0.5, color='lightgray', alpha=0.7)
+        speed, = ax.plot([], [], label="Filtered Speed", linewidth=2, color='black')
+    else:
+        speed, = ax.plot([], [], label="Speed", linewidth=1, color='black')
+    time_steps = ax.scatter([], [], color='black', s=10, label="Time Steps", zorder=5)
+    
+    ax.set_xlabel("Time Step")
+    ax.set_ylabel("Speed (m/s)")
+    ax.grid(True)
+    ax.set_title("Speed Profile")
+    ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+    fig.tight_layout()
+    fig.set_layout_engine(None)  # The placeholder left by tight_layout makes savefig draw twice
+    
+    template = {'figure': fig, 'ax': ax, 'raw': raw, 'speed': speed, 'time_steps': time_steps}
+    _speed_templates[filtered] = template
+    return template
+
+
+def render_speed_template(template, filtered_indices, raw_speeds, filtered_speeds, save_path, title,
+                          speed_drop_indices=None, speed_peak_indices=None, dpi=FIGURE_DPI):
+    """Draw one speed profile on a template, save it and restore the template.
+    
+    Args:
+        template (dict): Template as returned by get_speed_template
+        filtered_indices (np.ndarray): Time steps of the non-zero speeds
+        raw_speeds (np.ndarray): Raw non-zero speeds
+        filtered_speeds (np.ndarray): Noise-reduced non-zero speeds
+        save_path (str): Path to save image file
+        title (str): Title of the plot
+        speed_drop_indices (list, optional): Time steps of speed drops. Defaults to None.
+        speed_peak_indices (list, optional): Time steps of speed peaks. Defaults to None.
+        dpi (int, optional): Resolution of the saved image. Defaults to FIGURE_DPI.
+    """
+    ax = template['ax']
+    if template['raw'] is not None:
+        template['raw'].set_data(filtered_indices, raw_speeds)
+    template['speed'].set_data(filtered_indices, filtered_speeds)
+    template['time_steps'].set_offsets(np.column_stack([filtered_indices, filtered_speeds]))
+    ax.relim()
+    ax.autoscale_view()
+    
+    markers = draw_speed_markers(ax, filtered_indices, filtered_speeds, speed_drop_indices, speed_peak_indices)
+    ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+    ax.set_title(title)
+    try:
+        save_template_figure(template['figure'], save_path, dpi)
+    finally:
+        for artist in markers:
+            artist.remove()
 
 
-def generate_sequential_tunnel_path(condition, tunnel_step=0.002):
-    """Generate sequential tunnel path with 2 segments.
+def draw_atlas_panels(ax_trajectory, ax_speed, panel, window_width, window_height):
+    """Draw one trial into a pair of small-multiple atlas panels.
     
     Args:
-        condition (dict): Trial condition with segment parameters
-        tunnel_step (float): Step size for generating path points
+        ax_trajectory (matplotlib.axes.Axes): Axes for the trajectory
+        ax_speed (matplotlib.axes.Axes): Axes for the speed profile
+        panel (dict): Trial panel as collected by analyze_participant_data
+        window_width (float): Width of the environment (m)
+        window_height (float): Height of the environment (m)
+    """
+    cursor_x, cursor_y = panel['cursor_x'], panel['cursor_y']
+    target_x, target_y = panel['target_pos']
+    
+    draw_tunnel_geometry(ax_trajectory, panel['geometry'], color='gray', linestyle='--', linewidth=0.5)
+    ax_trajectory.add_patch(Circle((target_x, target_y), panel['radius'], color='red', alpha=0.5, label="Target"))
+    ax_trajectory.plot(cursor_x, cursor_y, label="Cursor Trajectory", linewidth=0.4, color='black')
+    ax_trajectory.scatter(cursor_x[:1], cursor_y[:1], color='green', s=6, label="Start", zorder=5)
+    ax_trajectory.scatter(cursor_x[-1:], cursor_y[-1:], color='blue', s=6, label="End", zorder=5)
+    for marker_indices, color, label in ((panel['speed_drop_indices'], 'blue', "Speed Drop"),
+                                         (panel['speed_peak_indices'], 'red', "Speed Peak")):
+        marker_indices = [index for index in marker_indices if 0 <= index < len(cursor_x)]
+        if marker_indices:
+            ax_trajectory.scatter(cursor_x[marker_indices], cursor_y[marker_indices], color=color, s=15,
+                                  marker='X', zorder=10, alpha=0.6, label=label)
+    draw_pause_markers(ax_trajectory, panel['pause_coordinates'], window_width, window_height)
+    ax_trajectory.set_title(textwrap.shorten(panel['title'], width=45, placeholder='...'), fontsize=6)
+    
+    filtered_indices, _, filtered_speeds = panel['speed_profile']
+    ax_speed.plot(filtered_indices, filtered_speeds, linewidth=0.6, color='black')
+    for marker_indices, color in ((panel['speed_drop_indices'], 'blue'), (panel['speed_peak_indices'], 'red')):
+        in_profile = np.isin(filtered_indices, marker_indices)
+        if np.any(in_profile):
+            ax_speed.scatter(filtered_indices[in_profile], filtered_speeds[in_profile], color=color, s=12,
+                             marker='X', zorder=10, alpha=0.6)
+    ax_speed.grid(True, linewidth=0.3)
+
+
+def render_atlas_figure(panels, columns, window_width, window_height, title):
+    """Render trials as a grid of trajectory panels, each above its speed profile.
+    
+    All trajectory panels share one pair of axes, so trials can be compared at a glance; each
+    speed panel keeps its own scale so that drops in slow trials stay visible.
+    
+    Args:
+        panels (list): Trial panels as collected by analyze_participant_data
+        columns (int): Trials per row
+        window_width (float): Width of the environment (m)
+        window_height (float): Height of the environment (m)
+        title (str): Figure title
         
     Returns:
-        tuple: (path, segment_widths) where path is list of (x, y) tuples and 
-               segment_widths is list of widths for each segment
+        matplotlib.figure.Figure: Atlas figure, not registered with pyplot
     """
-    tunnel_start_x = 0.0
-    tunnel_end_x = 0.46
-    tunnel_y_base = 0.13
-    segment_length = (tunnel_end_x - tunnel_start_x) / 2  # 2 segments instead of 3
-    
-    path = []
-    segment_widths = []
-    
-    # Generate path points
-    x = tunnel_start_x
-    while x < tunnel_end_x:
-        y = tunnel_y_base  # Default horizontal line
-        
-        # Apply curvature for straight-to-curved segments
-        if condition.get('segmentType') == 'curvature':
-            if x < tunnel_start_x + segment_length:
-                # First segment: straight (curvature = 0)
-                y = tunnel_y_base
-            else:
-                # Second segment: curved with single peak
-                segment_x = x - (tunnel_start_x + segment_length)
-                amplitude = condition.get('segment2Curvature', 0)
-                segment_width = segment_length
-                # Create a single peak curve using a quadratic function
-                normalized_x = segment_x / segment_width  # 0 to 1
-                y = tunnel_y_base + amplitude * (1 - (2 * normalized_x - 1) ** 2)
-        
-        path.append((x, y))
-        x += tunnel_step
-    
-    # Determine segment widths for each point
-    for i, (x, y) in enumerate(path):
-        if x < tunnel_start_x + segment_length:
-            segment_widths.append(condition['segment1Width'])
+    rows = max(1, -(-len(panels) // columns))
+    height = 3.0 * rows + 0.8
+    fig = Figure(figsize=(3.2 * columns, height))
+    FigureCanvasAgg(fig)
+    # Fixed margins in inches; the default fractions would leave inches of blank space on tall atlases
+    grid = fig.add_gridspec(2 * rows, columns, height_ratios=[1.8, 1.2] * rows, hspace=0.45, wspace=0.15,
+                            top=1 - 0.8 / height, bottom=0.3 / height, left=0.03, right=0.99)
+    
+    first_trajectory = None
+    for index in range(rows * columns):
+        row, column = divmod(index, columns)
+        ax_trajectory = fig.add_subplot(grid[2 * row, column], sharex=first_trajectory, sharey=first_trajectory)
+        ax_speed = fig.add_subplot(grid[2 * row + 1, column])
+        if first_trajectory is None:
+            first_trajectory = ax_trajectory
+            ax_trajectory.set_xlim(0, window_width)
+            ax_trajectory.set_ylim(window_height, 0)  # Flip the trajectory plots upside down
+        ax_trajectory.set_aspect('equal')
+        for ax in (ax_trajectory, ax_speed):
+            ax.tick_params(labelsize=5, length=2, pad=1)
+        
+        if index < len(panels):
+            draw_atlas_panels(ax_trajectory, ax_speed, panels[index], window_width, window_height)
         else:
-            segment_widths.append(condition['segment2Width'])
+            ax_trajectory.set_visible(False)
+            ax_speed.set_visible(False)
     
-    return path, segment_widths
+    # One legend for the whole atlas, covering every kind of marker that was drawn
+    legend_entries = {}
+    for ax in fig.axes:
+        for handle, label in zip(*ax.get_legend_handles_labels()):
+            legend_entries.setdefault(label, handle)
+    fig.legend(legend_entries.values(), legend_entries.keys(), loc='upper center', ncol=len(legend_entries),
+               fontsize=8, frameon=False, bbox_to_anchor=(0.5, 1 - 0.35 / height))
+    fig.suptitle(title, y=1 - 0.05 / height, fontsize=11)
+    return fig
+
+
+def atlas_file_name(participant_id, atlas='grid'):
+    """File name of a participant's atlas.
+    
+    Args:
+        participant_id (str): Participant ID
+        atlas (str): 'grid' or 'pdf'
+        
+    Returns:
+        str: atlas_<participant>.png or .pdf
+    """
+    return f"atlas_{participant_id}.{'pdf' if atlas == 'pdf' else 'png'}"
+
+
+def write_participant_atlas(panels, participant_output_dir, participant_id, atlas='grid',
+                            window_width=0.4608, window_height=0.2592, dpi=ATLAS_DPI):
+    """Write all trial plots of a participant to a single atlas file.
+    
+    Args:
+        panels (list): Trial panels as collected by analyze_participant_data
+        participant_output_dir (Path): Output directory for this participant
+        participant_id (str): Participant ID
+        atlas (str): 'grid' for one PNG image, 'pdf' for a multi-page PDF
+        window_width (float): Width of the environment (m)
+        window_height (float): Height of the environment (m)
+        dpi (int): Resolution of the grid image
+        
+    Returns:
+        Path: Path of the atlas file
+    """
+    title = f"Participant {participant_id}: {len(panels)} trials"
+    atlas_file = participant_output_dir / atlas_file_name(participant_id, atlas)
+    if atlas == 'pdf':
+        from matplotlib.backends.backend_pdf import PdfPages
+        
+        trials_per_page = ATLAS_COLUMNS * ATLAS_ROWS_PER_PAGE
+        with PdfPages(atlas_file) as pdf:
+            for start in range(0, max(len(panels), 1), trials_per_page):
+                page_panels = panels[start:start + trials_per_page]
+                page_title = f"{title} (trials {start + 1}-{start + len(page_panels)})"
+                fig = render_atlas_figure(page_panels, ATLAS_COLUMNS, window_width, window_height, page_title)
+                with profile_stage('savefig'):
+                    pdf.savefig(fig, bbox_inches='tight')
+    else:
+        fig = render_atlas_figure(panels, ATLAS_COLUMNS, window_width, window_height, title)
+        with profile_stage('savefig'):
+            fig.savefig(atlas_file, dpi=dpi, bbox_inches='tight')
+    print(f"Atlas saved to {atlas_file}")
+    return atlas_file
 
 
 def extract_excursion_positions(excursions):
@@ -541,7 +675,8 @@ def extract_excursion_positions(excursions):
 
 def analyze_json_data(json_file_path, participant_output_dir, show_connections=False,
                      drop_ratio=0.3, drop_duration=3, filter_type='none', 
-                     filter_params=None, debug_drops=False):
+                     filter_params=None, debug_drops=False, dpi=FIGURE_DPI, reuse_figures=False,
+                     atlas='none', atlas_dpi=ATLAS_DPI):
     """Analyze JSON data from React steering experiment and generate plots.
     
     Args:
@@ -552,11 +687,41 @@ def analyze_json_data(json_file_path, participant_output_dir, show_connections=F
         drop_duration (int): Minimum speed drop duration
         filter_type (str): Type of noise filtering to apply
         filter_params (dict): Parameters for the filter
+        dpi (int): Resolution of the saved plots
+        reuse_figures (bool): Render on per-condition template figures
+        atlas (str): 'grid' or 'pdf' to draw all trials into one atlas file, 'none' for per-trial images
+        atlas_dpi (int): Resolution of a grid atlas
     """
     # Load JSON data
-    with open(json_file_path, 'r') as f:
-        data = json.load(f)
+    for data in profile_iter('load', iter_file_documents(json_file_path)):
+        analyze_participant_data(data, participant_output_dir, show_connections,
+                                 drop_ratio, drop_duration, filter_type,
+                                 filter_params, debug_drops, dpi, reuse_figures, atlas, atlas_dpi)
+
+
+def analyze_participant_data(data, participant_output_dir, show_connections=False,
+                             drop_ratio=0.3, drop_duration=3, filter_type='none',
+                             filter_params=None, debug_drops=False, dpi=FIGURE_DPI, reuse_figures=False,
+                             atlas='none', atlas_dpi=ATLAS_DPI, trials=None):
+    """Analyze one participant's trials and generate plots.
     
+    Args:
+        data (dict): Participant document with participantId and trialData
+        participant_output_dir (str): Directory to save plots for this participant
+        show_connections (bool): Whether to show speed drop connections
+        drop_ratio (float): Minimum speed drop ratio for detection
+        drop_duration (int): Minimum speed drop duration
+        filter_type (str): Type of noise filtering to apply
+        filter_params (dict): Parameters for the filter
+        dpi (int): Resolution of the saved plots
+        reuse_figures (bool): Render on per-condition template figures instead of building
+            two new figures for every trial
+        atlas (str): 'grid' or 'pdf' to draw all trials into one atlas file instead of two
+            images per trial, 'none' for per-trial images
+        atlas_dpi (int): Resolution of a grid atlas
+        trials (set): Indices of the trials to plot, or None to plot every trial; the summary
+            statistics always cover every trial
+    """
     # Set up output directory for this participant
     participant_output_dir = Path(participant_output_dir)
     participant_output_dir.mkdir(parents=True, exist_ok=True)
@@ -573,238 +738,216 @@ def analyze_json_data(json_file_path, participant_output_dir, show_connections=F
     WINDOW_HEIGHT = 0.2592  # From CANVAS_HEIGHT / SCALE  
     TARGET_RADIUS = 0.01
     
+    atlas_panels = []
+    
+    # Filter the recorded speeds of all trials in one batch; plots and drop detection share the result
+    with profile_stage('metrics'):
+        recorded = [index for index, trial_data in enumerate(trial_data_list)
+                    if len(trial_data.get('speeds', [])) > 0 and (trials is None or index in trials)]
+        speed_profiles = [None] * len(trial_data_list)
+        for index, speed_profile in zip(recorded, prepare_speed_profiles(
+                [trial_data_list[index]['speeds'] for index in recorded], filter_type, filter_params)):
+            speed_profiles[index] = speed_profile
+    
     # Process each trial
     for i, trial_data in enumerate(trial_data_list):
-        trial_id = trial_data.get('trialId', i+1)
-        condition = trial_data.get('condition', {})
+        if trials is not None and i not in trials:
+            continue
+        trial_id = get_trial_id(trial_data, i+1)
+        with profile_trial(f"{participant_id} trial {trial_id} round {trial_data.get('round', 1)}", trial_id):
+            condition = trial_data.get('condition', {})
         
-        print(f"Processing Trial {trial_id}: {condition.get('description', 'No description')}")
+            print(f"Processing Trial {trial_id}: {condition.get('description', 'No description')}")
         
-        # Extract trajectory data
-        trajectory = trial_data.get('trajectory', [])
-        if not trajectory:
-            print(f"Warning: No trajectory data for trial {trial_id}")
-            continue
+            # Extract trajectory data
+            trajectory = trial_data.get('trajectory', [])
+            if len(trajectory) == 0:
+                print(f"Warning: No trajectory data for trial {trial_id}")
+                continue
             
-        # Convert trajectory format
-        if isinstance(trajectory[0], dict):
-            # React format: [{x: 0.1, y: 0.2}, ...]
-            cursor_x = [point['x'] for point in trajectory]
-            cursor_y = [point['y'] for point in trajectory]
-        else:
-            # Python format: [(0.1, 0.2), ...]
-            cursor_x = [point[0] for point in trajectory]
-            cursor_y = [point[1] for point in trajectory]
-        
-        # Extract speed data
-        speeds = trial_data.get('speeds', [])
-        if not speeds:
-            print(f"Warning: No speed data for trial {trial_id}")
-            # Calculate speeds from trajectory if missing
-            speeds = []
-            timestamps = trial_data.get('timestamps', [])
-            if len(cursor_x) > 1 and len(timestamps) > 1:
-                for j in range(1, len(cursor_x)):
-                    dx = cursor_x[j] - cursor_x[j-1]
-                    dy = cursor_y[j] - cursor_y[j-1]
-                    dt = (timestamps[j] - timestamps[j-1]) / 1000.0  # Convert ms to s
-                    if dt > 0:
-                        speed = np.sqrt(dx**2 + dy**2) / dt
-                        speeds.append(speed)
-                speeds.insert(0, 0.0)  # Initial speed is 0
-        
-        # Generate tunnel path from condition
-        tunnel_type = condition.get('tunnelType', 'curved')
-        tunnel_path = None
-        tunnel_width = None
-        segment_widths = None
-        
-        if tunnel_type == 'sequential':
-            # Sequential tunnel with 2 segments
-            tunnel_path, segment_widths = generate_sequential_tunnel_path(condition)
-        else:
-            # Curved tunnel with uniform width
-            tunnel_curvature = condition.get('curvature', 0.01)
-            tunnel_width = condition.get('tunnelWidth', 0.015)
-            tunnel_path = generate_tunnel_path(tunnel_curvature)
-        
-        # Target position is at the end of tunnel
-        target_pos = tunnel_path[-1]
-        
-        # Extract excursion positions
-        excursions = trial_data.get('excursions', [])
-        excursion_positions = extract_excursion_positions(excursions)
-        
-        # Generate file names
-        trial_prefix = f"trial_{trial_id}_{participant_id}"
-        trajectory_file = participant_output_dir / f"trajectory_{trial_prefix}.png"
-        speed_file = participant_output_dir / f"speed_{trial_prefix}.png"
-        
-        # Detect speed drops if connections are enabled
-        speed_drop_indices = []
-        speed_peak_indices = []
-        if show_connections and speeds:
-            # Filter out zero speeds for consistent drop detection
-            speeds_array = np.array(speeds)
-            non_zero_mask = speeds_array > 0
-            filtered_speeds = speeds_array[non_zero_mask]
-            filtered_indices = np.where(non_zero_mask)[0]
-            
-            if len(filtered_speeds) > 0:
-                # Apply noise filtering if requested
-                if filter_type != 'none' and len(filtered_speeds) > 3:
-                    filter_params = filter_params or {}
-                    noise_reduced_speeds = apply_noise_filtering(filtered_speeds, filter_type, **filter_params)
+            with profile_stage('metrics'):
+                # Convert trajectory format
+                if isinstance(trajectory, np.ndarray):
+                    # Trajectory store format: (N, 2) array, columns are zero-copy views
+                    cursor_x = trajectory[:, 0]
+                    cursor_y = trajectory[:, 1]
+                elif isinstance(trajectory[0], dict):
+                    # React format: [{x: 0.1, y: 0.2}, ...]
+                    cursor_x = [point['x'] for point in trajectory]
+                    cursor_y = [point['y'] for point in trajectory]
+                else:
+                    # Python format: [(0.1, 0.2), ...]
+                    cursor_x = [point[0] for point in trajectory]
+                    cursor_y = [point[1] for point in trajectory]
+        
+                # Extract speed data
+                speeds = trial_data.get('speeds', [])
+                if len(speeds) == 0:
+                    print(f"Warning: No speed data for trial {trial_id}")
+                    # Calculate speeds from trajectory if missing
+                    speeds = []
+                    timestamps = trial_data.get('timestamps', [])
+                    if len(cursor_x) > 1 and len(timestamps) > 1:
+                        for j in range(1, len(cursor_x)):
+                            dx = cursor_x[j] - cursor_x[j-1]
+                            dy = cursor_y[j] - cursor_y[j-1]
+                            dt = (timestamps[j] - timestamps[j-1]) / 1000.0  # Convert ms to s
+                            if dt > 0:
+                                speed = np.sqrt(dx**2 + dy**2) / dt
+                                speeds.append(speed)
+                        speeds.insert(0, 0.0)  # Initial speed is 0
+        
+            # Look up the shared tunnel geometry for this condition
+            with profile_stage('geometry'):
+                geometry = get_tunnel_geometry(condition)
+            tunnel_path = geometry['centerline']
+            segment_widths = geometry['segment_widths']
+            tunnel_width = geometry['tunnel_width'] if segment_widths is None else None
+        
+            # Target position is at the end of tunnel
+            target_pos = geometry['target']
+        
+            with profile_stage('metrics'):
+                # Extract excursion positions, recomputing them from the trajectory for exports without them
+                if 'excursions' in trial_data:
+                    excursions = trial_data['excursions']
                 else:
-                    noise_reduced_speeds = filtered_speeds
+                    excursions = trial_excursions(trial_data)
+                excursion_positions = extract_excursion_positions(excursions)
+        
+            # Generate file names
+            trial_prefix = f"trial_{trial_id}_{participant_id}"
+            trajectory_file = participant_output_dir / f"trajectory_{trial_prefix}.png"
+            speed_file = participant_output_dir / f"speed_{trial_prefix}.png"
+        
+            # Detect speed drops if connections are enabled
+            speed_drop_indices = []
+            speed_peak_indices = []
+            with profile_stage('metrics'):
+                # Speeds recomputed from the trajectory were not part of the participant's batch
+                speed_profile = speed_profiles[i]
+                if speed_profile is None:
+                    speed_profile = prepare_speed_profile(speeds, filter_type, filter_params)
                 
-                # Detect drops and peaks on noise-reduced data
-                filtered_drop_indices, filtered_peak_indices = detect_speed_drops(noise_reduced_speeds, drop_ratio, drop_duration, debug_drops)
-                # Convert back to original indices
-                speed_drop_indices = [filtered_indices[i] for i in filtered_drop_indices]
-                speed_peak_indices = [filtered_indices[i] for i in filtered_peak_indices]
-        
-        # Create trajectory plot
-        trajectory_title = f"Trial {trial_id}: {condition.get('description', 'Unknown condition')}"
-        draw_trajectory(
-            cursor_x=cursor_x,
-            cursor_y=cursor_y,
-            target_pos=target_pos,
-            radius=TARGET_RADIUS,
-            window_width=WINDOW_WIDTH,
-            window_height=WINDOW_HEIGHT,
-            tunnel_path=tunnel_path,
-            tunnel_width=tunnel_width,
-            segment_widths=segment_widths,
-            pause_coordinates=excursion_positions,
-            save_path=str(trajectory_file),
-            title=trajectory_title,
-            show_connections=show_connections,
-            speed_drop_indices=speed_drop_indices,
-            speed_peak_indices=speed_peak_indices
-        )
-        
-        # Create speed profile plot
-        if speeds:
-            speed_title = f"Speed Profile - Trial {trial_id}"
-            draw_speed_profile(
-                speeds=speeds,
-                save_path=str(speed_file),
-                title=speed_title,
-                show_connections=show_connections,
-                speed_drop_indices=speed_drop_indices,
-                speed_peak_indices=speed_peak_indices,
-                filter_type=filter_type,
-                filter_params=filter_params
-            )
-        
-        # Print trial summary
-        completion_time = trial_data.get('completionTime', 0)
-        
-        print(f"  - Completion time: {completion_time:.2f}s")
-        print(f"  - Excursions: {len(excursion_positions)}")
-        print()
+                if show_connections and len(speeds) > 0:
+                    # Drops are detected on the non-zero, noise-reduced speeds that are also plotted
+                    filtered_indices, _, noise_reduced_speeds = speed_profile
+                    if len(noise_reduced_speeds) > 0:
+                        filtered_drop_indices, filtered_peak_indices = detect_speed_drops(noise_reduced_speeds, drop_ratio, drop_duration, debug_drops)
+                        # Convert back to original indices
+                        speed_drop_indices = [filtered_indices[i] for i in filtered_drop_indices]
+                        speed_peak_indices = [filtered_indices[i] for i in filtered_peak_indices]
+        
+            with profile_stage('draw'):
+                if atlas != 'none':
+                    # Collect the trial for the participant atlas
+                    atlas_panels.append({
+                        'title': f"Trial {trial_id}: {condition.get('description', 'Unknown condition')}",
+                        'cursor_x': np.asarray(cursor_x, dtype=float),
+                        'cursor_y': np.asarray(cursor_y, dtype=float),
+                        'speed_profile': speed_profile,
+                        'geometry': geometry,
+                        'target_pos': target_pos,
+                        'radius': TARGET_RADIUS,
+                        'pause_coordinates': excursion_positions,
+                        'speed_drop_indices': speed_drop_indices,
+                        'speed_peak_indices': speed_peak_indices,
+                    })
+                else:
+                    # Create trajectory plot
+                    trajectory_title = f"Trial {trial_id}: {condition.get('description', 'Unknown condition')}"
+                    draw_trajectory(
+                        cursor_x=cursor_x,
+                        cursor_y=cursor_y,
+                        target_pos=target_pos,
+                        radius=TARGET_RADIUS,
+                        window_width=WINDOW_WIDTH,
+                        window_height=WINDOW_HEIGHT,
+                        tunnel_path=tunnel_path,
+                        tunnel_width=tunnel_width,
+                        segment_widths=segment_widths,
+                        pause_coordinates=excursion_positions,
+                        save_path=str(trajectory_file),
+                        title=trajectory_title,
+                        show_connections=show_connections,
+                        speed_drop_indices=speed_drop_indices,
+                        speed_peak_indices=speed_peak_indices,
+                        geometry=geometry,
+                        dpi=dpi,
+                        reuse_figure=reuse_figures
+                    )
+        
+                    # Create speed profile plot
+                    if len(speeds) > 0:
+                        speed_title = f"Speed Profile - Trial {trial_id}"
+                        draw_speed_profile(
+                            speeds=speeds,
+                            save_path=str(speed_file),
+                            title=speed_title,
+                            show_connections=show_connections,
+                            speed_drop_indices=speed_drop_indices,
+                            speed_peak_indices=speed_peak_indices,
+                            filter_type=filter_type,
+                            filter_params=filter_params,
+                            dpi=dpi,
+                            reuse_figure=reuse_figures,
+                            speed_profile=speed_profile
+                        )
+        
+            # Print trial summary
+            completion_time = trial_data.get('completionTime', 0)
+        
+            print(f"  - Completion time: {completion_time:.2f}s")
+            print(f"  - Excursions: {len(excursion_positions)}")
+            print()
+    
+    if atlas != 'none':
+        with profile_stage('draw'):
+            write_participant_atlas(atlas_panels, participant_output_dir, participant_id, atlas,
+                                    WINDOW_WIDTH, WINDOW_HEIGHT, atlas_dpi)
     
     print(f"Analysis complete! Plots saved to: {participant_output_dir}")
     
     # Generate summary statistics
-    generate_summary_stats(trial_data_list, participant_output_dir, participant_id)
+    with profile_stage('summary'):
+        generate_summary_stats(trial_data_list, participant_output_dir, participant_id)
 
 
-def generate_summary_stats(trial_data_list, participant_output_dir, participant_id):
-    """Generate summary statistics and save to text file.
+def participant_output_targets(trial_data_list, participant_id, atlas='none'):
+    """Group a participant's outputs into targets of the output manifest.
+    
+    Repetitions of a trial ID write the same two images, so they form one target. An atlas
+    is a single target over all trials.
     
     Args:
-        trial_data_list (list): List of trial data dictionaries
-        participant_output_dir (Path): Output directory for this participant
+        trial_data_list (list): The participant's trial data dictionaries
         participant_id (str): Participant ID
-    """
-    summary_file = participant_output_dir / f"summary_stats_{participant_id}.txt"
-    
-    # Separate trials by type
-    basic_trials = [t for t in trial_data_list if t.get('condition', {}).get('timeLimit') is None]
-    time_trials = [t for t in trial_data_list if t.get('condition', {}).get('timeLimit') is not None]
-    
-    # Further separate by tunnel type
-    curved_trials = [t for t in trial_data_list if t.get('condition', {}).get('tunnelType', 'curved') == 'curved']
-    sequential_trials = [t for t in trial_data_list if t.get('condition', {}).get('tunnelType') == 'sequential']
-    
-    # Separate basic trials by tunnel type
-    basic_curved = [t for t in basic_trials if t.get('condition', {}).get('tunnelType', 'curved') == 'curved']
-    basic_sequential = [t for t in basic_trials if t.get('condition', {}).get('tunnelType') == 'sequential']
-    
-    # Separate time trials by tunnel type
-    time_curved = [t for t in time_trials if t.get('condition', {}).get('tunnelType', 'curved') == 'curved']
-    time_sequential = [t for t in time_trials if t.get('condition', {}).get('tunnelType') == 'sequential']
-    
-    with open(summary_file, 'w') as f:
-        f.write(f"Steering Experiment Analysis Summary\n")
-        f.write(f"Participant: {participant_id}\n")
-        f.write(f"Analysis Date: {np.datetime64('now')}\n")
-        f.write("=" * 50 + "\n\n")
-        
-        f.write(f"Total Trials: {len(trial_data_list)}\n")
-        f.write(f"Basic Trials: {len(basic_trials)}\n")
-        f.write(f"  - Curved Tunnels: {len(basic_curved)}\n")
-        f.write(f"  - Sequential Tunnels: {len(basic_sequential)}\n")
-        f.write(f"Time-Constrained Trials: {len(time_trials)}\n")
-        f.write(f"  - Curved Tunnels: {len(time_curved)}\n")
-        f.write(f"  - Sequential Tunnels: {len(time_sequential)}\n\n")
-        
-        # Overall statistics
-        if trial_data_list:
-            completion_times = [t.get('completionTime', 0) for t in trial_data_list]
-            
-            f.write("Overall Statistics:\n")
-            f.write(f"  Average completion time: {np.mean(completion_times):.2f}s\n\n")
+        atlas (str): 'grid', 'pdf' or 'none', as passed to analyze_participant_data
         
-        # Basic trials statistics
-        if basic_trials:
-            basic_times = [t.get('completionTime', 0) for t in basic_trials]
-            
-            f.write("Basic Trials Statistics:\n")
-            f.write(f"  Average completion time: {np.mean(basic_times):.2f}s\n\n")
-        
-        # Time-constrained trials statistics
-        if time_trials:
-            time_times = [t.get('completionTime', 0) for t in time_trials]
-            timeout_failures = sum(1 for t in time_trials if t.get('failedDueToTimeout', False))
-            
-            f.write("Time-Constrained Trials Statistics:\n")
-            f.write(f"  Average completion time: {np.mean(time_times):.2f}s\n")
-            f.write(f"  Timeout failures: {timeout_failures}\n\n")
-        
-        # Curved tunnel statistics
-        if curved_trials:
-            curved_times = [t.get('completionTime', 0) for t in curved_trials]
-            
-            f.write("Curved Tunnel Statistics:\n")
-            f.write(f"  Average completion time: {np.mean(curved_times):.2f}s\n\n")
-        
-        # Sequential tunnel statistics
-        if sequential_trials:
-            sequential_times = [t.get('completionTime', 0) for t in sequential_trials]
-            
-            f.write("Sequential Tunnel Statistics:\n")
-            f.write(f"  Average completion time: {np.mean(sequential_times):.2f}s\n\n")
-        
-        # Individual trial details
-        f.write("Individual Trial Details:\n")
-        f.write("-" * 30 + "\n")
-        for trial in trial_data_list:
-            trial_id = trial.get('trialId', 'Unknown')
-            condition = trial.get('condition', {})
-            completion_time = trial.get('completionTime', 0)
-            
-            f.write(f"Trial {trial_id}: {condition.get('description', 'No description')}\n")
-            f.write(f"  Time: {completion_time:.2f}s\n")
-    
-    print(f"Summary statistics saved to: {summary_file}")
+    Returns:
+        tuple: (summary_target, targets) - name of the summary statistics target and a mapping
+               of target name to (trial indices, output paths relative to the output directory)
+    """
+    participant_dir = Path(f"participant_{participant_id}")
+    summary_file = participant_dir / f"summary_stats_{participant_id}.txt"
+    all_trials = list(range(len(trial_data_list)))
+    targets = {summary_file.as_posix(): (all_trials, [summary_file])}
+    if atlas != 'none':
+        atlas_file = participant_dir / atlas_file_name(participant_id, atlas)
+        targets[atlas_file.as_posix()] = (all_trials, [atlas_file])
+    else:
+        for i, trial_data in enumerate(trial_data_list):
+            trial_prefix = f"trial_{get_trial_id(trial_data, i+1)}_{participant_id}"
+            outputs = [participant_dir / f"trajectory_{trial_prefix}.png", participant_dir / f"speed_{trial_prefix}.png"]
+            targets.setdefault((participant_dir / trial_prefix).as_posix(), ([], outputs))[0].append(i)
+    return summary_file.as_posix(), targets
 
 
 def process_participant_data(input_dir, output_dir, show_connections=False, 
                            drop_ratio=0.3, drop_duration=3, filter_type='none', 
-                           filter_params=None, debug_drops=False):
+                           filter_params=None, debug_drops=False, cache_dir=None,
+                           cache_bytes=DEFAULT_CACHE_BYTES, jobs=1, dpi=FIGURE_DPI,
+                           reuse_figures=False, atlas='none', atlas_dpi=ATLAS_DPI, force=False, dry_run=False):
     """Process all participant data files in the input directory.
     
     Args:
@@ -815,60 +958,142 @@ def process_participant_data(input_dir, output_dir, show_connections=False,
         drop_duration (int): Minimum speed drop duration
         filter_type (str): Type of noise filtering to apply
         filter_params (dict): Parameters for the filter
+        cache_dir (str): Directory of the parse cache, or None to always parse the JSON files
+        cache_bytes (int): Byte budget of the parse cache
+        jobs (int): Number of worker processes for participants (1 runs serially, 0 uses every CPU)
+        dpi (int): Resolution of the saved plots
+        reuse_figures (bool): Render on per-condition template figures
+        atlas (str): 'grid' or 'pdf' to draw each participant's trials into one atlas file,
+            'none' for per-trial images
+        atlas_dpi (int): Resolution of grid atlases
+        force (bool): Regenerate every plot even if the output manifest says it is up to date
+        dry_run (bool): Only list the plots that would be regenerated
+        
+    Returns:
+        list: (source, error message) pairs for participants that failed
     """
     input_path = Path(input_dir)
     output_path = Path(output_dir)
     
     if not input_path.exists():
         print(f"Error: Input directory not found: {input_dir}")
-        return
+        return []
     
     # Create output directory if it doesn't exist
     output_path.mkdir(parents=True, exist_ok=True)
     
-    # Find all JSON files in the input directory
-    json_files = list(input_path.glob("*.json"))
+    if is_trajectory_store(input_path):
+        print(f"Reading trajectory store: {input_path}")
+        print(f"Output directory: {output_path}")
+        print("-" * 50)
+        participant_sources = ((participant_data, input_path)
+                               for participant_data in iter_store_participants(load_store(input_path)))
+    else:
+        # Find all JSON files in the input directory
+        json_files = list(input_path.glob("*.json"))
+        
+        if not json_files:
+            print(f"No JSON files found in {input_dir}")
+            return []
+        
+        print(f"Found {len(json_files)} JSON files to process")
+        print(f"Output directory: {output_path}")
+        print("-" * 50)
+        
+        if cache_dir:
+            participant_sources = iter_cached_participant_documents(json_files, cache_dir, cache_bytes)
+        else:
+            participant_sources = iter_participant_documents(json_files)
+    
+    if profiling_enabled() and jobs != 1:
+        print("Profiling runs the participants serially so every stage is measured in this process")
+        jobs = 1
     
-    if not json_files:
-        print(f"No JSON files found in {input_dir}")
-        return
+    # Plots are skipped when their trials, parameters and code are unchanged since they were written
+    manifest = read_manifest(output_path)
+    code = code_version(sys.modules[__name__])
+    parameters = {
+        'show_connections': show_connections,
+        'drop_ratio': drop_ratio,
+        'drop_duration': drop_duration,
+        'filter_type': filter_type,
+        'filter_params': filter_params or {},
+        'dpi': atlas_dpi if atlas == 'grid' else dpi,
+    }
+    stale = {}
+    pending = {}
     
-    print(f"Found {len(json_files)} JSON files to process")
-    print(f"Output directory: {output_path}")
-    print("-" * 50)
-    
-    # Process each participant file
-    for json_file in json_files:
-        try:
-            # Extract participant ID from filename or load from JSON
-            with open(json_file, 'r') as f:
-                data = json.load(f)
-            participant_id = data.get('participantId', json_file.stem)
+    def iter_participant_tasks():
+        for data, source_path in profile_iter('load', participant_sources):
+            participant_id = data.get('participantId', source_path.stem)
+            label = f"{source_path.name} ({participant_id})"
+            
+            # Find the targets whose inputs changed and the trials they need
+            with profile_stage('index'):
+                trial_data_list = data.get('trialData', [])
+                fingerprints = [trial_fingerprint(trial_data) for trial_data in trial_data_list]
+                summary_target, targets = participant_output_targets(trial_data_list, participant_id, atlas)
+                pending[label] = {}
+                trials = set()
+                for target, (indices, outputs) in targets.items():
+                    # Summary statistics do not depend on the plotting parameters
+                    target_parameters = {} if target == summary_target else parameters
+                    digest = input_hash(code, target_parameters, [fingerprints[i] for i in indices])
+                    reason = stale_reason(manifest, output_path, target, digest)
+                    if reason is None and not force:
+                        continue
+                    stale[target] = reason or 'forced'
+                    pending[label][target] = (digest, outputs)
+                    if target != summary_target:
+                        trials.update(indices)
+            
+            if not pending[label]:
+                print(f"\nParticipant {participant_id} is up to date")
+                continue
+            if dry_run:
+                continue
             
             # Create participant-specific output directory
             participant_output_dir = output_path / f"participant_{participant_id}"
             
-            print(f"\nProcessing: {json_file.name}")
+            print(f"\nProcessing: {source_path.name}")
             print(f"Participant ID: {participant_id}")
             
-            # Analyze this participant's data
-            analyze_json_data(json_file, participant_output_dir, 
-                            show_connections, drop_ratio, drop_duration,
-                            filter_type, filter_params, debug_drops)
-            
-        except Exception as e:
-            print(f"Error processing {json_file.name}: {e}")
-            continue
+            yield (label,
+                   (data, participant_output_dir, show_connections, drop_ratio, drop_duration,
+                    filter_type, filter_params, debug_drops, dpi, reuse_figures, atlas, atlas_dpi,
+                    None if atlas != 'none' else trials))
+    
+    # Analyze each participant's data
+    errors = run_jobs(analyze_participant_data, iter_participant_tasks(), jobs)
+    
+    if dry_run:
+        print_stale_targets(stale)
+        return errors
+    
+    failed = {label for label, _ in errors}
+    for label, targets in pending.items():
+        if label not in failed:
+            for target, (digest, outputs) in targets.items():
+                record_target(manifest, output_path, target, digest, outputs)
+    write_manifest(output_path, manifest)
     
     print("\n" + "=" * 50)
     print("All participants processed!")
     print(f"Results saved in: {output_path}")
+    report_job_errors(errors)
+    return errors
 
 
-def main():
-    """Main function to run data analysis from command line."""
-    parser = argparse.ArgumentParser(description='Analyze React steering experiment data for multiple participants')
-    parser.add_argument('input_dir', help='Directory containing participant JSON data files')
+def main(argv=None, prog=None):
+    """Main function to run data analysis from command line.
+    
+    Args:
+        argv (list): Command line arguments, or None to read sys.argv
+        prog (str): Program name shown in the usage message
+    """
+    parser = argparse.ArgumentParser(prog=prog, description='Analyze React steering experiment data for multiple participants')
+    parser.add_argument('input_dir', help='Directory containing participant JSON data files, or a trajectory store')
     parser.add_argument('output_dir', help='Directory to store analysis results')
     parser.add_argument('--show-connections', action='store_true', 
                        help='Show connections between speed drops and trajectory positions')
@@ -877,14 +1102,43 @@ def main():
     parser.add_argument('--drop-duration', type=int, default=3,
                        help='Minimum duration of speed drop in time steps (default: 3)')
     parser.add_argument('--filter-type', type=str, default='none',
-                       choices=['none', 'savgol', 'gaussian', 'butterworth', 'moving_average', 'median', 'adaptive'],
+                       choices=FILTER_TYPES,
                        help='Type of noise filtering to apply (default: none)')
     parser.add_argument('--filter-params', type=str, default='',
                        help='Filter parameters as key=value pairs separated by commas (e.g., "window_length=15,sigma=2.0")')
     parser.add_argument('--debug-drops', action='store_true',
                        help='Enable debug output for speed drop detection')
+    parser.add_argument('--cache-dir', type=str, default=None,
+                       help='Directory for the participant parse cache (default: no cache)')
+    parser.add_argument('--cache-size-mb', type=float, default=DEFAULT_CACHE_BYTES / 2**20,
+                       help='Maximum size of the parse cache in MB (default: 512)')
+    parser.add_argument('--jobs', type=int, default=1,
+                       help='Number of worker processes for participants (default: 1, 0 uses every CPU)')
+    parser.add_argument('--dpi', type=int, default=FIGURE_DPI,
+                       help=f'Resolution of the saved plots (default: {FIGURE_DPI})')
+    parser.add_argument('--reuse-figures', action='store_true',
+                       help='Draw each tunnel condition once and only swap trial data between plots')
+    parser.add_argument('--atlas', type=str, default='none', choices=ATLAS_MODES,
+                       help='Write each participant\'s trials as one grid image or multi-page PDF '
+                            'instead of two images per trial (default: none)')
+    parser.add_argument('--atlas-dpi', type=int, default=ATLAS_DPI,
+                       help=f'Resolution of grid atlases (default: {ATLAS_DPI})')
+    parser.add_argument('--force', action='store_true',
+                       help='Regenerate every plot even if its inputs are unchanged since the last run')
+    parser.add_argument('--dry-run', action='store_true',
+                       help='List the plots that would be regenerated without rendering them')
+    parser.add_argument('--profile', type=str, default=None, metavar='REPORT',
+                       help='Record time, calls and peak memory of every stage and trial and write them to this JSON file')
+    parser.add_argument('--profile-no-memory', action='store_true',
+                       help='Leave out memory tracing, which slows Python-heavy stages down, when profiling')
+    parser.add_argument('--profile-trial', type=int, default=None,
+                       help='Also run the first trial with this ID under cProfile and dump the statistics next to the report')
+    
+    args = parser.parse_args(argv)
     
-    args = parser.parse_args()
+    if args.profile:
+        enable_profiling(trace_memory=not args.profile_no_memory, cprofile_trial=args.profile_trial,
+                         cprofile_path=Path(args.profile).with_suffix(f".trial_{args.profile_trial}.prof"))
     
     try:
         filter_params = parse_filter_params(args.filter_params)
@@ -894,10 +1148,21 @@ def main():
                                drop_duration=args.drop_duration,
                                filter_type=args.filter_type,
                                filter_params=filter_params,
-                               debug_drops=args.debug_drops)
+                               debug_drops=args.debug_drops,
+                               cache_dir=args.cache_dir,
+                               cache_bytes=int(args.cache_size_mb * 2**20),
+                               jobs=args.jobs,
+                               dpi=args.dpi,
+                               reuse_figures=args.reuse_figures,
+                               atlas=args.atlas,
+                               atlas_dpi=args.atlas_dpi,
+                               force=args.force,
+                               dry_run=args.dry_run)
     except Exception as e:
         print(f"Error processing data: {e}")
         raise
+    finally:
+        finish_profiling(args.profile)
 
 
 if __name__ == "__main__":
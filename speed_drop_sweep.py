@@ -0,0 +1,272 @@
+"""
+Speed Drop Parameter Sweep for React Steering Experiment
+Loads every trial's speeds once and runs speed drop detection over a grid of drop ratios, drop durations
+and noise filters, writing drop counts and locations per trial and parameter set without plotting
+Example usage:
+python speed_drop_sweep.py ./trajectory_store/ ./results/sweep/ --drop-ratios 0.2 0.3 0.4 --filters none savgol
+"""
+
+import argparse
+import csv
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from parallel_jobs import resolve_jobs
+from participant_data import find_json_files, get_trial_id, iter_participant_documents
+from speed_profiles import FILTER_TYPES, detect_speed_drops_batch, parse_filter_params, prepare_speed_profiles
+from trajectory_store import is_trajectory_store, iter_store_participants, load_store, trajectory_to_array
+
+
+PARAMETER_FIELDS = ['parameter_set', 'filter_type', 'filter_params', 'drop_ratio', 'drop_duration']
+TRIAL_FIELDS = PARAMETER_FIELDS + ['participant', 'trial_id', 'round', 'num_samples', 'num_drops']
+DROP_FIELDS = PARAMETER_FIELDS + ['participant', 'trial_id', 'round', 'drop', 'drop_index', 'peak_index',
+                                  'drop_speed', 'peak_speed', 'x', 'y', 'time']
+SUMMARY_FIELDS = PARAMETER_FIELDS + ['trials', 'trials_with_drops', 'drops', 'drops_per_trial']
+
+
+def parse_filter_spec(spec):
+    """Parse a filter given as "type" or "type:key=value,key=value".
+
+    Args:
+        spec (str): Filter specification
+
+    Returns:
+        tuple: (filter_type, filter_params string, filter_params dict)
+
+    Raises:
+        ValueError: If the filter type is unknown
+    """
+    filter_type, _, param_string = spec.partition(':')
+    if filter_type not in FILTER_TYPES:
+        raise ValueError(f"Unknown filter type '{filter_type}' in '{spec}' (choose from {', '.join(FILTER_TYPES)})")
+    return filter_type, param_string, parse_filter_params(param_string)
+
+
+def parameter_grid(filters, drop_ratios, drop_durations):
+    """Enumerate the parameter sets of a sweep.
+
+    Args:
+        filters (list): Filter specifications accepted by parse_filter_spec
+        drop_ratios (list): Minimum speed drop ratios
+        drop_durations (list): Minimum speed drop durations in time steps
+
+    Returns:
+        list: One dict per parameter set with parameter_set, filter_type, filter_params (the
+              string as given), params (parsed), drop_ratio and drop_duration
+    """
+    grid = []
+    for spec, drop_ratio, drop_duration in itertools.product(filters, drop_ratios, drop_durations):
+        filter_type, param_string, params = parse_filter_spec(spec)
+        grid.append({
+            'parameter_set': len(grid),
+            'filter_type': filter_type,
+            'filter_params': param_string,
+            'params': params,
+            'drop_ratio': drop_ratio,
+            'drop_duration': drop_duration,
+        })
+    return grid
+
+
+def load_sweep_trials(input_dir):
+    """Collect the speeds, positions and times of every trial with recorded speeds.
+
+    Args:
+        input_dir (str or Path): Directory of participant JSON files, or a trajectory store
+
+    Returns:
+        list: One dict per trial with participant, trial_id, round, speeds and the trajectory
+              and timestamps when they are aligned with the speeds (else None)
+    """
+    input_path = Path(input_dir)
+    if is_trajectory_store(input_path):
+        documents = iter_store_participants(load_store(input_path))
+    else:
+        documents = (document for document, _ in iter_participant_documents(find_json_files([input_path])))
+
+    trials = []
+    for document in documents:
+        participant_id = document.get('participantId', 'unknown')
+        for i, trial in enumerate(document.get('trialData', [])):
+            speeds = np.asarray(trial.get('speeds', []), dtype=float)
+            if len(speeds) == 0:
+                continue
+            trajectory = trajectory_to_array(trial.get('trajectory', []))
+            timestamps = np.asarray(trial.get('timestamps', []), dtype=float)
+            trials.append({
+                'participant': participant_id,
+                'trial_id': get_trial_id(trial, i + 1),
+                'round': trial.get('round'),
+                'speeds': speeds,
+                'trajectory': trajectory if len(trajectory) == len(speeds) else None,
+                'timestamps': timestamps if len(timestamps) == len(speeds) else None,
+            })
+    return trials
+
+
+def sweep_speed_drops(speed_profiles, grid):
+    """Detect the speed drops of a batch of trials under every parameter set.
+
+    Each filter is applied once to the whole batch; all drop ratios and durations are then
+    evaluated on the same filtered speeds.
+
+    Args:
+        speed_profiles (list): Recorded speeds, one array per trial
+        grid (list): Parameter sets as returned by parameter_grid
+
+    Returns:
+        list: For each parameter set, a (drop_indices, peak_indices, drop_speeds, peak_speeds)
+              tuple of arrays per trial; indices refer to the recorded speeds
+    """
+    prepared = {}
+    results = []
+    for parameters in grid:
+        filter_key = (parameters['filter_type'], parameters['filter_params'])
+        if filter_key not in prepared:
+            prepared[filter_key] = prepare_speed_profiles(speed_profiles, parameters['filter_type'],
+                                                          parameters['params'])
+        profiles = prepared[filter_key]
+        detections = detect_speed_drops_batch([filtered_speeds for _, _, filtered_speeds in profiles],
+                                              parameters['drop_ratio'], parameters['drop_duration'])
+        set_results = []
+        for (filtered_indices, _, filtered_speeds), (drops, peaks) in zip(profiles, detections):
+            drops, peaks = np.asarray(drops, dtype=np.int64), np.asarray(peaks, dtype=np.int64)
+            set_results.append((filtered_indices[drops], filtered_indices[peaks],
+                                filtered_speeds[drops], filtered_speeds[peaks]))
+        results.append(set_results)
+    return results
+
+
+def run_sweep(trials, grid, jobs=1):
+    """Run the sweep over all trials, splitting them into one chunk per worker process.
+
+    Args:
+        trials (list): Trials as returned by load_sweep_trials
+        grid (list): Parameter sets as returned by parameter_grid
+        jobs (int): Number of worker processes (1 runs serially, 0 uses every CPU)
+
+    Returns:
+        list: For each parameter set, one detection tuple per trial, as in sweep_speed_drops
+    """
+    speed_profiles = [trial['speeds'] for trial in trials]
+    jobs = min(resolve_jobs(jobs), max(len(speed_profiles), 1))
+    if jobs == 1:
+        return sweep_speed_drops(speed_profiles, grid)
+
+    bounds = np.linspace(0, len(speed_profiles), jobs + 1).astype(int)
+    chunks = [speed_profiles[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        chunk_results = list(executor.map(sweep_speed_drops, chunks, itertools.repeat(grid)))
+    return [[detection for chunk in chunk_results for detection in chunk[k]] for k in range(len(grid))]
+
+
+def write_sweep_results(trials, grid, results, output_dir):
+    """Write the sweep as tidy CSV tables.
+
+    sweep_trials.csv has one row per trial and parameter set, sweep_drops.csv one row per
+    detected drop with its sample index, speeds, position and time, and sweep_summary.csv
+    one row per parameter set.
+
+    Args:
+        trials (list): Trials as returned by load_sweep_trials
+        grid (list): Parameter sets as returned by parameter_grid
+        results (list): Detections as returned by run_sweep
+        output_dir (str or Path): Directory to write the tables to
+
+    Returns:
+        list: Summary rows, one dict per parameter set
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    summary = []
+    with open(output_dir / "sweep_trials.csv", 'w', newline='') as trials_file, \
+            open(output_dir / "sweep_drops.csv", 'w', newline='') as drops_file:
+        trial_writer = csv.writer(trials_file)
+        drop_writer = csv.writer(drops_file)
+        trial_writer.writerow(TRIAL_FIELDS)
+        drop_writer.writerow(DROP_FIELDS)
+        for parameters, set_results in zip(grid, results):
+            parameter_row = [parameters[field] for field in PARAMETER_FIELDS]
+            num_drops = 0
+            trials_with_drops = 0
+            for trial, (drop_indices, peak_indices, drop_speeds, peak_speeds) in zip(trials, set_results):
+                trial_key = [trial['participant'], trial['trial_id'], trial['round']]
+                trial_writer.writerow(parameter_row + trial_key + [len(trial['speeds']), len(drop_indices)])
+                num_drops += len(drop_indices)
+                trials_with_drops += len(drop_indices) > 0
+                for k, index in enumerate(drop_indices):
+                    x, y = trial['trajectory'][index] if trial['trajectory'] is not None else ('', '')
+                    drop_time = ((trial['timestamps'][index] - trial['timestamps'][0]) / 1000.0
+                                 if trial['timestamps'] is not None else '')
+                    drop_writer.writerow(parameter_row + trial_key +
+                                         [k, int(index), int(peak_indices[k]), float(drop_speeds[k]),
+                                          float(peak_speeds[k]), x, y, drop_time])
+            summary.append({**{field: parameters[field] for field in PARAMETER_FIELDS},
+                            'trials': len(trials), 'trials_with_drops': trials_with_drops, 'drops': num_drops,
+                            'drops_per_trial': num_drops / len(trials) if trials else 0.0})
+
+    with open(output_dir / "sweep_summary.csv", 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(summary)
+    return summary
+
+
+def print_sweep_summary(summary):
+    """Print the drop counts of every parameter set.
+
+    Args:
+        summary (list): Summary rows as returned by write_sweep_results
+    """
+    print(f"{'set':>4}  {'filter':<32}{'ratio':>7}{'duration':>10}{'drops':>8}{'per trial':>11}{'trials hit':>12}")
+    for row in summary:
+        filter_name = row['filter_type'] + (f":{row['filter_params']}" if row['filter_params'] else '')
+        print(f"{row['parameter_set']:>4}  {filter_name:<32}{row['drop_ratio']:>7.2f}{row['drop_duration']:>10}"
+              f"{row['drops']:>8}{row['drops_per_trial']:>11.2f}{row['trials_with_drops']:>12}")
+
+
+def main(argv=None, prog=None):
+    """Main function to sweep speed drop detection parameters from the command line.
+
+    Args:
+        argv (list): Command line arguments, or None to read sys.argv
+        prog (str): Program name shown in the help, or None for the script name
+    """
+    parser = argparse.ArgumentParser(prog=prog, description='Sweep speed drop detection parameters over every trial')
+    parser.add_argument('input_dir', help='Directory containing participant JSON data files, or a trajectory store')
+    parser.add_argument('output_dir', help='Directory to write the result tables to')
+    parser.add_argument('--drop-ratios', type=float, nargs='+', default=[0.3],
+                        help='Minimum speed drop ratios to try (default: 0.3)')
+    parser.add_argument('--drop-durations', type=int, nargs='+', default=[3],
+                        help='Minimum speed drop durations in time steps to try (default: 3)')
+    parser.add_argument('--filters', type=str, nargs='+', default=['none'],
+                        help='Noise filters to try, as "type" or "type:key=value,key=value" '
+                             f'(types: {", ".join(FILTER_TYPES)}; default: none)')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Number of worker processes (default: 1, 0 uses every CPU)')
+
+    args = parser.parse_args(argv)
+    try:
+        grid = parameter_grid(args.filters, args.drop_ratios, args.drop_durations)
+    except ValueError as e:
+        parser.error(str(e))
+
+    start = time.perf_counter()
+    trials = load_sweep_trials(args.input_dir)
+    print(f"Loaded {len(trials)} trials with speeds in {time.perf_counter() - start:.1f} s")
+
+    start = time.perf_counter()
+    results = run_sweep(trials, grid, args.jobs)
+    print(f"Evaluated {len(grid)} parameter sets in {time.perf_counter() - start:.1f} s")
+
+    summary = write_sweep_results(trials, grid, results, args.output_dir)
+    print_sweep_summary(summary)
+    print(f"Sweep results saved to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+"""
+Speed Profiles for React Steering Experiment
+Noise filtering and speed drop detection for recorded speed profiles, shared by the trajectory plots
+and the parameter sweep without loading any plotting code
+"""
+
+import functools
+
+import numpy as np
+
+# scipy is imported inside the functions that use it, so commands that only need FILTER_TYPES
+# (e.g. "sweep --help") start without loading it
+
+
+FILTER_TYPES = ('none', 'savgol', 'gaussian', 'butterworth', 'moving_average', 'median', 'adaptive')
+SPEED_DROP_PROMINENCE = 0.001  # Minimum prominence of the peaks and valleys paired into drops
+
+
+@functools.lru_cache(maxsize=None)
+def butterworth_design(order, cutoff):
+    """Design a low-pass Butterworth filter, once per parameter set.
+    
+    Args:
+        order (int): Filter order
+        cutoff (float): Normalized cutoff frequency
+        
+    Returns:
+        tuple: (b, a) - Numerator and denominator coefficients, shared between callers
+    """
+    from scipy.signal import butter
+    return butter(order, cutoff, btype='low', analog=False)
+
+
+def savgol_window(length, window_length=None):
+    """Pick the Savitzky-Golay window for a profile of the given length.
+    
+    Args:
+        length (int): Number of samples in the profile
+        window_length (int, optional): Requested window. Defaults to 11, or less for short profiles.
+        
+    Returns:
+        int: Odd window length that does not exceed the profile
+    """
+    if window_length is None:
+        window_length = min(11, length // 3 * 2 + 1)
+    if window_length % 2 == 0:
+        window_length += 1  # Must be odd
+    # Ensure window length doesn't exceed data length
+    return min(window_length, length)
+
+
+def apply_noise_filtering(speeds, filter_type='savgol', **kwargs):
+    """Apply various noise filtering techniques to speed data.
+    
+    Filters run along the last axis, so a 2-D array of equal-length profiles is filtered row
+    by row in a single call (see apply_noise_filtering_batch).
+    
+    Args:
+        speeds (np.ndarray): Raw speed data
+        filter_type (str): Type of filter to apply
+        **kwargs: Additional parameters for specific filters
+        
+    Returns:
+        np.ndarray: Filtered speed data
+    """
+    from scipy.ndimage import gaussian_filter1d, median_filter
+    from scipy.signal import filtfilt, savgol_filter
+
+    if np.shape(speeds)[-1] < 3:
+        return speeds
+    
+    speeds_array = np.array(speeds)
+    length = speeds_array.shape[-1]
+    # Filter footprint that leaves the rows of a batch independent
+    rows = (1,) * (speeds_array.ndim - 1)
+    
+    if filter_type == 'savgol':
+        # Savitzky-Golay filter - preserves peaks while smoothing
+        window_length = savgol_window(length, kwargs.get('window_length'))
+        if window_length < 3:
+            return speeds_array  # Too short for filtering
+        polyorder = kwargs.get('polyorder', min(3, window_length - 1))
+        return savgol_filter(speeds_array, window_length, polyorder)
+    
+    elif filter_type == 'gaussian':
+        # Gaussian filter - smooth but may blur sharp features
+        sigma = kwargs.get('sigma', 1.0)
+        return gaussian_filter1d(speeds_array, sigma)
+    
+    elif filter_type == 'butterworth':
+        # Butterworth low-pass filter - good frequency domain filtering
+        cutoff = kwargs.get('cutoff', 0.1)  # Normalized frequency
+        order = kwargs.get('order', 3)
+        b, a = butterworth_design(order, cutoff)
+        # Short profiles get less edge padding than filtfilt's default, which must be shorter than the profile
+        padlen = min(3 * max(len(a), len(b)), speeds_array.shape[-1] - 1)
+        return filtfilt(b, a, speeds_array, padlen=padlen)
+    
+    elif filter_type == 'moving_average':
+        # Simple moving average
+        window_size = kwargs.get('window_size', 5)
+        kernel = np.ones(window_size)/window_size
+        if speeds_array.ndim == 1:
+            return np.convolve(speeds_array, kernel, mode='same')
+        # np.convolve is 1-D only, and already faster per row than a 2-D convolution
+        return np.array([np.convolve(row, kernel, mode='same') for row in speeds_array])
+    
+    elif filter_type == 'median':
+        # Median filter - good for removing outliers
+        kernel_size = kwargs.get('kernel_size', 5)
+        return median_filter(speeds_array, size=rows + (kernel_size,))
+    
+    elif filter_type == 'adaptive':
+        # Adaptive filtering - combines multiple methods
+        # First apply median to remove outliers
+        cleaned = median_filter(speeds_array, size=rows + (3,))
+        # Then apply Savitzky-Golay for smoothing
+        return savgol_filter(cleaned, savgol_window(length), 3)
+    
+    else:
+        return speeds_array
+
+
+def apply_noise_filtering_batch(speed_profiles, filter_type='savgol', **kwargs):
+    """Apply a noise filter to many speed profiles at once.
+    
+    Profiles of equal length are stacked and filtered in one call per length, so each filter
+    is designed once per parameter set instead of once per trial. Results match calling
+    apply_noise_filtering on each profile up to floating point rounding.
+    
+    Args:
+        speed_profiles (list): Speed profiles (lists or arrays), one per trial
+        filter_type (str): Type of filter to apply
+        **kwargs: Additional parameters for specific filters
+        
+    Returns:
+        list: Filtered speed data for each profile
+    """
+    profiles = [np.asarray(speeds) for speeds in speed_profiles]
+    by_length = {}
+    for index, speeds in enumerate(profiles):
+        by_length.setdefault(len(speeds), []).append(index)
+    
+    filtered = list(profiles)
+    for indices in by_length.values():
+        batch = apply_noise_filtering(np.stack([profiles[index] for index in indices]), filter_type, **kwargs)
+        for index, speeds in zip(indices, batch):
+            filtered[index] = speeds
+    return filtered
+
+
+def parse_filter_params(param_string):
+    """Parse filter parameters from command line string.
+    
+    Args:
+        param_string (str): Comma-separated key=value pairs
+        
+    Returns:
+        dict: Parsed parameters
+    """
+    if not param_string:
+        return {}
+    
+    params = {}
+    for pair in param_string.split(','):
+        if '=' in pair:
+            key, value = pair.strip().split('=', 1)
+            # Try to convert to appropriate type
+            try:
+                if '.' in value:
+                    params[key] = float(value)
+                else:
+                    params[key] = int(value)
+            except ValueError:
+                params[key] = value
+    return params
+
+
+def find_speed_drop_valleys(speeds_array, min_prominence=SPEED_DROP_PROMINENCE):
+    """Find the valleys of a speed array and how far back each one stands out.
+    
+    A valley's prominence can only shrink when the samples before a peak are cut off, so each
+    valley also records its reach: the last sample before it that is at least min_prominence
+    faster. The valley stands out behind a peak exactly when its reach lies after that peak.
+    
+    Args:
+        speeds_array (np.ndarray): Speed values over time; -inf samples separate profiles
+        min_prominence (float): Minimum prominence of the valleys
+        
+    Returns:
+        tuple: (valleys, reach) index arrays
+    """
+    from scipy.signal import find_peaks
+    speeds_float = np.asarray(speeds_array, dtype=float)
+    valleys, _ = find_peaks(-speeds_float, prominence=min_prominence)
+    valleys = valleys[np.isfinite(speeds_float[valleys])]
+    
+    # levels[k][i] is the fastest of the 2**k samples ending at i (counted backwards from the end)
+    backwards = speeds_float[::-1]
+    levels = [backwards]
+    while 2 ** len(levels) <= len(backwards):
+        width = 2 ** (len(levels) - 1)
+        levels.append(np.maximum(levels[-1][:-width], levels[-1][width:]))
+    
+    # Skip the largest runs of samples that are all too slow, walking back from each valley
+    positions = len(backwards) - 1 - valleys
+    valley_speeds = speeds_float[valleys]
+    for level in range(len(levels) - 1, -1, -1):
+        maxima = levels[level]
+        in_range = positions < len(maxima)
+        run_maxima = maxima[np.minimum(positions, len(maxima) - 1)]
+        skip = in_range & ~(run_maxima - valley_speeds >= min_prominence)
+        positions = positions + np.where(skip, 2 ** level, 0)
+    reach = len(backwards) - 1 - positions
+    
+    return valleys, reach
+
+
+def find_speed_drop_candidates(speeds_array, min_drop_duration=3, min_prominence=SPEED_DROP_PROMINENCE):
+    """Find the peaks and valleys of one speed profile that can form speed drops.
+    
+    Args:
+        speeds_array (np.ndarray): Speed values over time
+        min_drop_duration (int): Minimum number of samples between peaks
+        min_prominence (float): Minimum prominence of peaks and valleys
+        
+    Returns:
+        tuple: (peaks, valleys, reach) index arrays, as in find_speed_drop_valleys
+    """
+    from scipy.signal import find_peaks
+    peaks, _ = find_peaks(speeds_array, distance=min_drop_duration, prominence=min_prominence)
+    valleys, reach = find_speed_drop_valleys(speeds_array, min_prominence)
+    return peaks, valleys, reach
+
+
+def pair_speed_drops(speeds_array, peaks, valleys, reach, profile_ends, min_drop_ratio=0.3, min_drop_duration=3):
+    """Pair every peak with the first valley that stands out after it and keep significant drops.
+    
+    Peaks, valleys and profile ends may index several concatenated speed profiles; valleys are
+    never paired across profiles.
+    
+    Args:
+        speeds_array (np.ndarray): Speed values over time
+        peaks (np.ndarray): Sorted peak indices
+        valleys (np.ndarray): Sorted valley indices
+        reach (np.ndarray): Reach of each valley, as returned by find_speed_drop_valleys
+        profile_ends (np.ndarray): End index (exclusive) of the profile containing each peak
+        min_drop_ratio (float): Minimum ratio of speed drop to be considered significant (0-1)
+        min_drop_duration (int): Minimum duration of drop in time steps
+        
+    Returns:
+        tuple: (valley_indices, is_drop) - Valley paired with each peak (-1 for none) and a mask of
+               the pairs that meet the duration and ratio criteria
+    """
+    # The first valley reaching past a peak is the first one whose running maximum reach does
+    reach_so_far = np.maximum.accumulate(reach) if len(reach) else reach
+    pair_positions = np.searchsorted(reach_so_far, peaks + 1, side='left')
+    paired = pair_positions < len(valleys)
+    valley_indices = np.full(len(peaks), -1, dtype=np.int64)
+    valley_indices[paired] = valleys[pair_positions[paired]]
+    paired &= valley_indices < profile_ends
+    valley_indices[~paired] = -1
+    
+    peak_speeds = speeds_array[peaks]
+    valley_speeds = speeds_array[np.where(paired, valley_indices, peaks)]
+    durations = valley_indices - peaks
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drop_ratios = np.where(peak_speeds > 0, (peak_speeds - valley_speeds) / peak_speeds, 0)
+    is_drop = paired & (durations >= min_drop_duration) & (drop_ratios >= min_drop_ratio)
+    return valley_indices, is_drop
+
+
+def detect_speed_drops(speeds, min_drop_ratio=0.3, min_drop_duration=3, debug=False):
+    """Detect significant speed drops in the speed profile.
+    
+    Simple approach: For each peak, find the very next local minimum that follows it.
+    The time between peak and valley is the duration, and the proportional difference is the ratio.
+    Peaks and valleys are found once and paired with a binary search, so the cost grows linearly
+    with the profile length.
+    
+    Args:
+        speeds (list or np.ndarray): Speed values over time
+        min_drop_ratio (float): Minimum ratio of speed drop to be considered significant (0-1)
+        min_drop_duration (int): Minimum duration of drop in time steps
+        debug (bool): Whether to print debug information
+        
+    Returns:
+        tuple: (drop_indices, peak_indices) - Indices where significant speed drops occur and their corresponding peaks
+    """
+    if len(speeds) < 3:
+        return [], []
+    
+    speeds_array = np.array(speeds)
+    
+    if debug:
+        print(f"Debug: Analyzing {len(speeds_array)} speed points")
+        print(f"Debug: Min drop ratio: {min_drop_ratio}, Min duration: {min_drop_duration}")
+    
+    peaks, valleys, reach = find_speed_drop_candidates(speeds_array, min_drop_duration)
+    
+    if debug:
+        print(f"Debug: Found {len(peaks)} potential peaks at indices: {peaks}")
+    
+    profile_ends = np.full(len(peaks), len(speeds_array))
+    valley_indices, is_drop = pair_speed_drops(speeds_array, peaks, valleys, reach, profile_ends,
+                                               min_drop_ratio, min_drop_duration)
+    significant_drops = valley_indices[is_drop].tolist()
+    corresponding_peaks = peaks[is_drop].tolist()
+    
+    if debug:
+        for peak_idx, valley_idx, valid in zip(peaks, valley_indices, is_drop):
+            if valley_idx < 0:
+                print(f"Debug: No valleys found after peak {peak_idx}")
+                continue
+            peak_speed = speeds_array[peak_idx]
+            valley_speed = speeds_array[valley_idx]
+            duration = valley_idx - peak_idx
+            drop_ratio = (peak_speed - valley_speed) / peak_speed if peak_speed > 0 else 0
+            print(f"Debug: Peak {peak_idx} -> Valley {valley_idx}: duration={duration}, ratio={drop_ratio:.3f}")
+            if valid:
+                print(f"Debug: VALID DROP: peak={peak_speed:.3f}, valley={valley_speed:.3f}, duration={duration}, ratio={drop_ratio:.3f}")
+            else:
+                print(f"Debug: REJECTED DROP: duration={duration} (min={min_drop_duration}), ratio={drop_ratio:.3f} (min={min_drop_ratio})")
+        print(f"Debug: Final significant drops: {significant_drops}")
+        print(f"Debug: Corresponding peaks: {corresponding_peaks}")
+    
+    return significant_drops, corresponding_peaks
+
+
+def detect_speed_drops_batch(speed_profiles, min_drop_ratio=0.3, min_drop_duration=3):
+    """Detect significant speed drops in many speed profiles in one call.
+    
+    Gives the same result as calling detect_speed_drops on each profile. The profiles are
+    concatenated with a -inf sample between neighbours, which no valley's prominence or reach
+    can extend past, so the valleys of all profiles are found in one pass and every peak is
+    paired in one searchsorted call, bounded by the end of its own profile. Peaks are still
+    found per profile, since their minimum spacing must not suppress peaks across profiles.
+    
+    Args:
+        speed_profiles (list): Speed profiles (lists or arrays), one per trial
+        min_drop_ratio (float): Minimum ratio of speed drop to be considered significant (0-1)
+        min_drop_duration (int): Minimum duration of drop in time steps
+        
+    Returns:
+        list: (drop_indices, peak_indices) tuple for each profile
+    """
+    from scipy.signal import find_peaks
+    profiles = [np.asarray(speeds, dtype=float) for speeds in speed_profiles]
+    if not profiles:
+        return []
+    starts = np.zeros(len(profiles) + 1, dtype=np.int64)
+    starts[1:] = np.cumsum([len(speeds) + 1 for speeds in profiles])
+    ends = starts[1:] - 1
+    
+    separated = np.full(starts[-1], -np.inf)
+    all_peaks, peak_ends = [], []
+    for speeds, start, end in zip(profiles, starts[:-1], ends):
+        separated[start:end] = speeds
+        if len(speeds) < 3:
+            continue
+        peaks, _ = find_peaks(speeds, distance=min_drop_duration, prominence=SPEED_DROP_PROMINENCE)
+        all_peaks.append(peaks + start)
+        peak_ends.append(np.full(len(peaks), end))
+    
+    if not all_peaks:
+        return [([], []) for _ in profiles]
+    
+    valleys, reach = find_speed_drop_valleys(separated)
+    peaks = np.concatenate(all_peaks).astype(np.int64)
+    valley_indices, is_drop = pair_speed_drops(separated, peaks, valleys, reach, np.concatenate(peak_ends),
+                                               min_drop_ratio, min_drop_duration)
+    
+    drop_peaks = peaks[is_drop]
+    drop_valleys = valley_indices[is_drop]
+    bounds = np.searchsorted(drop_peaks, starts)
+    return [((drop_valleys[lo:hi] - start).tolist(), (drop_peaks[lo:hi] - start).tolist())
+            for start, lo, hi in zip(starts[:-1], bounds[:-1], bounds[1:])]
+
+
+def prepare_speed_profile(speeds, filter_type='none', filter_params=None):
+    """Drop zero speeds and apply the requested noise filter.
+    
+    Args:
+        speeds (list or np.ndarray): Speed values over time
+        filter_type (str): Type of noise filtering to apply
+        filter_params (dict): Parameters for the filter
+        
+    Returns:
+        tuple: (filtered_indices, raw_speeds, filtered_speeds) - Time steps of the non-zero
+               speeds, their raw values and their noise-reduced values
+    """
+    speeds_array = np.array(speeds)
+    non_zero_mask = speeds_array > 0
+    raw_speeds = speeds_array[non_zero_mask]
+    filtered_speeds = raw_speeds
+    filtered_indices = np.where(non_zero_mask)[0]
+    
+    # Apply noise filtering if requested
+    if filter_type != 'none' and len(filtered_speeds) > 3:
+        filter_params = filter_params or {}
+        filtered_speeds = apply_noise_filtering(filtered_speeds, filter_type, **filter_params)
+    return filtered_indices, raw_speeds, filtered_speeds
+
+
+def prepare_speed_profiles(speed_profiles, filter_type='none', filter_params=None):
+    """Drop zero speeds from many speed profiles and filter them in one batch.
+    
+    Args:
+        speed_profiles (list): Speed values over time, one list or array per trial
+        filter_type (str): Type of noise filtering to apply
+        filter_params (dict): Parameters for the filter
+        
+    Returns:
+        list: (filtered_indices, raw_speeds, filtered_speeds) tuple for each profile, as
+              returned by prepare_speed_profile
+    """
+    prepared = []
+    for speeds in speed_profiles:
+        speeds_array = np.array(speeds)
+        non_zero_mask = speeds_array > 0
+        raw_speeds = speeds_array[non_zero_mask]
+        prepared.append((np.where(non_zero_mask)[0], raw_speeds, raw_speeds))
+    
+    if filter_type != 'none':
+        to_filter = [index for index, (_, raw_speeds, _) in enumerate(prepared) if len(raw_speeds) > 3]
+        filtered = apply_noise_filtering_batch([prepared[index][1] for index in to_filter], filter_type,
+                                               **(filter_params or {}))
+        for index, filtered_speeds in zip(to_filter, filtered):
+            prepared[index] = prepared[index][:2] + (filtered_speeds,)
+    return prepared
@@ -0,0 +1,285 @@
+"""
+Stage Profiler for React Steering Experiment
+Opt-in wall time, call count and peak memory accounting for the stages and trials of an
+analysis run; while profiling is off every hook returns a shared no-op context
+"""
+
+import contextlib
+import cProfile
+import io
+import json
+import pstats
+import time
+import tracemalloc
+from pathlib import Path
+
+
+PROFILE_FORMAT_VERSION = 1
+CPROFILE_TOP_FUNCTIONS = 20  # Functions listed in the printed cProfile excerpt
+SLOWEST_TRIALS_SHOWN = 10
+
+_DISABLED = contextlib.nullcontext()
+_state = None
+
+
+def profiling_enabled():
+    """Check whether a profiling session is active.
+
+    Returns:
+        bool: True between enable_profiling and finish_profiling
+    """
+    return _state is not None
+
+
+def enable_profiling(trace_memory=True, cprofile_trial=None, cprofile_path=None):
+    """Start collecting stage and trial statistics in this process.
+
+    Args:
+        trace_memory (bool): Track peak memory with tracemalloc, which slows Python-heavy
+            stages down noticeably; turn off for undistorted timings
+        cprofile_trial: Trial ID whose first occurrence is run under cProfile, or None
+        cprofile_path (str or Path): File the cProfile statistics of that trial are dumped to
+    """
+    global _state
+    _state = {
+        'started': time.perf_counter(),
+        'trace_memory': trace_memory,
+        'stages': {},
+        'trials': [],
+        'stack': [],
+        'trial': None,
+        'cprofile_trial': None if cprofile_trial is None else str(cprofile_trial),
+        'cprofile_path': None if cprofile_path is None else str(cprofile_path),
+        'cprofile_label': None,
+        'peak_bytes': 0,
+    }
+    if trace_memory:
+        tracemalloc.start()
+
+
+def _enter_frame(name):
+    frame = {'name': name, 'child_s': 0.0, 'start_bytes': 0, 'peak_bytes': 0}
+    if _state['trace_memory']:
+        current, peak = tracemalloc.get_traced_memory()
+        _state['peak_bytes'] = max(_state['peak_bytes'], peak)
+        if _state['stack']:
+            parent = _state['stack'][-1]
+            parent['peak_bytes'] = max(parent['peak_bytes'], peak)
+        tracemalloc.reset_peak()
+        frame['start_bytes'] = frame['peak_bytes'] = current
+    _state['stack'].append(frame)
+    frame['start'] = time.perf_counter()
+    return frame
+
+
+def _exit_frame(frame):
+    elapsed = time.perf_counter() - frame['start']
+    _state['stack'].pop()
+    if _state['trace_memory']:
+        frame['peak_bytes'] = max(frame['peak_bytes'], tracemalloc.get_traced_memory()[1])
+        _state['peak_bytes'] = max(_state['peak_bytes'], frame['peak_bytes'])
+    if _state['stack']:
+        parent = _state['stack'][-1]
+        parent['child_s'] += elapsed
+        parent['peak_bytes'] = max(parent['peak_bytes'], frame['peak_bytes'])
+
+    self_s = elapsed - frame['child_s']
+    peak_bytes = frame['peak_bytes'] - frame['start_bytes']
+    stage = _state['stages'].setdefault(frame['name'], {'calls': 0, 'total_s': 0.0, 'self_s': 0.0, 'peak_bytes': 0})
+    stage['calls'] += 1
+    stage['total_s'] += elapsed
+    stage['self_s'] += self_s
+    stage['peak_bytes'] = max(stage['peak_bytes'], peak_bytes)
+    if _state['trial'] is not None and frame['name'] != 'trial':
+        trial_stages = _state['trial']['stages']
+        trial_stages[frame['name']] = trial_stages.get(frame['name'], 0.0) + self_s
+    return elapsed, peak_bytes
+
+
+@contextlib.contextmanager
+def _profiled_stage(name):
+    frame = _enter_frame(name)
+    try:
+        yield
+    finally:
+        _exit_frame(frame)
+
+
+def profile_stage(name):
+    """Context manager accounting the enclosed work to a stage.
+
+    Stages nest; a stage's self time excludes the stages inside it, its total time does not.
+    Peak memory is the largest growth of traced memory over the stage's starting point.
+
+    Args:
+        name (str): Stage name, e.g. 'load', 'geometry', 'metrics', 'draw' or 'savefig'
+
+    Returns:
+        A context manager; a shared no-op one while profiling is off
+    """
+    if _state is None:
+        return _DISABLED
+    return _profiled_stage(name)
+
+
+@contextlib.contextmanager
+def _profiled_trial(label, trial_id):
+    record = {'label': label, 'seconds': 0.0, 'peak_bytes': 0, 'stages': {}}
+    outer_trial = _state['trial']
+    _state['trial'] = record
+
+    profiler = None
+    if (_state['cprofile_trial'] is not None and _state['cprofile_label'] is None
+            and str(trial_id) == _state['cprofile_trial']):
+        _state['cprofile_label'] = label
+        profiler = cProfile.Profile()
+
+    frame = _enter_frame('trial')
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        record['seconds'], record['peak_bytes'] = _exit_frame(frame)
+        _state['trial'] = outer_trial
+        _state['trials'].append(record)
+        if profiler is not None:
+            report_cprofile(profiler, label)
+
+
+def profile_trial(label, trial_id=None):
+    """Context manager recording the time, peak memory and stage breakdown of one trial.
+
+    The first trial whose ID matches the cprofile_trial given to enable_profiling also runs
+    under cProfile.
+
+    Args:
+        label (str): Name of the trial in the report
+        trial_id: Trial ID compared against the cProfile selection
+
+    Returns:
+        A context manager; a shared no-op one while profiling is off
+    """
+    if _state is None:
+        return _DISABLED
+    return _profiled_trial(label, trial_id)
+
+
+def profile_iter(name, iterable):
+    """Account the time spent producing each item of an iterable to a stage.
+
+    Used for lazily loaded participant documents, whose parsing happens inside next().
+
+    Args:
+        name (str): Stage name
+        iterable (iterable): Items to produce
+
+    Returns:
+        iterable: The iterable itself while profiling is off, else a generator over its items
+    """
+    if _state is None:
+        return iterable
+    return _profiled_iter(name, iterable)
+
+
+def _profiled_iter(name, iterable):
+    iterator = iter(iterable)
+    while True:
+        with profile_stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def report_cprofile(profiler, label):
+    """Dump the cProfile statistics of a trial and print its most expensive functions.
+
+    Args:
+        profiler (cProfile.Profile): Profiler that ran the trial
+        label (str): Trial label
+    """
+    if _state['cprofile_path']:
+        Path(_state['cprofile_path']).parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(_state['cprofile_path'])
+        print(f"cProfile statistics of {label} saved to {_state['cprofile_path']}")
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(CPROFILE_TOP_FUNCTIONS)
+    print(stream.getvalue())
+
+
+def profile_report():
+    """Collect the statistics of the active session.
+
+    Returns:
+        dict: Report with wall_s, trace_memory, peak_bytes (whole run), stages (name, calls,
+              total_s, self_s, peak_bytes; by self time), trials (label, seconds, peak_bytes,
+              stages) and the cProfile trial and file
+    """
+    stages = [{'name': name, **stage} for name, stage in _state['stages'].items()]
+    stages.sort(key=lambda stage: stage['self_s'], reverse=True)
+    return {
+        'version': PROFILE_FORMAT_VERSION,
+        'wall_s': time.perf_counter() - _state['started'],
+        'trace_memory': _state['trace_memory'],
+        'peak_bytes': max(_state['peak_bytes'], tracemalloc.get_traced_memory()[1]) if _state['trace_memory'] else None,
+        'stages': stages,
+        'trials': _state['trials'],
+        'cprofile_trial': _state['cprofile_label'],
+        'cprofile_file': _state['cprofile_path'] if _state['cprofile_label'] else None,
+    }
+
+
+def print_profile_summary(report):
+    """Print the stage table and the slowest trials of a report.
+
+    Args:
+        report (dict): Report as returned by profile_report
+    """
+    memory = report['trace_memory']
+    print("\n" + "=" * 50)
+    print(f"Profile: {report['wall_s']:.2f} s wall time"
+          + (f", {report['peak_bytes'] / 2**20:.1f} MB peak traced memory" if memory else ""))
+    print(f"{'stage':<12}{'calls':>8}{'total s':>10}{'self s':>10}{'% wall':>8}" + (f"{'peak MB':>10}" if memory else ""))
+    for stage in report['stages']:
+        share = stage['self_s'] / report['wall_s'] * 100 if report['wall_s'] > 0 else 0.0
+        print(f"{stage['name']:<12}{stage['calls']:>8}{stage['total_s']:>10.2f}{stage['self_s']:>10.2f}{share:>8.1f}"
+              + (f"{stage['peak_bytes'] / 2**20:>10.1f}" if memory else ""))
+
+    slowest = sorted(report['trials'], key=lambda trial: trial['seconds'], reverse=True)[:SLOWEST_TRIALS_SHOWN]
+    if slowest:
+        print("\nSlowest trials:")
+        for trial in slowest:
+            breakdown = ', '.join(f"{name} {seconds:.2f}" for name, seconds
+                                  in sorted(trial['stages'].items(), key=lambda item: -item[1]))
+            print(f"  {trial['label']:<40}{trial['seconds']:>8.2f} s  ({breakdown})")
+
+
+def finish_profiling(report_path=None):
+    """End the session, print its summary and write the JSON report.
+
+    Args:
+        report_path (str or Path): JSON file to write, or None to only print the summary
+
+    Returns:
+        dict: Report as returned by profile_report, or None if profiling was off
+    """
+    global _state
+    if _state is None:
+        return None
+    report = profile_report()
+    if _state['trace_memory']:
+        tracemalloc.stop()
+    _state = None
+
+    print_profile_summary(report)
+    if report_path:
+        report_path = Path(report_path)
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Profile report saved to {report_path}")
+    return report
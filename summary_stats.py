@@ -0,0 +1,176 @@
+"""
+Summary Statistics for React Steering Experiment
+Writes per-participant completion time summaries without loading any plotting libraries
+Example usage:
+python summary_stats.py ./participant_data/ ./results/
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from participant_cache import DEFAULT_CACHE_BYTES, iter_cached_participant_documents
+from participant_data import get_trial_id, iter_participant_documents
+from trajectory_store import is_trajectory_store, iter_store_participants, load_store
+
+
+def generate_summary_stats(trial_data_list, participant_output_dir, participant_id):
+    """Generate summary statistics and save to text file.
+    
+    Args:
+        trial_data_list (list): List of trial data dictionaries
+        participant_output_dir (Path): Output directory for this participant
+        participant_id (str): Participant ID
+    """
+    summary_file = participant_output_dir / f"summary_stats_{participant_id}.txt"
+    
+    # Separate trials by type
+    basic_trials = [t for t in trial_data_list if t.get('condition', {}).get('timeLimit') is None]
+    time_trials = [t for t in trial_data_list if t.get('condition', {}).get('timeLimit') is not None]
+    
+    # Further separate by tunnel type
+    curved_trials = [t for t in trial_data_list if t.get('condition', {}).get('tunnelType', 'curved') == 'curved']
+    sequential_trials = [t for t in trial_data_list if t.get('condition', {}).get('tunnelType') == 'sequential']
+    
+    # Separate basic trials by tunnel type
+    basic_curved = [t for t in basic_trials if t.get('condition', {}).get('tunnelType', 'curved') == 'curved']
+    basic_sequential = [t for t in basic_trials if t.get('condition', {}).get('tunnelType') == 'sequential']
+    
+    # Separate time trials by tunnel type
+    time_curved = [t for t in time_trials if t.get('condition', {}).get('tunnelType', 'curved') == 'curved']
+    time_sequential = [t for t in time_trials if t.get('condition', {}).get('tunnelType') == 'sequential']
+    
+    with open(summary_file, 'w') as f:
+        f.write(f"Steering Experiment Analysis Summary\n")
+        f.write(f"Participant: {participant_id}\n")
+        f.write(f"Analysis Date: {np.datetime64('now')}\n")
+        f.write("=" * 50 + "\n\n")
+        
+        f.write(f"Total Trials: {len(trial_data_list)}\n")
+        f.write(f"Basic Trials: {len(basic_trials)}\n")
+        f.write(f"  - Curved Tunnels: {len(basic_curved)}\n")
+        f.write(f"  - Sequential Tunnels: {len(basic_sequential)}\n")
+        f.write(f"Time-Constrained Trials: {len(time_trials)}\n")
+        f.write(f"  - Curved Tunnels: {len(time_curved)}\n")
+        f.write(f"  - Sequential Tunnels: {len(time_sequential)}\n\n")
+        
+        # Overall statistics
+        if trial_data_list:
+            completion_times = [t.get('completionTime', 0) for t in trial_data_list]
+            
+            f.write("Overall Statistics:\n")
+            f.write(f"  Average completion time: {np.mean(completion_times):.2f}s\n\n")
+        
+        # Basic trials statistics
+        if basic_trials:
+            basic_times = [t.get('completionTime', 0) for t in basic_trials]
+            
+            f.write("Basic Trials Statistics:\n")
+            f.write(f"  Average completion time: {np.mean(basic_times):.2f}s\n\n")
+        
+        # Time-constrained trials statistics
+        if time_trials:
+            time_times = [t.get('completionTime', 0) for t in time_trials]
+            timeout_failures = sum(1 for t in time_trials if t.get('failedDueToTimeout', False))
+            
+            f.write("Time-Constrained Trials Statistics:\n")
+            f.write(f"  Average completion time: {np.mean(time_times):.2f}s\n")
+            f.write(f"  Timeout failures: {timeout_failures}\n\n")
+        
+        # Curved tunnel statistics
+        if curved_trials:
+            curved_times = [t.get('completionTime', 0) for t in curved_trials]
+            
+            f.write("Curved Tunnel Statistics:\n")
+            f.write(f"  Average completion time: {np.mean(curved_times):.2f}s\n\n")
+        
+        # Sequential tunnel statistics
+        if sequential_trials:
+            sequential_times = [t.get('completionTime', 0) for t in sequential_trials]
+            
+            f.write("Sequential Tunnel Statistics:\n")
+            f.write(f"  Average completion time: {np.mean(sequential_times):.2f}s\n\n")
+        
+        # Individual trial details
+        f.write("Individual Trial Details:\n")
+        f.write("-" * 30 + "\n")
+        for trial in trial_data_list:
+            trial_id = get_trial_id(trial, 'Unknown')
+            condition = trial.get('condition', {})
+            completion_time = trial.get('completionTime', 0)
+            
+            f.write(f"Trial {trial_id}: {condition.get('description', 'No description')}\n")
+            f.write(f"  Time: {completion_time:.2f}s\n")
+    
+    print(f"Summary statistics saved to: {summary_file}")
+
+
+def process_summary_stats(input_dir, output_dir, cache_dir=None, cache_bytes=DEFAULT_CACHE_BYTES):
+    """Write the summary statistics of every participant in the input directory.
+    
+    Files land in the same participant_<id> directories as the plots of plot_trajectories.py.
+    
+    Args:
+        input_dir (str): Directory containing participant JSON files, or a trajectory store
+        output_dir (str): Directory to store the summaries
+        cache_dir (str): Directory of the parse cache, or None to always parse the JSON files
+        cache_bytes (int): Byte budget of the parse cache
+        
+    Returns:
+        int: Number of participants summarized
+    """
+    input_path = Path(input_dir)
+    output_path = Path(output_dir)
+    
+    if not input_path.exists():
+        print(f"Error: Input directory not found: {input_dir}")
+        return 0
+    
+    if is_trajectory_store(input_path):
+        participant_sources = ((participant_data, input_path)
+                               for participant_data in iter_store_participants(load_store(input_path)))
+    else:
+        json_files = list(input_path.glob("*.json"))
+        if not json_files:
+            print(f"No JSON files found in {input_dir}")
+            return 0
+        if cache_dir:
+            participant_sources = iter_cached_participant_documents(json_files, cache_dir, cache_bytes)
+        else:
+            participant_sources = iter_participant_documents(json_files)
+    
+    count = 0
+    for data, source_path in participant_sources:
+        participant_id = data.get('participantId', source_path.stem)
+        participant_output_dir = output_path / f"participant_{participant_id}"
+        participant_output_dir.mkdir(parents=True, exist_ok=True)
+        generate_summary_stats(data.get('trialData', []), participant_output_dir, participant_id)
+        count += 1
+    
+    print(f"Summarized {count} participants in {output_path}")
+    return count
+
+
+def main(argv=None, prog=None):
+    """Main function to write summary statistics from the command line.
+    
+    Args:
+        argv (list): Command line arguments, or None to read sys.argv
+        prog (str): Program name shown in the usage message
+    """
+    parser = argparse.ArgumentParser(prog=prog, description='Write per-participant summary statistics for steering experiment data')
+    parser.add_argument('input_dir', help='Directory containing participant JSON data files, or a trajectory store')
+    parser.add_argument('output_dir', help='Directory to store the summaries')
+    parser.add_argument('--cache-dir', type=str, default=None,
+                       help='Directory for the participant parse cache (default: no cache)')
+    parser.add_argument('--cache-size-mb', type=float, default=DEFAULT_CACHE_BYTES / 2**20,
+                       help='Maximum size of the parse cache in MB (default: 512)')
+    
+    args = parser.parse_args(argv)
+    process_summary_stats(args.input_dir, args.output_dir, cache_dir=args.cache_dir,
+                          cache_bytes=int(args.cache_size_mb * 2**20))
+
+
+if __name__ == "__main__":
+    main()
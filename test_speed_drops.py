@@ -0,0 +1,33 @@
+"""
+Tests for batched speed drop detection in speed_profiles
+"""
+
+import numpy as np
+import pytest
+
+from speed_profiles import detect_speed_drops, detect_speed_drops_batch
+
+
+def synthetic_speed_profiles(num_profiles=60, seed=0):
+    """Random speed profiles with drops of varied size, plus the edge cases of short profiles."""
+    rng = np.random.default_rng(seed)
+    profiles = []
+    for _ in range(num_profiles):
+        length = int(rng.integers(5, 200))
+        base = 0.2 + 0.1 * np.sin(np.linspace(0, rng.uniform(2, 20), length))
+        profiles.append(np.clip(base + rng.normal(0, 0.03, length), 0, None))
+    profiles += [np.array([]), np.array([0.3]), np.array([0.3, 0.1]), np.array([0.2, 0.2, 0.2]),
+                 np.array([0.3, 0.1, 0.3, 0.1, 0.3])]
+    rng.shuffle(profiles)
+    return profiles
+
+
+@pytest.mark.parametrize('min_drop_ratio, min_drop_duration', [(0.3, 3), (0.1, 1), (0.5, 5)])
+def test_batch_matches_per_profile_detection(min_drop_ratio, min_drop_duration):
+    profiles = synthetic_speed_profiles()
+    expected = [detect_speed_drops(speeds, min_drop_ratio, min_drop_duration) for speeds in profiles]
+    assert detect_speed_drops_batch(profiles, min_drop_ratio, min_drop_duration) == expected
+
+
+def test_batch_of_no_profiles():
+    assert detect_speed_drops_batch([]) == []
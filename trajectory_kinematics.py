@@ -0,0 +1,171 @@
+"""
+Trajectory Kinematics for React Steering Experiment
+Batched velocity, speed and tangential acceleration over the packed samples of many trials
+"""
+
+import numpy as np
+
+
+def offsets_from_lengths(lengths):
+    """Build an offsets array from per-trial sample counts.
+
+    Args:
+        lengths (array-like): Number of samples in each trial
+
+    Returns:
+        np.ndarray: (T + 1,) int64 array where trial i spans offsets[i]:offsets[i + 1]
+    """
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def split_by_offsets(values, offsets):
+    """Split a packed array back into per-trial views.
+
+    Args:
+        values (np.ndarray): Packed per-sample values
+        offsets (np.ndarray): Trial offsets into values
+
+    Returns:
+        list: One view per trial
+    """
+    return [values[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+def step_validity(offsets, num_samples):
+    """Mark which consecutive sample pairs lie within a single trial.
+
+    Args:
+        offsets (np.ndarray): Trial offsets
+        num_samples (int): Total number of packed samples
+
+    Returns:
+        np.ndarray: (num_samples - 1,) boolean mask; step k joins samples k and k + 1
+    """
+    valid = np.ones(max(num_samples - 1, 0), dtype=bool)
+    boundaries = np.asarray(offsets[1:-1], dtype=np.int64) - 1
+    boundaries = boundaries[(boundaries >= 0) & (boundaries < len(valid))]
+    valid[boundaries] = False
+    return valid
+
+
+def sample_positions(offsets):
+    """Position of every packed sample within its own trial.
+
+    Args:
+        offsets (np.ndarray): Trial offsets
+
+    Returns:
+        tuple: (positions, lengths) where positions[k] is the index of sample k inside its
+               trial and lengths[k] is the length of that trial
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    trial_lengths = np.diff(offsets)
+    starts = np.repeat(offsets[:-1], trial_lengths)
+    positions = np.arange(offsets[-1], dtype=np.int64) - starts
+    return positions, np.repeat(trial_lengths, trial_lengths)
+
+
+def step_velocities(xy, timestamps, offsets):
+    """Compute the velocity and speed of every step of every trial at once.
+
+    Steps with a zero or negative time difference, and the steps that would
+    join two different trials, get zero velocity.
+
+    Args:
+        xy (np.ndarray): (S, 2) packed positions
+        timestamps (np.ndarray): (S,) packed timestamps in milliseconds
+        offsets (np.ndarray): Trial offsets into xy and timestamps
+
+    Returns:
+        tuple: (velocities, speeds, dt) for the S - 1 steps, dt in seconds
+    """
+    xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+    dt = np.diff(np.asarray(timestamps, dtype=float)) / 1000.0  # Convert to seconds
+    usable = (dt > 0) & step_validity(offsets, len(xy))
+
+    velocities = np.zeros((len(dt), 2))
+    np.divide(np.diff(xy, axis=0), dt[:, None], out=velocities, where=usable[:, None])
+    speeds = np.hypot(velocities[:, 0], velocities[:, 1])
+    return velocities, speeds, dt
+
+
+def tangential_accelerations(xy, offsets, timestamps=None, timed=None):
+    """Compute signed tangential acceleration for the packed samples of many trials.
+
+    For timed trials sample j gets (speed[j] - speed[j - 1]) / dt[j], where step j
+    joins samples j and j + 1; the first and last sample of each trial are 0, as are
+    samples whose time step is zero or negative. Untimed trials fall back to the
+    change in step length, (|p[j] - p[j - 1]| - |p[j - 1] - p[j - 2]|), with the
+    first two samples 0.
+
+    Args:
+        xy (np.ndarray): (S, 2) packed positions
+        offsets (np.ndarray): Trial offsets into xy
+        timestamps (np.ndarray): (S,) packed timestamps in milliseconds aligned with xy,
+            or None if no trial is timed
+        timed (array-like): Per-trial booleans selecting which trials use timestamps
+            (default: all trials when timestamps are given)
+
+    Returns:
+        np.ndarray: (S,) accelerations aligned with xy
+    """
+    xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    num_samples = len(xy)
+    accelerations = np.zeros(num_samples)
+    if num_samples < 2:
+        return accelerations
+
+    positions, lengths = sample_positions(offsets)
+
+    if timed is None:
+        timed = np.full(len(offsets) - 1, timestamps is not None)
+    sample_timed = np.repeat(np.asarray(timed, dtype=bool), np.diff(offsets))
+
+    # Step-length fallback: sample g compares steps g - 1 and g - 2
+    step_lengths = np.hypot(*np.diff(xy, axis=0).T)
+    fallback = np.zeros(num_samples)
+    fallback[2:] = step_lengths[1:] - step_lengths[:-1]
+    fallback[positions < 2] = 0.0
+    accelerations = np.where(sample_timed, 0.0, fallback)
+
+    if timestamps is not None and np.any(sample_timed):
+        _, speeds, dt = step_velocities(xy, timestamps, offsets)
+        # Sample g (1 <= g <= N - 2 in its trial) uses steps g - 1 and g
+        interior = sample_timed & (positions >= 1) & (positions <= lengths - 2)
+        g = np.flatnonzero(interior)
+        step_dt = dt[g]
+        values = np.zeros(len(g))
+        np.divide(speeds[g] - speeds[g - 1], step_dt, out=values, where=step_dt > 0)
+        accelerations[g] = values
+
+    return accelerations
+
+
+def store_tangential_accelerations(store):
+    """Compute tangential accelerations for every trial of a trajectory store.
+
+    Trials whose timestamps do not line up with their trajectory use the step-length fallback.
+
+    Args:
+        store (dict): Store as returned by trajectory_store.load_store or build_columns
+
+    Returns:
+        np.ndarray: (S,) accelerations aligned with store['xy'] and store['offsets']
+    """
+    offsets = np.asarray(store['offsets'], dtype=np.int64)
+    timestamp_offsets = np.asarray(store['timestamp_offsets'], dtype=np.int64)
+    timed = np.diff(offsets) == np.diff(timestamp_offsets)
+
+    if np.array_equal(offsets, timestamp_offsets):
+        timestamps = store['timestamps']
+    else:
+        # Copy the usable timestamps into the trajectory layout
+        timestamps = np.zeros(offsets[-1])
+        sample_timed = np.repeat(timed, np.diff(offsets))
+        timestamp_rows = np.repeat(timed, np.diff(timestamp_offsets))
+        timestamps[sample_timed] = np.asarray(store['timestamps'])[timestamp_rows]
+
+    return tangential_accelerations(store['xy'], offsets, timestamps, timed)
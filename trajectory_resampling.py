@@ -0,0 +1,360 @@
+"""
+Trajectory Resampling for React Steering Experiment
+Resamples every trial onto a uniform time grid and a uniform arc-length grid along its tunnel
+centerline, giving one dense (trials x K) matrix per quantity and condition
+Example usage:
+python trajectory_resampling.py ./trajectory_store/ ./results/resampled/
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+from participant_data import find_json_files, iter_participant_documents
+from trajectory_kinematics import offsets_from_lengths, step_velocities
+from trajectory_store import build_columns, is_trajectory_store, load_store
+from tunnel_geometry import cumulative_arc_length, get_tunnel_geometry, project_points_to_tunnel
+
+
+DEFAULT_TIME_SAMPLES = 100  # Columns of the uniform-time matrices
+DEFAULT_ARC_SAMPLES = 200  # Columns of the uniform arc-length matrices
+
+# Per-sample quantities interpolated onto each grid; every matrix is named <grid>_<quantity>
+TIME_QUANTITIES = ('x', 'y', 'speed', 'arc_length', 'lateral_offset')
+ARC_QUANTITIES = ('x', 'y', 'speed', 'time', 'lateral_offset')
+
+
+def reference_path(geometry):
+    """Path that arc lengths and lateral offsets are measured along.
+
+    Args:
+        geometry (dict): Tunnel geometry as returned by get_tunnel_geometry
+
+    Returns:
+        np.ndarray: (M, 2) tunnel centerline, or the straight line from start to target for
+                    unconstrained pointing trials, which have none
+    """
+    centerline = np.asarray(geometry['centerline'], dtype=float).reshape(-1, 2)
+    if len(centerline) >= 2:
+        return centerline
+    return np.array([geometry['start'], geometry['target']], dtype=float)
+
+
+def project_to_path(points, path):
+    """Locate points along a path by arc length and signed distance from it.
+
+    Args:
+        points (np.ndarray): (N, 2) sample positions
+        path (np.ndarray): (M, 2) reference path
+
+    Returns:
+        tuple: (arc_positions, lateral_offsets) - arc length of each point's projection onto
+               the path, and its distance from the path, positive on the side of the normal
+               (-tangent_y, tangent_x); NaN if the path has no usable segment
+    """
+    distances, segment_indices, projections, _ = project_points_to_tunnel(points, path, 0.0)
+    arc_positions = np.full(len(points), np.nan)
+    lateral_offsets = np.full(len(points), np.nan)
+    found = segment_indices >= 0
+    if not np.any(found):
+        return arc_positions, lateral_offsets
+
+    segments = segment_indices[found]
+    arc_length = cumulative_arc_length(path)
+    arc_positions[found] = arc_length[segments] + projections[found] * np.diff(arc_length)[segments]
+
+    directions = path[segments + 1] - path[segments]
+    relative = points[found] - path[segments]
+    side = np.sign(directions[:, 0] * relative[:, 1] - directions[:, 1] * relative[:, 0])
+    lateral_offsets[found] = np.where(side < 0, -1.0, 1.0) * distances[found]
+    return arc_positions, lateral_offsets
+
+
+def unwrap_loop_positions(arc_positions, offsets, loop_length):
+    """Make arc positions on a closed path continuous across the point where the loop closes.
+
+    Each trial starts within half a loop of the path start, and every step is taken the short
+    way round, so progress past the closing point keeps growing instead of jumping back to 0.
+
+    Args:
+        arc_positions (np.ndarray): (S,) packed arc positions in [0, loop_length]
+        offsets (np.ndarray): Trial offsets into arc_positions
+        loop_length (float): Arc length of the closed path
+
+    Returns:
+        np.ndarray: (S,) unwrapped arc positions
+    """
+    half = loop_length / 2
+    lengths = np.diff(offsets)
+    starts = offsets[:-1][lengths > 0]
+    increments = np.zeros(len(arc_positions))
+    increments[1:] = (np.diff(arc_positions) + half) % loop_length - half
+    increments[starts] = (arc_positions[starts] + half) % loop_length - half
+    unwrapped = np.cumsum(increments)
+    trial_base = np.zeros(len(lengths))
+    trial_base[lengths > 0] = unwrapped[starts] - increments[starts]
+    return unwrapped - np.repeat(trial_base, lengths)
+
+
+def advancing_samples(values, offsets):
+    """Mark the samples that move a per-trial running maximum forward.
+
+    Used to drop repeated timestamps and backtracking along the path, so each trial's kept
+    values are strictly increasing. The first sample of every trial is kept.
+
+    Args:
+        values (np.ndarray): (S,) packed per-sample values; NaN never advances
+        offsets (np.ndarray): Trial offsets into values
+
+    Returns:
+        np.ndarray: (S,) boolean mask of samples to keep
+    """
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        return np.zeros(0, dtype=bool)
+    lengths = np.diff(offsets)
+    finite = np.isfinite(values)
+    low = values[finite].min() if np.any(finite) else 0.0
+    high = values[finite].max() if np.any(finite) else 0.0
+
+    # Lift each trial above all earlier ones so a single running maximum stays within trials
+    span = high - low + 1.0
+    lifted = np.where(finite, values - low, -0.5) + np.repeat(np.arange(len(lengths)), lengths) * span
+    keep = np.ones(len(values), dtype=bool)
+    keep[1:] = lifted[1:] > np.maximum.accumulate(lifted)[:-1]
+    return keep & finite
+
+
+def kept_offsets(keep, offsets):
+    """Trial offsets into the samples selected by a mask.
+
+    Args:
+        keep (np.ndarray): (S,) boolean mask over packed samples
+        offsets (np.ndarray): Trial offsets of the unmasked samples
+
+    Returns:
+        np.ndarray: Trial offsets into the kept samples
+    """
+    lengths = np.diff(offsets)
+    trial_of_sample = np.repeat(np.arange(len(lengths)), lengths)
+    return offsets_from_lengths(np.bincount(trial_of_sample[keep], minlength=len(lengths)))
+
+
+def interpolate_trials(keys, values, offsets, queries):
+    """Interpolate the samples of many trials at per-trial query points in one call.
+
+    Args:
+        keys (np.ndarray): (S,) packed sample coordinates, strictly increasing within each trial
+        values (np.ndarray): (S,) packed sample values
+        offsets (np.ndarray): Trial offsets into keys and values
+        queries (np.ndarray): (T, K) query coordinates of each trial
+
+    Returns:
+        np.ndarray: (T, K) interpolated values; NaN outside the range each trial covers
+    """
+    lengths = np.diff(offsets)
+    result = np.full(queries.shape, np.nan)
+    usable = lengths >= 2
+    if not np.any(usable):
+        return result
+
+    # Shift every trial onto its own stretch of one increasing axis
+    starts, ends = keys[offsets[:-1][usable]], keys[offsets[1:][usable] - 1]
+    span = np.max(ends - starts) + 1.0
+    shift = np.zeros(len(lengths))
+    shift[usable] = np.arange(np.count_nonzero(usable)) * span - starts
+    sample_usable = np.repeat(usable, lengths)
+    axis = keys[sample_usable] + np.repeat(shift, lengths)[sample_usable]
+
+    inside = usable[:, None] & (queries >= keys[np.minimum(offsets[:-1], len(keys) - 1)][:, None]) \
+        & (queries <= keys[np.maximum(offsets[1:] - 1, 0)][:, None])
+    shifted_queries = (queries + shift[:, None])[inside]
+    result[inside] = np.interp(shifted_queries, axis, values[sample_usable])
+    return result
+
+
+def resample_condition(xy, times, offsets, geometry, time_samples=DEFAULT_TIME_SAMPLES,
+                       arc_samples=DEFAULT_ARC_SAMPLES):
+    """Resample the trials of one condition onto uniform time and arc-length grids.
+
+    Samples whose timestamp does not advance (repeated samples) are dropped before time
+    resampling and samples that do not advance along the path before arc-length resampling.
+    Speeds are computed between the kept samples of the time domain.
+
+    Args:
+        xy (np.ndarray): (S, 2) packed positions of the condition's trials
+        times (np.ndarray): (S,) packed sample times in seconds, NaN for trials without usable timestamps
+        offsets (np.ndarray): Trial offsets into xy and times
+        geometry (dict): Tunnel geometry of the condition
+        time_samples (int): Columns of the uniform-time matrices
+        arc_samples (int): Columns of the uniform arc-length matrices
+
+    Returns:
+        dict: time_grid (T, time_samples) seconds since each trial's first sample, arc_grid
+              (arc_samples,) meters along the path, and (T, K) matrices time_<quantity> for
+              TIME_QUANTITIES and arc_<quantity> for ARC_QUANTITIES; NaN where a trial does
+              not cover a grid point
+    """
+    xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.diff(offsets)
+    trial_starts = offsets[:-1]
+    num_trials = len(lengths)
+
+    path = reference_path(geometry)
+    arc_positions, lateral_offsets = project_to_path(xy, path)
+    if geometry['closed']:
+        arc_positions = unwrap_loop_positions(arc_positions, offsets, cumulative_arc_length(path)[-1])
+
+    # Time domain: times relative to each trial's first sample, repeated timestamps dropped
+    relative_times = np.asarray(times, dtype=float).copy()
+    if len(relative_times):
+        first = relative_times[np.minimum(trial_starts, len(relative_times) - 1)]
+        relative_times -= np.repeat(np.where(lengths > 0, first, 0.0), lengths)
+    timed = advancing_samples(relative_times, offsets)
+    timed_offsets = kept_offsets(timed, offsets)
+    _, step_speeds, _ = step_velocities(xy[timed], relative_times[timed] * 1000.0, timed_offsets)
+
+    speeds = np.zeros(np.count_nonzero(timed))
+    speeds[1:] = step_speeds
+    speeds[timed_offsets[:-1][np.diff(timed_offsets) > 0]] = 0.0
+    # Samples dropped from the time domain carry the speed of the last kept sample
+    sample_speeds = np.full(len(xy), np.nan)
+    if np.any(timed):
+        last_timed = np.maximum.accumulate(np.where(timed, np.arange(len(xy)), -1))
+        carried = last_timed >= np.repeat(trial_starts, lengths)
+        sample_speeds[carried] = speeds[np.cumsum(timed)[last_timed[carried]] - 1]
+
+    durations = np.full(num_trials, np.nan)
+    timed_lengths = np.diff(timed_offsets)
+    has_time = timed_lengths >= 2
+    durations[has_time] = relative_times[timed][timed_offsets[1:][has_time] - 1]
+    time_grid = durations[:, None] * np.linspace(0.0, 1.0, time_samples)[None, :]
+
+    per_sample = {'x': xy[:, 0], 'y': xy[:, 1], 'speed': sample_speeds, 'time': relative_times,
+                  'arc_length': arc_positions, 'lateral_offset': lateral_offsets}
+    result = {'time_grid': time_grid}
+    for quantity in TIME_QUANTITIES:
+        result[f'time_{quantity}'] = interpolate_trials(relative_times[timed], per_sample[quantity][timed],
+                                                        timed_offsets, time_grid)
+
+    # Arc-length domain: progress along the path, backtracking dropped
+    advancing = advancing_samples(arc_positions, offsets)
+    advancing_offsets = kept_offsets(advancing, offsets)
+    arc_grid = np.linspace(0.0, cumulative_arc_length(path)[-1], arc_samples)
+    arc_queries = np.broadcast_to(arc_grid, (num_trials, arc_samples))
+    result['arc_grid'] = arc_grid
+    for quantity in ARC_QUANTITIES:
+        result[f'arc_{quantity}'] = interpolate_trials(arc_positions[advancing], per_sample[quantity][advancing],
+                                                       advancing_offsets, arc_queries)
+    return result
+
+
+def sample_times(store):
+    """Sample times of every trial of a store in seconds, aligned with its positions.
+
+    Args:
+        store (dict): Store as returned by trajectory_store.load_store or build_columns
+
+    Returns:
+        np.ndarray: (S,) times; NaN for trials whose timestamps do not line up with their trajectory
+    """
+    offsets = np.asarray(store['offsets'], dtype=np.int64)
+    timestamp_offsets = np.asarray(store['timestamp_offsets'], dtype=np.int64)
+    timed = np.diff(offsets) == np.diff(timestamp_offsets)
+    times = np.full(offsets[-1], np.nan)
+    times[np.repeat(timed, np.diff(offsets))] = \
+        np.asarray(store['timestamps'], dtype=float)[np.repeat(timed, np.diff(timestamp_offsets))] / 1000.0
+    return times
+
+
+def resample_store(store, time_samples=DEFAULT_TIME_SAMPLES, arc_samples=DEFAULT_ARC_SAMPLES):
+    """Resample every trial of a trajectory store, grouped by condition.
+
+    Args:
+        store (dict): Store as returned by trajectory_store.load_store or build_columns
+        time_samples (int): Columns of the uniform-time matrices
+        arc_samples (int): Columns of the uniform arc-length matrices
+
+    Returns:
+        list: One dict per condition with the condition, its trial rows in the store (trials),
+              their participant, trial_id and round (MISSING_ROUND where a trial has none), and
+              the grids and matrices returned by resample_condition
+    """
+    offsets = np.asarray(store['offsets'], dtype=np.int64)
+    xy = np.asarray(store['xy'])
+    times = sample_times(store)
+    condition_indices = np.asarray(store['condition'])
+
+    results = []
+    for condition_index, condition in enumerate(store['conditions']):
+        trials = np.flatnonzero(condition_indices == condition_index)
+        if len(trials) == 0:
+            continue
+        samples = np.concatenate([np.arange(offsets[trial], offsets[trial + 1]) for trial in trials])
+        resampled = resample_condition(xy[samples], times[samples], offsets_from_lengths(np.diff(offsets)[trials]),
+                                       get_tunnel_geometry(condition), time_samples, arc_samples)
+        results.append({
+            'condition': condition,
+            'trials': trials,
+            'participant': np.asarray(store['participant'])[trials],
+            'trial_id': np.asarray(store['trial_id'])[trials],
+            'round': np.asarray(store['round'])[trials],
+            **resampled,
+        })
+    return results
+
+
+def write_resampled(results, output_dir):
+    """Write the resampled conditions as one .npz file each, plus a JSON index.
+
+    Args:
+        results (list): Resampled conditions as returned by resample_store
+        output_dir (str or Path): Directory to write to
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    index = []
+    for k, result in enumerate(results):
+        file_name = f"condition_{k:03d}.npz"
+        np.savez_compressed(output_dir / file_name,
+                            **{name: value for name, value in result.items() if name != 'condition'})
+        index.append({'file': file_name, 'condition': result['condition'], 'num_trials': int(len(result['trials']))})
+    with open(output_dir / "index.json", 'w') as f:
+        json.dump(index, f, indent=2)
+
+
+def main(argv=None, prog=None):
+    """Main function to resample trajectories from the command line.
+
+    Args:
+        argv (list): Command line arguments, or None to read sys.argv
+        prog (str): Program name shown in the help, or None for the script name
+    """
+    parser = argparse.ArgumentParser(prog=prog, description='Resample trajectories onto uniform time and arc-length grids')
+    parser.add_argument('input_dir', help='Directory containing participant JSON data files, or a trajectory store')
+    parser.add_argument('output_dir', help='Directory to write one .npz file per condition to')
+    parser.add_argument('--time-samples', type=int, default=DEFAULT_TIME_SAMPLES,
+                        help=f'Samples per trial on the uniform time grid (default: {DEFAULT_TIME_SAMPLES})')
+    parser.add_argument('--arc-samples', type=int, default=DEFAULT_ARC_SAMPLES,
+                        help=f'Samples per trial on the uniform arc-length grid (default: {DEFAULT_ARC_SAMPLES})')
+
+    args = parser.parse_args(argv)
+
+    input_path = Path(args.input_dir)
+    if is_trajectory_store(input_path):
+        store = load_store(input_path)
+    else:
+        store = build_columns(document for document, _ in iter_participant_documents(find_json_files([input_path])))
+
+    results = resample_store(store, args.time_samples, args.arc_samples)
+    write_resampled(results, args.output_dir)
+    num_trials = sum(len(result['trials']) for result in results)
+    print(f"Resampled {num_trials} trials in {len(results)} conditions")
+    print(f"Resampled matrices saved to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
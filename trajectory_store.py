@@ -0,0 +1,351 @@
+"""
+Columnar Trajectory Store for React Steering Experiment
+Flattens participant JSON exports into packed NumPy columns that can be memory-mapped by the analysis scripts
+Example usage:
+python trajectory_store.py ./trajectory_store/ ./data/participants/ ./data/participants-mar-26/
+"""
+
+import json
+import os
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from participant_data import condition_key, find_json_files, get_trial_id, iter_participant_documents
+
+
+STORE_VERSION = 1
+STORE_MANIFEST = "store.json"
+# Stored in the round column for trials without a round; read back as None
+MISSING_ROUND = -1
+
+# Trial fields held in columns; everything else is kept in the extras sidecar
+COLUMNAR_TRIAL_FIELDS = {'trajectory', 'timestamps', 'speeds', 'condition', 'participantId',
+                         'trialId', 'trial_id', 'round', 'completionTime'}
+
+
+def trajectory_to_array(trajectory):
+    """Convert a trajectory in any export format to an (N, 2) float64 array.
+
+    Args:
+        trajectory (list or np.ndarray): List of {x, y} dicts, (x, y) tuples or an (N, 2) array
+
+    Returns:
+        np.ndarray: (N, 2) array of positions
+    """
+    if len(trajectory) == 0:
+        return np.empty((0, 2))
+    if isinstance(trajectory[0], dict):
+        return np.array([(point['x'], point['y']) for point in trajectory], dtype=np.float64)
+    return np.asarray(trajectory, dtype=np.float64).reshape(-1, 2)
+
+
+def document_fields(document):
+    """Strip the trials from a participant document, keeping everything else.
+
+    Sessions keep their own fields; their trials are part of the document's flattened
+    trialData list.
+
+    Args:
+        document (dict): Participant document with a top-level trialData list
+
+    Returns:
+        dict: Document fields without trialData
+    """
+    fields = {key: value for key, value in document.items() if key != 'trialData'}
+    if isinstance(fields.get('sessions'), list):
+        fields['sessions'] = [{key: value for key, value in session.items() if key != 'trialData'}
+                              for session in fields['sessions']]
+    return fields
+
+
+def build_columns(participant_documents):
+    """Flatten participant documents into packed columns.
+
+    Args:
+        participant_documents (iterable): Participant documents with a top-level trialData list
+
+    Returns:
+        dict: Column arrays (xy, timestamps, speeds, offsets, timestamp_offsets, speed_offsets,
+              participant, trial_id, round, condition, completion_time) plus the
+              'conditions' list, the 'extras' dict of non-columnar trial fields and the
+              'documents' list with the fields and trial count of every document
+    """
+    xy_chunks = []
+    timestamp_chunks = []
+    speed_chunks = []
+    trajectory_lengths = []
+    timestamp_lengths = []
+    speed_lengths = []
+    participants = []
+    trial_ids = []
+    rounds = []
+    condition_indices = []
+    completion_times = []
+    conditions = []
+    condition_lookup = {}
+    extras = {}
+    documents = []
+
+    for document in participant_documents:
+        document_participant = document.get('participantId', 'unknown')
+        trial_data = document.get('trialData', [])
+        documents.append({'fields': document_fields(document), 'num_trials': len(trial_data)})
+        for i, trial in enumerate(trial_data):
+            trial_index = len(participants)
+
+            xy = trajectory_to_array(trial.get('trajectory', []))
+            timestamps = np.asarray(trial.get('timestamps', []))
+            speeds = np.asarray(trial.get('speeds', []), dtype=np.float64)
+
+            xy_chunks.append(xy)
+            timestamp_chunks.append(timestamps)
+            speed_chunks.append(speeds)
+            trajectory_lengths.append(len(xy))
+            timestamp_lengths.append(len(timestamps))
+            speed_lengths.append(len(speeds))
+
+            condition_json = condition_key(trial.get('condition', {}))
+            if condition_json not in condition_lookup:
+                condition_lookup[condition_json] = len(conditions)
+                conditions.append(trial.get('condition', {}))
+            condition_indices.append(condition_lookup[condition_json])
+
+            participants.append(trial.get('participantId', document_participant))
+            trial_ids.append(get_trial_id(trial, i + 1))
+            rounds.append(trial.get('round') if trial.get('round') is not None else MISSING_ROUND)
+            completion_times.append(trial.get('completionTime', 0) or 0)
+
+            trial_extras = {key: value for key, value in trial.items() if key not in COLUMNAR_TRIAL_FIELDS}
+            if trial_extras:
+                extras[trial_index] = trial_extras
+
+    def pack(chunks, dtype, shape=(0,)):
+        chunks = [chunk for chunk in chunks if len(chunk)]
+        if not chunks:
+            return np.empty(shape, dtype=dtype)
+        return np.concatenate(chunks).astype(dtype, copy=False)
+
+    def offsets_from(lengths):
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return offsets
+
+    timestamps = pack(timestamp_chunks, np.float64)
+    # Millisecond timestamps are integral; keep them exact as int64
+    if np.all(np.mod(timestamps, 1) == 0):
+        timestamps = timestamps.astype(np.int64)
+
+    return {
+        'xy': pack(xy_chunks, np.float64, shape=(0, 2)),
+        'timestamps': timestamps,
+        'speeds': pack(speed_chunks, np.float64),
+        'offsets': offsets_from(trajectory_lengths),
+        'timestamp_offsets': offsets_from(timestamp_lengths),
+        'speed_offsets': offsets_from(speed_lengths),
+        'participant': np.array(participants, dtype=np.str_),
+        'trial_id': np.array(trial_ids, dtype=np.int64),
+        'round': np.array(rounds, dtype=np.int64),
+        'condition': np.array(condition_indices, dtype=np.int64),
+        'completion_time': np.array(completion_times, dtype=np.float64),
+        'conditions': conditions,
+        'extras': extras,
+        'documents': documents,
+    }
+
+
+def write_store(columns, store_dir):
+    """Write packed columns to a store directory.
+
+    Args:
+        columns (dict): Columns as returned by build_columns
+        store_dir (str or Path): Directory to write the store to
+    """
+    store_path = Path(store_dir)
+    store_path.mkdir(parents=True, exist_ok=True)
+    # An existing store stops being a store before its files are overwritten, so a reader
+    # never opens a manifest whose columns are half replaced
+    (store_path / STORE_MANIFEST).unlink(missing_ok=True)
+
+    array_names = [name for name, value in columns.items() if isinstance(value, np.ndarray)]
+    for name in array_names:
+        np.save(store_path / f"{name}.npy", columns[name])
+
+    with open(store_path / "conditions.json", 'w') as f:
+        json.dump(columns['conditions'], f)
+    with open(store_path / "extras.json", 'w') as f:
+        json.dump({str(index): value for index, value in columns['extras'].items()}, f)
+    with open(store_path / "documents.json", 'w') as f:
+        json.dump(columns['documents'], f)
+
+    # The manifest is written last, and atomically, so a partially written store is never picked up
+    manifest = {
+        'version': STORE_VERSION,
+        'arrays': array_names,
+        'num_trials': int(len(columns['offsets']) - 1),
+        'num_samples': int(columns['offsets'][-1]),
+    }
+    temp_path = store_path / f"{STORE_MANIFEST}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_path, store_path / STORE_MANIFEST)
+
+
+def is_trajectory_store(path):
+    """Check whether a directory contains a trajectory store.
+
+    Args:
+        path (str or Path): Directory to check
+
+    Returns:
+        bool: True if the directory holds a store manifest
+    """
+    return (Path(path) / STORE_MANIFEST).is_file()
+
+
+def load_store(store_dir, mmap_mode='r'):
+    """Open a trajectory store.
+
+    Args:
+        store_dir (str or Path): Store directory
+        mmap_mode (str): Memory-map mode passed to np.load (None loads into memory)
+
+    Returns:
+        dict: Column arrays plus the 'conditions' list, 'extras' dict and 'documents' list
+              (None for stores written before documents were kept)
+    """
+    store_path = Path(store_dir)
+    with open(store_path / STORE_MANIFEST, 'r') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != STORE_VERSION:
+        raise ValueError(f"Unsupported trajectory store version {manifest.get('version')} in {store_dir}")
+
+    store = {name: np.load(store_path / f"{name}.npy", mmap_mode=mmap_mode) for name in manifest['arrays']}
+    with open(store_path / "conditions.json", 'r') as f:
+        store['conditions'] = json.load(f)
+    with open(store_path / "extras.json", 'r') as f:
+        store['extras'] = {int(index): value for index, value in json.load(f).items()}
+    try:
+        with open(store_path / "documents.json", 'r') as f:
+            store['documents'] = json.load(f)
+    except FileNotFoundError:
+        store['documents'] = None
+    return store
+
+
+def get_trial_record(store, trial_index):
+    """Build a trial dictionary whose sample arrays are zero-copy views into the store.
+
+    Args:
+        store (dict): Store as returned by load_store or build_columns
+        trial_index (int): Row of the trial in the metadata table
+
+    Returns:
+        dict: Trial data dictionary in the same shape as the JSON exports
+    """
+    offsets = store['offsets']
+    timestamp_offsets = store['timestamp_offsets']
+    speed_offsets = store['speed_offsets']
+    trial_id = int(store['trial_id'][trial_index])
+    round_number = int(store['round'][trial_index])
+
+    trial = {
+        'participantId': str(store['participant'][trial_index]),
+        'trialId': trial_id,
+        'trial_id': trial_id,
+        'round': round_number if round_number != MISSING_ROUND else None,
+        'condition': store['conditions'][int(store['condition'][trial_index])],
+        'completionTime': float(store['completion_time'][trial_index]),
+        'trajectory': store['xy'][offsets[trial_index]:offsets[trial_index + 1]],
+        'timestamps': store['timestamps'][timestamp_offsets[trial_index]:timestamp_offsets[trial_index + 1]],
+        'speeds': store['speeds'][speed_offsets[trial_index]:speed_offsets[trial_index + 1]],
+    }
+    trial.update(store['extras'].get(trial_index, {}))
+    return trial
+
+
+def iter_store_participants(store):
+    """Yield participant documents reconstructed from a store.
+
+    Every ingested document is yielded with its own fields, including documents without
+    trials. Stores written before documents were kept only hold trials; their trials are
+    grouped by participant, which is stored contiguously in ingest order.
+
+    Args:
+        store (dict): Store as returned by load_store or build_columns
+
+    Yields:
+        dict: Participant document with its fields and trialData
+    """
+    participants = store['participant']
+    if store.get('documents') is None:
+        current_id = None
+        trial_data = []
+        for trial_index in range(len(participants)):
+            participant_id = str(participants[trial_index])
+            if participant_id != current_id:
+                if trial_data:
+                    yield {'participantId': current_id, 'trialData': trial_data}
+                current_id = participant_id
+                trial_data = []
+            trial_data.append(get_trial_record(store, trial_index))
+        if trial_data:
+            yield {'participantId': current_id, 'trialData': trial_data}
+        return
+
+    trial_index = 0
+    for entry in store['documents']:
+        document = dict(entry['fields'])
+        document['trialData'] = [get_trial_record(store, index)
+                                 for index in range(trial_index, trial_index + entry['num_trials'])]
+        if 'participantId' not in document and document['trialData']:
+            document['participantId'] = str(participants[trial_index])
+        trial_index += entry['num_trials']
+        yield document
+
+
+def ingest_participant_data(inputs, store_dir):
+    """Parse participant JSON exports once and write them to a trajectory store.
+
+    Args:
+        inputs (list): JSON files or directories containing participant JSON files
+        store_dir (str): Directory to write the store to
+    """
+    json_files = find_json_files(inputs)
+    if not json_files:
+        print(f"No JSON files found in {', '.join(map(str, inputs))}")
+        return
+
+    print(f"Found {len(json_files)} JSON files to ingest")
+
+    def iter_documents():
+        for document, json_file in iter_participant_documents(json_files):
+            print(f"Loaded data for participant: {document.get('participantId', json_file.stem)}")
+            yield document
+
+    columns = build_columns(iter_documents())
+    write_store(columns, store_dir)
+
+    num_trials = len(columns['offsets']) - 1
+    print(f"Stored {num_trials} trials ({int(columns['offsets'][-1])} samples, "
+          f"{len(columns['conditions'])} distinct conditions) in {store_dir}")
+
+
+def main(argv=None, prog=None):
+    """Main function to build a trajectory store from the command line.
+
+    Args:
+        argv (list): Command line arguments, or None to read sys.argv
+        prog (str): Program name shown in the usage message
+    """
+    parser = argparse.ArgumentParser(prog=prog, description='Ingest participant JSON exports into a memory-mapped trajectory store')
+    parser.add_argument('store_dir', help='Directory to write the trajectory store to')
+    parser.add_argument('inputs', nargs='+', help='Participant JSON files or directories containing them')
+
+    args = parser.parse_args(argv)
+    ingest_participant_data(args.inputs, args.store_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+Tunnel Distance Fields for React Steering Experiment
+Rasterizes the signed distance to each tunnel's boundary once per condition so inside/outside
+queries for any number of samples become a single bilinear lookup
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+import numpy as np
+from scipy.ndimage import map_coordinates
+
+from tunnel_geometry import WINDOW_HEIGHT, WINDOW_WIDTH, geometry_key, get_tunnel_geometry
+
+
+DEFAULT_CELL_SIZE = 0.0005  # meters; bilinear lookups are then within 0.36 mm of the exact distance
+TILE_NODES = 16  # Grid nodes along each side of the tiles that share one set of candidate edges
+DISTANCE_FIELD_FORMAT_VERSION = 2
+DISTANCE_FIELD_SUBDIR = "distance_fields"  # Location of persisted fields inside a --cache-dir
+
+_distance_fields = {}
+
+
+def distance_field_error_bound(cell_size):
+    """Worst-case error of a bilinear distance field lookup.
+
+    Distance functions change by at most one meter per meter, so each grid node differs from
+    the exact value at a query point by at most their separation. Bilinear weights average the
+    four surrounding nodes, which puts the worst case at a cell center, half a cell diagonal away.
+
+    Args:
+        cell_size (float): Grid spacing in meters
+
+    Returns:
+        float: Maximum absolute lookup error in meters
+    """
+    return cell_size / np.sqrt(2.0)
+
+
+def distance_field_key(condition, cell_size=DEFAULT_CELL_SIZE):
+    """Compute the cache key of a distance field from the tunnel parameters and grid spacing.
+
+    Args:
+        condition (dict): Trial condition
+        cell_size (float): Grid spacing in meters
+
+    Returns:
+        str: Hex digest identifying the field
+    """
+    identity = f"{DISTANCE_FIELD_FORMAT_VERSION}|{geometry_key(condition)}|{cell_size!r}|{WINDOW_WIDTH}|{WINDOW_HEIGHT}"
+    return hashlib.sha1(identity.encode('utf-8')).hexdigest()
+
+
+def grid_axes(cell_size=DEFAULT_CELL_SIZE):
+    """Grid node coordinates covering the whole canvas.
+
+    Args:
+        cell_size (float): Grid spacing in meters
+
+    Returns:
+        tuple: (xs, ys) node coordinates, both starting at 0 and reaching past the canvas edge
+    """
+    xs = np.arange(int(np.ceil(WINDOW_WIDTH / cell_size)) + 1) * cell_size
+    ys = np.arange(int(np.ceil(WINDOW_HEIGHT / cell_size)) + 1) * cell_size
+    return xs, ys
+
+
+def segment_distances(points, starts, vectors, lengths_sq):
+    """Distance from every point to every segment.
+
+    Args:
+        points (np.ndarray): (N, 2) array of (x, y) positions
+        starts (np.ndarray): (E, 2) segment start points
+        vectors (np.ndarray): (E, 2) segment direction vectors
+        lengths_sq (np.ndarray): (E,) squared segment lengths (all positive)
+
+    Returns:
+        np.ndarray: (N, E) distances
+    """
+    rel_x = points[:, 0, None] - starts[:, 0]
+    rel_y = points[:, 1, None] - starts[:, 1]
+    t = np.clip((rel_x * vectors[:, 0] + rel_y * vectors[:, 1]) / lengths_sq, 0.0, 1.0)
+    return np.hypot(rel_x - t * vectors[:, 0], rel_y - t * vectors[:, 1])
+
+
+def grid_polyline_distances(xs, ys, polyline, tile_size=TILE_NODES):
+    """Exact distance from every grid node to a polyline.
+
+    The grid is split into square tiles. Any node of a tile is at most the tile's half
+    diagonal from its center, so only edges within the center's nearest distance plus a full
+    diagonal can be nearest to one of its nodes; the nodes are compared against those alone.
+
+    Args:
+        xs (np.ndarray): (W,) node x coordinates
+        ys (np.ndarray): (H,) node y coordinates
+        polyline (np.ndarray): (M, 2) vertices; close a ring by repeating its first vertex
+        tile_size (int): Nodes along each side of a tile
+
+    Returns:
+        np.ndarray: (H, W) distances, inf if the polyline has no edge
+    """
+    distances = np.full((len(ys), len(xs)), np.inf)
+    starts = polyline[:-1]
+    vectors = np.diff(polyline, axis=0)
+    lengths_sq = np.einsum('ij,ij->i', vectors, vectors)
+    usable = lengths_sq > 0
+    if not np.any(usable):
+        return distances
+    starts, vectors, lengths_sq = starts[usable], vectors[usable], lengths_sq[usable]
+
+    row_starts = np.arange(0, len(ys), tile_size)
+    column_starts = np.arange(0, len(xs), tile_size)
+    row_ends = np.minimum(row_starts + tile_size, len(ys)) - 1
+    column_ends = np.minimum(column_starts + tile_size, len(xs)) - 1
+    tile_rows, tile_columns = np.meshgrid(np.arange(len(row_starts)), np.arange(len(column_starts)), indexing='ij')
+    tile_rows, tile_columns = tile_rows.ravel(), tile_columns.ravel()
+
+    low = np.column_stack([xs[column_starts[tile_columns]], ys[row_starts[tile_rows]]])
+    high = np.column_stack([xs[column_ends[tile_columns]], ys[row_ends[tile_rows]]])
+    centers = (low + high) / 2
+    half_diagonals = np.hypot(*((high - low) / 2).T)
+    center_distances = segment_distances(centers, starts, vectors, lengths_sq)
+    thresholds = center_distances.min(axis=1) + 2 * half_diagonals
+
+    for tile, (tile_row, tile_column) in enumerate(zip(tile_rows, tile_columns)):
+        candidates = center_distances[tile] <= thresholds[tile]
+        rows = slice(row_starts[tile_row], row_ends[tile_row] + 1)
+        columns = slice(column_starts[tile_column], column_ends[tile_column] + 1)
+        node_x, node_y = np.meshgrid(xs[columns], ys[rows])
+        nodes = np.column_stack([node_x.ravel(), node_y.ravel()])
+        tile_distances = segment_distances(nodes, starts[candidates], vectors[candidates], lengths_sq[candidates])
+        distances[rows, columns] = tile_distances.min(axis=1).reshape(node_x.shape)
+    return distances
+
+
+def grid_in_polygon(xs, ys, rings):
+    """Even-odd inside test of every grid node, one scanline per grid row.
+
+    Gives the same answer as tunnel_geometry.points_in_polygon, but only intersects each row
+    with the polygon edges and counts the crossings left of each node with a binary search.
+
+    Args:
+        xs (np.ndarray): (W,) ascending node x coordinates
+        ys (np.ndarray): (H,) node y coordinates
+        rings (list): (K, 2) vertex arrays; rings after the first act as holes
+
+    Returns:
+        np.ndarray: (H, W) boolean mask of nodes inside the polygon
+    """
+    starts = np.concatenate([ring for ring in rings if len(ring) > 2])
+    ends = np.concatenate([np.roll(ring, -1, axis=0) for ring in rings if len(ring) > 2])
+    crossing_edges = starts[:, 1] != ends[:, 1]
+    x1, y1 = starts[crossing_edges, 0], starts[crossing_edges, 1]
+    x2, y2 = ends[crossing_edges, 0], ends[crossing_edges, 1]
+    slope = (x2 - x1) / (y2 - y1)
+
+    inside = np.zeros((len(ys), len(xs)), dtype=bool)
+    for row, y in enumerate(ys):
+        crosses = (y1 > y) != (y2 > y)
+        if not np.any(crosses):
+            continue
+        crossing_xs = np.sort(x1[crosses] + (y - y1[crosses]) * slope[crosses])
+        # Crossings strictly right of a node, as in the ray casting test
+        inside[row] = (len(crossing_xs) - np.searchsorted(crossing_xs, xs, side='right')) % 2 == 1
+    return inside
+
+
+def compute_distance_field(geometry, cell_size=DEFAULT_CELL_SIZE):
+    """Rasterize the signed distance to the tunnel boundary.
+
+    Args:
+        geometry (dict): Geometry as returned by tunnel_geometry.get_tunnel_geometry
+        cell_size (float): Grid spacing in meters
+
+    Returns:
+        dict: Field with keys signed_distance ((H, W) float32, negative inside the tunnel)
+              and cell_size
+    """
+    xs, ys = grid_axes(cell_size)
+
+    # The tunnel is the union of its polygons, so its signed distance is the minimum of theirs
+    signed_distance = np.full((len(ys), len(xs)), np.inf)
+    for rings in geometry['polygons']:
+        boundary_distance = np.full((len(ys), len(xs)), np.inf)
+        for ring in rings:
+            closed_ring = np.vstack([ring, ring[:1]])
+            np.minimum(boundary_distance, grid_polyline_distances(xs, ys, closed_ring), out=boundary_distance)
+        boundary_distance[grid_in_polygon(xs, ys, rings)] *= -1
+        np.minimum(signed_distance, boundary_distance, out=signed_distance)
+
+    return {
+        'signed_distance': signed_distance.astype(np.float32),
+        'cell_size': float(cell_size),
+    }
+
+
+def load_distance_field(condition, cell_size=DEFAULT_CELL_SIZE, cache_dir=None):
+    """Return the distance field of a condition if it has already been built.
+
+    Never rasterizes a field, so worker processes can use fields the main process built
+    without repeating the work.
+
+    Args:
+        condition (dict): Trial condition
+        cell_size (float): Grid spacing in meters
+        cache_dir (str or Path): Directory of persisted fields, or None for memory only
+
+    Returns:
+        dict: Field as returned by compute_distance_field, or None if it is neither in memory
+              nor on disk
+    """
+    key = distance_field_key(condition, cell_size)
+    if key in _distance_fields:
+        return _distance_fields[key]
+    if not cache_dir:
+        return None
+
+    entry_path = Path(cache_dir) / f"{key}.npz"
+    if not entry_path.exists():
+        return None
+    try:
+        with np.load(entry_path) as entry:
+            field = {name: entry[name] for name in entry.files}
+        field['cell_size'] = float(field['cell_size'])
+    except (OSError, ValueError, KeyError):
+        return None
+    _distance_fields[key] = field
+    return field
+
+
+def get_distance_field(condition, cell_size=DEFAULT_CELL_SIZE, cache_dir=None):
+    """Return the distance field of a condition, computing it at most once.
+
+    Fields are kept in memory for the life of the process and, when cache_dir is given,
+    stored as .npz files so later runs skip the rasterization.
+
+    Args:
+        condition (dict): Trial condition
+        cell_size (float): Grid spacing in meters
+        cache_dir (str or Path): Directory for persisted fields, or None for memory only
+
+    Returns:
+        dict: Field as returned by compute_distance_field
+    """
+    field = load_distance_field(condition, cell_size, cache_dir)
+    if field is not None:
+        return field
+
+    field = compute_distance_field(get_tunnel_geometry(condition), cell_size)
+    if cache_dir:
+        cache_dir = Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        entry_path = cache_dir / f"{distance_field_key(condition, cell_size)}.npz"
+        temp_path = entry_path.with_name(f"{entry_path.stem}.{os.getpid()}.tmp.npz")
+        np.savez(temp_path, **field)
+        os.replace(temp_path, entry_path)
+
+    _distance_fields[distance_field_key(condition, cell_size)] = field
+    return field
+
+
+def sample_distance_field(field, points):
+    """Look up the signed distance field at many points with bilinear interpolation.
+
+    Points off the grid, which covers the whole canvas, are infinitely far outside the tunnel.
+
+    Args:
+        field (dict): Field as returned by get_distance_field
+        points (array-like): (N, 2) array of (x, y) positions
+
+    Returns:
+        np.ndarray: (N,) interpolated signed distances in meters
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    coordinates = np.vstack([points[:, 1], points[:, 0]]) / field['cell_size']  # (row, column)
+    return map_coordinates(field['signed_distance'], coordinates, order=1, mode='constant', cval=np.inf, output=np.float64)
+
+
+def points_in_tunnel_field(field, points):
+    """Test which points lie inside the tunnel using its distance field.
+
+    Args:
+        field (dict): Field as returned by get_distance_field
+        points (array-like): (N, 2) array of (x, y) positions
+
+    Returns:
+        np.ndarray: (N,) boolean mask; only points within distance_field_error_bound of a
+                    wall can disagree with the exact polygon test
+    """
+    return sample_distance_field(field, points) <= 0
@@ -0,0 +1,300 @@
+"""
+Tunnel Excursion Recomputation for React Steering Experiment
+Replays checkTunnelExcursions (src/utils/excursionChecker.js) over whole recorded trajectories at once
+and groups the samples outside the tunnel into excursion intervals
+Example usage:
+python tunnel_excursions.py ./data/participants/ ./results/excursions.csv
+"""
+
+import argparse
+import csv
+from pathlib import Path
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from participant_data import find_json_files, iter_participant_documents
+from trajectory_kinematics import offsets_from_lengths, step_validity
+from trajectory_store import MISSING_ROUND, build_columns, is_trajectory_store, load_store, trajectory_to_array
+from tunnel_geometry import cumulative_arc_length, geometry_key, get_tunnel_geometry
+
+
+# Tunnel types the app checks with checkTunnelExcursions; lasso and cascading menu trials use
+# their own collision checks and unconstrained pointing has no tunnel
+CHECKED_TUNNEL_TYPES = ('curved', 'sequential', 'corner', 'constrained_to_unconstrained')
+
+EXCURSION_FIELDS = ['trial', 'entry_index', 'exit_index', 'num_samples', 'entry_arc_length',
+                    'exit_arc_length', 'max_depth', 'max_depth_index', 'max_depth_arc_length',
+                    'boundary_x', 'boundary_y']
+
+
+def path_normals(path):
+    """Unit normals of a tunnel path from central-difference tangents, as in the app.
+
+    Args:
+        path (np.ndarray): (M, 2) tunnel path
+
+    Returns:
+        np.ndarray: (M, 2) normals (-tangent_y, tangent_x); zero where the tangent is degenerate
+    """
+    tangents = np.empty_like(path)
+    tangents[1:-1] = path[2:] - path[:-2]
+    tangents[0] = path[1] - path[0]
+    tangents[-1] = path[-1] - path[-2]
+    lengths = np.hypot(tangents[:, 0], tangents[:, 1])
+    tangents /= np.where(lengths > 0, lengths, 1.0)[:, None]
+    return np.column_stack([-tangents[:, 1], tangents[:, 0]])
+
+
+def nearest_path_indices(points, path):
+    """Index of the nearest path point to each sample, preferring the first of equally near points.
+
+    Args:
+        points (np.ndarray): (N, 2) sample positions
+        path (np.ndarray): (M, 2) tunnel path
+
+    Returns:
+        np.ndarray: (N,) int64 indices into path
+    """
+    _, nearest = cKDTree(path).query(points)
+
+    # The app keeps the first of several points at the same position (strict < comparison);
+    # generated corners repeat a point up to rounding error
+    repeats = np.zeros(len(path), dtype=bool)
+    repeats[1:] = np.all(np.abs(np.diff(path, axis=0)) <= 1e-9, axis=1)
+    first_of_run = np.where(repeats, 0, np.arange(len(path)))
+    np.maximum.accumulate(first_of_run, out=first_of_run)
+    return first_of_run[nearest].astype(np.int64)
+
+
+def check_tunnel_excursions(points, condition):
+    """Vectorized checkTunnelExcursions for many samples of one tunnel condition.
+
+    Args:
+        points (array-like): (N, 2) sample positions
+        condition (dict): Trial condition
+
+    Returns:
+        dict: Per-sample arrays is_excursion (N,) bool, distance_outside (N,) (perpendicular
+              distance beyond the half width, negative inside), closest_index (N,) index into
+              the app's tunnel path, arc_length (N,) arc length of that path point and
+              boundary_point (N, 2) wall point on the sample's side of the path
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    geometry = get_tunnel_geometry(condition)
+    path = geometry['app_path']
+    num_points = len(points)
+
+    if geometry['tunnel_type'] not in CHECKED_TUNNEL_TYPES or len(path) < 2 or num_points == 0:
+        return {
+            'is_excursion': np.zeros(num_points, dtype=bool),
+            'distance_outside': np.full(num_points, -np.inf),
+            'closest_index': np.full(num_points, -1, dtype=np.int64),
+            'arc_length': np.zeros(num_points),
+            'boundary_point': points.copy(),
+        }
+
+    closest_index = nearest_path_indices(points, path)
+    normals = path_normals(path)[closest_index]
+    offsets = np.einsum('ij,ij->i', points - path[closest_index], normals)
+    perpendicular_distance = np.abs(offsets)
+
+    # Half width at the closest path point
+    if geometry['tunnel_type'] in ('sequential', 'constrained_to_unconstrained'):
+        segment_index = np.floor(closest_index / (len(path) / 2)).astype(np.int64)
+        if geometry['tunnel_type'] == 'sequential':
+            segment_widths = np.array([condition['segment1Width'], condition['segment2Width']], dtype=float)
+            half_widths = segment_widths[np.minimum(segment_index, 1)] / 2
+        else:
+            half_widths = np.where(segment_index == 0, condition['segment1Width'] / 2, np.inf)
+    else:
+        half_widths = np.full(num_points, geometry['tunnel_width'] / 2)
+
+    # Open stretches have no wall; their boundary point stays on the path
+    sides = np.where(offsets >= 0, 1.0, -1.0)
+    wall_offsets = np.where(np.isfinite(half_widths), half_widths, 0.0) * sides
+    boundary_point = path[closest_index] + normals * wall_offsets[:, None]
+    return {
+        'is_excursion': perpendicular_distance > half_widths,
+        'distance_outside': perpendicular_distance - half_widths,
+        'closest_index': closest_index,
+        'arc_length': cumulative_arc_length(path)[closest_index],
+        'boundary_point': boundary_point,
+    }
+
+
+def excursion_intervals(is_excursion, offsets):
+    """Group consecutive out-of-tunnel samples of each trial into intervals.
+
+    Args:
+        is_excursion (np.ndarray): (S,) packed per-sample excursion flags
+        offsets (np.ndarray): Trial offsets into the packed samples
+
+    Returns:
+        tuple: (trials, starts, ends) int64 arrays; interval k covers packed samples
+               starts[k]:ends[k] of trial trials[k]
+    """
+    is_excursion = np.asarray(is_excursion, dtype=bool)
+    offsets = np.asarray(offsets, dtype=np.int64)
+
+    # A run starts where a sample is outside and its predecessor in the same trial is not
+    continues = np.zeros(len(is_excursion), dtype=bool)
+    continues[1:] = is_excursion[:-1] & step_validity(offsets, len(is_excursion))
+    starts = np.flatnonzero(is_excursion & ~continues)
+    stops = np.zeros(len(is_excursion), dtype=bool)
+    stops[:-1] = is_excursion[1:] & step_validity(offsets, len(is_excursion))
+    ends = np.flatnonzero(is_excursion & ~stops) + 1
+
+    trials = np.searchsorted(offsets, starts, side='right') - 1
+    return trials, starts, ends
+
+
+def detect_excursions(xy, offsets, conditions):
+    """Recompute the tunnel excursions of many trials.
+
+    Samples are grouped by tunnel geometry so each distinct tunnel is checked in one pass.
+
+    Args:
+        xy (np.ndarray): (S, 2) packed sample positions
+        offsets (np.ndarray): Trial offsets into xy
+        conditions (list): Condition of each trial
+
+    Returns:
+        dict: Excursion intervals as columns named by EXCURSION_FIELDS: trial index, first
+              and last sample of the interval within the trial, number of samples, arc length
+              of the nearest path point at entry, exit and the deepest sample, maximum distance
+              outside with its sample index, and the boundary point at entry (the position the
+              app marks)
+    """
+    xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    num_samples = len(xy)
+    is_excursion = np.zeros(num_samples, dtype=bool)
+    distance_outside = np.full(num_samples, -np.inf)
+    arc_length = np.zeros(num_samples)
+    boundary_point = np.zeros((num_samples, 2))
+
+    trial_lengths = np.diff(offsets)
+    trial_of_sample = np.repeat(np.arange(len(trial_lengths)), trial_lengths)
+    keys = [geometry_key(condition) for condition in conditions]
+    for key in sorted(set(keys)):
+        trials = np.array([i for i, trial_key in enumerate(keys) if trial_key == key], dtype=np.int64)
+        samples = np.flatnonzero(np.isin(trial_of_sample, trials))
+        result = check_tunnel_excursions(xy[samples], conditions[trials[0]])
+        is_excursion[samples] = result['is_excursion']
+        distance_outside[samples] = result['distance_outside']
+        arc_length[samples] = result['arc_length']
+        boundary_point[samples] = result['boundary_point']
+
+    trials, starts, ends = excursion_intervals(is_excursion, offsets)
+
+    # Deepest sample of every interval
+    interval_of_sample = np.repeat(np.arange(len(starts)), ends - starts)
+    interval_samples = np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)]) \
+        if len(starts) else np.zeros(0, dtype=np.int64)
+    max_depth = np.full(len(starts), -np.inf)
+    np.maximum.at(max_depth, interval_of_sample, distance_outside[interval_samples])
+    is_deepest = distance_outside[interval_samples] == max_depth[interval_of_sample]
+    deepest = np.full(len(starts), -1, dtype=np.int64)
+    # Reverse assignment leaves the first deepest sample of each interval
+    deepest[interval_of_sample[is_deepest][::-1]] = interval_samples[is_deepest][::-1]
+
+    trial_starts = offsets[trials]
+    return {
+        'trial': trials,
+        'entry_index': starts - trial_starts,
+        'exit_index': ends - 1 - trial_starts,
+        'num_samples': ends - starts,
+        'entry_arc_length': arc_length[starts],
+        'exit_arc_length': arc_length[ends - 1],
+        'max_depth': max_depth,
+        'max_depth_index': deepest - trial_starts,
+        'max_depth_arc_length': arc_length[deepest],
+        'boundary_x': boundary_point[starts, 0],
+        'boundary_y': boundary_point[starts, 1],
+    }
+
+
+def trial_excursions(trial):
+    """Recompute the excursions of one trial in the app's excursion event format.
+
+    Args:
+        trial (dict): Trial with condition and trajectory
+
+    Returns:
+        list: One event per excursion interval with position (sample at entry),
+              distanceOutside (maximum depth), boundaryPoint and the interval fields
+    """
+    points = trajectory_to_array(trial.get('trajectory', []))
+    intervals = detect_excursions(points, offsets_from_lengths([len(points)]), [trial.get('condition') or {}])
+    events = []
+    for k in range(len(intervals['trial'])):
+        entry = intervals['entry_index'][k]
+        events.append({
+            'position': {'x': float(points[entry, 0]), 'y': float(points[entry, 1])},
+            'distanceOutside': float(intervals['max_depth'][k]),
+            'boundaryPoint': {'x': float(intervals['boundary_x'][k]), 'y': float(intervals['boundary_y'][k])},
+            'entryIndex': int(entry),
+            'exitIndex': int(intervals['exit_index'][k]),
+            'entryArcLength': float(intervals['entry_arc_length'][k]),
+            'maxDepthIndex': int(intervals['max_depth_index'][k]),
+        })
+    return events
+
+
+def store_excursions(store):
+    """Recompute the tunnel excursions of every trial in a trajectory store.
+
+    Args:
+        store (dict): Store as returned by trajectory_store.load_store or build_columns
+
+    Returns:
+        dict: Excursion intervals as returned by detect_excursions
+    """
+    conditions = [store['conditions'][int(index)] for index in store['condition']]
+    return detect_excursions(store['xy'], store['offsets'], conditions)
+
+
+def write_excursions_csv(store, intervals, output_file):
+    """Write excursion intervals with their trial identifiers to a CSV file.
+
+    Args:
+        store (dict): Store the intervals were computed from
+        intervals (dict): Excursion intervals as returned by store_excursions
+        output_file (str or Path): Path of the CSV file
+    """
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['participant', 'trial_id', 'round'] + EXCURSION_FIELDS[1:])
+        for k, trial in enumerate(intervals['trial']):
+            round_number = int(store['round'][trial])
+            writer.writerow([store['participant'][trial], int(store['trial_id'][trial]),
+                             round_number if round_number != MISSING_ROUND else ''] +
+                            [intervals[field][k].item() for field in EXCURSION_FIELDS[1:]])
+
+
+def main():
+    """Main function to recompute excursions from the command line."""
+    parser = argparse.ArgumentParser(description='Recompute tunnel excursions of recorded trajectories')
+    parser.add_argument('input_dir', help='Directory containing participant JSON data files, or a trajectory store')
+    parser.add_argument('output_file', help='CSV file to write excursion intervals to')
+
+    args = parser.parse_args()
+
+    input_path = Path(args.input_dir)
+    if is_trajectory_store(input_path):
+        store = load_store(input_path)
+    else:
+        store = build_columns(document for document, _ in iter_participant_documents(find_json_files([input_path])))
+
+    intervals = store_excursions(store)
+    write_excursions_csv(store, intervals, args.output_file)
+    num_trials = len(store['offsets']) - 1
+    print(f"{len(intervals['trial'])} excursions in {len(np.unique(intervals['trial']))} of {num_trials} trials")
+    print(f"Excursion intervals saved to {args.output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,738 @@
+"""
+Tunnel Geometry Utilities for React Steering Experiment
+Tunnel path generation, memoized per-condition geometry and vectorized point-to-tunnel
+queries shared by the heatmap and trajectory analysis scripts
+"""
+
+import json
+from functools import lru_cache
+
+import numpy as np
+
+
+# Upper bound on the number of (point, segment) pairs evaluated at once.
+# 2**20 pairs keeps each temporary array at ~8 MB regardless of cohort size.
+MAX_PAIRS_PER_CHUNK = 2 ** 20
+
+# Tunnel layout shared with the experiment app
+TUNNEL_START_X = 0.0
+TUNNEL_END_X = 0.46
+TUNNEL_Y_BASE = 0.13
+TUNNEL_STEP = 0.002
+SEQUENTIAL_TUNNEL_STEP = 0.001  # TUNNEL_STEP in src/constants/experimentConstants.js
+SINE_WAVELENGTH = 0.23
+# Wavelength of the earlier app version. Recorded conditions carry no version field (and the
+# session version is 2.0 either way), so the era is told by the condition itself: the current
+# app stores 'repetitions' in every condition, the earlier one never did. sine_wavelength
+# applies this rule; a condition without 'repetitions' is drawn with the legacy wavelength.
+LEGACY_SINE_WAVELENGTH = 0.15
+
+# Canvas size in meters (CANVAS_WIDTH / SCALE, CANVAS_HEIGHT / SCALE in the app)
+WINDOW_WIDTH = 0.4608
+WINDOW_HEIGHT = 0.2592
+
+# Target y positions of unconstrained pointing trials
+TARGET_POSITION_Y = {'top': 0.05, 'middle': 0.13, 'bottom': 0.21}
+
+# Largest miter factor applied at sharp centerline turns when offsetting boundaries
+MITER_LIMIT = 2.0
+
+# Condition fields that do not affect the tunnel shape
+NON_GEOMETRY_FIELDS = {'description', 'timeLimit', 'repetitions'}
+SHAPED_TUNNEL_TYPES = {'sequential', 'wide_to_narrow', 'narrow_to_wide', 'constrained_to_unconstrained',
+                       'corner', 'lasso', 'cascading_menu', 'unconstrained_pointing'}  # Not drawn as a sine wave
+
+
+def project_points_to_tunnel(points, tunnel_path, tunnel_width, max_pairs=MAX_PAIRS_PER_CHUNK):
+    """Project a batch of points onto a tunnel centerline in one vectorized pass.
+
+    Every point is compared against every centerline segment, processing the
+    points in chunks so that memory stays bounded by ``max_pairs``.
+
+    Args:
+        points (array-like): (N, 2) array of (x, y) positions
+        tunnel_path (array-like): (M, 2) array or list of (x, y) tuples representing tunnel centerline
+        tunnel_width (float or array-like): Width of the tunnel, either a single value or
+            one value per centerline point (e.g. sequential tunnels)
+        max_pairs (int): Maximum number of point/segment pairs evaluated per chunk
+
+    Returns:
+        tuple: (distances, segment_indices, projections, inside) where distances is the
+               distance from each point to the centerline, segment_indices is the index of
+               the nearest centerline segment (-1 if the path has no usable segment),
+               projections is the clamped projection parameter t in [0, 1] along that
+               segment, and inside is a boolean mask of points within the tunnel
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    tunnel_path = np.asarray(tunnel_path, dtype=float).reshape(-1, 2)
+    num_points = len(points)
+
+    distances = np.full(num_points, np.inf)
+    segment_indices = np.full(num_points, -1, dtype=np.int64)
+    projections = np.zeros(num_points)
+
+    if num_points == 0 or len(tunnel_path) < 2:
+        return distances, segment_indices, projections, np.zeros(num_points, dtype=bool)
+
+    starts = tunnel_path[:-1]
+    line_vecs = np.diff(tunnel_path, axis=0)
+    line_len_sq = np.einsum('ij,ij->i', line_vecs, line_vecs)
+
+    # Zero-length segments are skipped, matching the scalar implementation
+    valid = line_len_sq > 0
+    if not np.any(valid):
+        return distances, segment_indices, projections, np.zeros(num_points, dtype=bool)
+    starts = starts[valid]
+    line_vecs = line_vecs[valid]
+    line_len_sq = line_len_sq[valid]
+    valid_indices = np.flatnonzero(valid)
+
+    chunk_size = max(1, max_pairs // len(starts))
+    for chunk_start in range(0, num_points, chunk_size):
+        chunk = points[chunk_start:chunk_start + chunk_size]
+        rows = np.arange(len(chunk))
+
+        # Vectors from every segment start to every point: (chunk, segments)
+        rel_x = chunk[:, 0, None] - starts[None, :, 0]
+        rel_y = chunk[:, 1, None] - starts[None, :, 1]
+
+        # Project onto each segment and clamp to the segment extent
+        t = (rel_x * line_vecs[:, 0] + rel_y * line_vecs[:, 1]) / line_len_sq
+        np.clip(t, 0.0, 1.0, out=t)
+
+        rel_x -= t * line_vecs[:, 0]
+        rel_y -= t * line_vecs[:, 1]
+        dist_sq = rel_x * rel_x + rel_y * rel_y
+
+        nearest = np.argmin(dist_sq, axis=1)
+        chunk_slice = slice(chunk_start, chunk_start + len(chunk))
+        distances[chunk_slice] = np.sqrt(dist_sq[rows, nearest])
+        segment_indices[chunk_slice] = valid_indices[nearest]
+        projections[chunk_slice] = t[rows, nearest]
+
+    # Half width at the nearest segment (per-point widths use the segment start)
+    tunnel_width = np.asarray(tunnel_width, dtype=float)
+    if tunnel_width.ndim == 0:
+        half_widths = tunnel_width / 2.0
+    else:
+        half_widths = tunnel_width[segment_indices] / 2.0
+    inside = distances <= half_widths
+
+    return distances, segment_indices, projections, inside
+
+
+def cumulative_arc_length(tunnel_path):
+    """Compute the arc length of the tunnel centerline at each of its points.
+
+    Args:
+        tunnel_path (array-like): (M, 2) array or list of (x, y) tuples representing tunnel centerline
+
+    Returns:
+        np.ndarray: (M,) arc length from the first centerline point, starting at 0
+    """
+    tunnel_path = np.asarray(tunnel_path, dtype=float).reshape(-1, 2)
+    arc_length = np.zeros(len(tunnel_path))
+    if len(tunnel_path) > 1:
+        np.cumsum(np.hypot(*np.diff(tunnel_path, axis=0).T), out=arc_length[1:])
+    return arc_length
+
+
+def project_points_to_arc_length(points, tunnel_path, tunnel_width, max_pairs=MAX_PAIRS_PER_CHUNK):
+    """Locate a batch of points along the tunnel centerline by arc length.
+
+    Args:
+        points (array-like): (N, 2) array of (x, y) positions
+        tunnel_path (array-like): (M, 2) array or list of (x, y) tuples representing tunnel centerline
+        tunnel_width (float or array-like): Width of the tunnel (see project_points_to_tunnel)
+        max_pairs (int): Maximum number of point/segment pairs evaluated per chunk
+
+    Returns:
+        tuple: (arc_positions, inside) where arc_positions is the arc length of each point's
+               projection onto the centerline (NaN if the path has no usable segment) and
+               inside is a boolean mask of points within the tunnel
+    """
+    tunnel_path = np.asarray(tunnel_path, dtype=float).reshape(-1, 2)
+    _, segment_indices, projections, inside = project_points_to_tunnel(points, tunnel_path, tunnel_width,
+                                                                      max_pairs=max_pairs)
+    arc_positions = np.full(len(segment_indices), np.nan)
+    found = segment_indices >= 0
+    if np.any(found):
+        arc_length = cumulative_arc_length(tunnel_path)
+        segment_lengths = np.diff(arc_length)
+        arc_positions[found] = (arc_length[segment_indices[found]]
+                                + projections[found] * segment_lengths[segment_indices[found]])
+    return arc_positions, inside
+
+
+def _inclusive_range(start, stop, step):
+    """Values start, start + step, ... up to and including stop (within rounding), like a JS for loop."""
+    if (stop - start) * step < 0:
+        return np.empty(0)
+    count = int(np.floor((stop - start) / step + 1e-9)) + 1
+    return start + step * np.arange(count)
+
+
+def generate_tunnel_path(curvature, tunnel_step=TUNNEL_STEP, wavelength=SINE_WAVELENGTH):
+    """Generate tunnel path based on curvature parameter.
+    
+    Port of generateTunnelPath in src/utils/tunnelGenerator.js.
+    
+    Args:
+        curvature (float): Curvature parameter (amplitude of sine wave)
+        tunnel_step (float): Step size for generating path points
+        wavelength (float): Wavelength of the sine wave
+        
+    Returns:
+        np.ndarray: (M, 2) array of (x, y) positions representing tunnel centerline
+    """
+    xs = np.arange(TUNNEL_START_X, TUNNEL_END_X, tunnel_step)
+    ys = TUNNEL_Y_BASE + curvature * np.sin(2 * np.pi * xs / wavelength)
+    return np.column_stack([xs, ys])
+
+
+def sine_wavelength(condition):
+    """Wavelength of the sine tunnel a condition was recorded with.
+    
+    Conditions from the earlier app version carry no 'repetitions' field and were drawn with
+    a shorter wavelength than the current generator default.
+    
+    Args:
+        condition (dict): Trial condition
+        
+    Returns:
+        float: Wavelength in meters
+    """
+    if 'repetitions' in (condition or {}):
+        return SINE_WAVELENGTH
+    return LEGACY_SINE_WAVELENGTH
+
+
+def generate_sequential_tunnel_path(condition, tunnel_step=SEQUENTIAL_TUNNEL_STEP):
+    """Generate sequential tunnel path with 2 segments.
+    
+    Port of generateSequentialTunnelPath in src/utils/tunnelGenerator.js.
+    
+    Args:
+        condition (dict): Trial condition with segment parameters
+        tunnel_step (float): Step size for generating path points
+        
+    Returns:
+        tuple: (path, segment_widths) where path is an (M, 2) array of (x, y) positions and 
+               segment_widths is an (M,) array with the tunnel width at each point
+               (NaN where the tunnel is unconstrained)
+    """
+    segment_length = (TUNNEL_END_X - TUNNEL_START_X) / 2  # 2 segments instead of 3
+    
+    xs = np.arange(TUNNEL_START_X, TUNNEL_END_X, tunnel_step)
+    ys = np.full(len(xs), TUNNEL_Y_BASE)  # Default horizontal line
+    in_first_segment = xs < TUNNEL_START_X + segment_length
+    
+    # Apply curvature for straight-to-curved segments: the second segment is a single peak
+    if condition.get('segmentType') == 'curvature':
+        amplitude = condition.get('segment2Curvature') or 0
+        normalized_x = (xs[~in_first_segment] - (TUNNEL_START_X + segment_length)) / segment_length  # 0 to 1
+        ys[~in_first_segment] = TUNNEL_Y_BASE + amplitude * (1 - (2 * normalized_x - 1) ** 2)
+    
+    second_width = condition.get('segment2Width')
+    segment_widths = np.where(in_first_segment, condition['segment1Width'],
+                              np.nan if second_width is None else second_width)
+    return np.column_stack([xs, ys]), segment_widths.astype(float)
+
+
+def generate_corner_path(tunnel_width, start_x=TUNNEL_START_X, end_x=TUNNEL_END_X, y_base=TUNNEL_Y_BASE,
+                         num_corners=3, corner_offset=0.05, step_size=TUNNEL_STEP):
+    """Generate a tunnel path with 90-degree corners.
+    
+    Port of generateCornerPath in src/utils/tunnelGenerator.js: horizontal runs of equal
+    length alternate with vertical runs of corner_offset, first up then down.
+    
+    Args:
+        tunnel_width (float): Tunnel width (consistent throughout)
+        start_x (float): Starting x-coordinate of tunnel
+        end_x (float): Ending x-coordinate of tunnel
+        y_base (float): Base y-coordinate for tunnel centerline
+        num_corners (int): Number of 90-degree corners
+        corner_offset (float): Vertical offset for each corner segment
+        step_size (float): Step size along path segments
+        
+    Returns:
+        tuple: (path, tunnel_width) where path is an (M, 2) array of (x, y) positions
+    """
+    xs = []
+    ys = []
+    horizontal_length = (end_x - start_x) / (num_corners + 1)
+    current_x = start_x
+    current_y = y_base
+    
+    def finish_horizontal(x_end):
+        # Ensure exact endpoint
+        if xs and abs(xs[-1] - x_end) <= 1e-6:
+            xs[-1] = x_end
+        else:
+            xs.append(x_end)
+            ys.append(current_y)
+    
+    for corner_idx in range(num_corners):
+        # Horizontal segment before corner
+        x_end = current_x + horizontal_length
+        run = np.arange(current_x, x_end + step_size * 0.5, step_size)
+        run = run[run <= x_end]
+        xs.extend(run)
+        ys.extend([current_y] * len(run))
+        finish_horizontal(x_end)
+        current_x = x_end
+        
+        # Vertical segment (corner) of exactly corner_offset length
+        direction = 1.0 if corner_idx % 2 == 0 else -1.0
+        y_end = current_y + direction * corner_offset
+        run = np.arange(current_y + direction * step_size, y_end + direction * step_size * 0.5,
+                        direction * step_size)
+        xs.extend([current_x] * len(run))
+        ys.extend(run)
+        if not ys or abs(ys[-1] - y_end) > step_size * 0.5:
+            xs.append(current_x)
+            ys.append(y_end)
+        current_y = y_end
+    
+    # Final horizontal segment, clipped to end at end_x
+    final_x_end = min(current_x + horizontal_length, end_x)
+    run = np.arange(current_x + step_size, final_x_end + step_size * 0.5, step_size)
+    run = run[run <= final_x_end]
+    xs.extend(run)
+    ys.extend([current_y] * len(run))
+    finish_horizontal(end_x)
+    
+    return np.column_stack([xs, ys]).astype(float), tunnel_width
+
+
+def parse_grid_layout(grid_layout):
+    """Parse a lasso grid layout into cell rows.
+    
+    Args:
+        grid_layout (list): Rows of space-separated cells ('X' for targets, '.' for distractors)
+        
+    Returns:
+        list: Rows as lists of cell strings
+    """
+    return [row.split() for row in grid_layout]
+
+
+def generate_lasso_path(condition, step_size=TUNNEL_STEP):
+    """Generate a lasso selection path that loops around the target squares of a grid.
+    
+    Port of generateLassoPath in src/utils/tunnelGenerator.js: a clockwise loop around
+    the bounding box of all 'X' cells, expanded by the icon radius and the margin.
+    
+    Args:
+        condition (dict): Trial condition with grid_layout, icon_radius, icon_spacing,
+            grid_origin and optional margin_size
+        step_size (float): Step size along path
+        
+    Returns:
+        tuple: (path, width, start_pos, end_pos) where path is an (M, 2) array, width is the
+               effective tunnel width (margin) and start_pos/end_pos are (x, y) tuples
+    """
+    icon_radius = condition.get('icon_radius', 0.01)
+    icon_spacing = condition.get('icon_spacing', 0.05)
+    grid_origin = condition.get('grid_origin', [0.1, 0.1])
+    margin_size = condition.get('margin_size')
+    margin = margin_size if margin_size is not None else icon_spacing - 2 * icon_radius
+    
+    targets = [(grid_origin[0] + col * icon_spacing, grid_origin[1] + row * icon_spacing)
+               for row, cells in enumerate(parse_grid_layout(condition.get('grid_layout', [])))
+               for col, cell in enumerate(cells) if cell == 'X']
+    
+    if not targets:
+        # Fallback: a simple square path
+        size = 0.1
+        x0, y0 = grid_origin
+        path = np.array([(x0, y0), (x0 + size, y0), (x0 + size, y0 + size), (x0, y0 + size), (x0, y0)], dtype=float)
+        return path, margin, tuple(path[0]), tuple(path[-1])
+    
+    targets = np.array(targets)
+    
+    # Start/end positions from the gap corner above-left of the top-left target
+    topmost_y = targets[:, 1].min()
+    leftmost_x = targets[np.abs(targets[:, 1] - topmost_y) < 1e-6, 0].min()
+    gap_offset = icon_spacing * 0.5
+    corner_x = leftmost_x - gap_offset
+    corner_y = topmost_y - gap_offset
+    start_pos = (corner_x - margin, corner_y)
+    end_pos = (corner_x, corner_y + gap_offset * 0.5)
+    
+    # Bounding box of targets with margin
+    min_x = targets[:, 0].min() - icon_radius - margin
+    max_x = targets[:, 0].max() + icon_radius + margin
+    min_y = targets[:, 1].min() - icon_radius - margin
+    max_y = targets[:, 1].max() + icon_radius + margin
+    
+    # Clockwise loop: top edge, right edge, bottom edge, left edge, back to the start
+    top = _inclusive_range(min_x + step_size, max_x, step_size)
+    right = _inclusive_range(min_y + step_size, max_y, step_size)
+    bottom = _inclusive_range(max_x - step_size, min_x, -step_size)
+    left = _inclusive_range(max_y - step_size, min_y, -step_size)
+    xs = np.concatenate([[min_x], top, np.full(len(right), max_x), bottom, np.full(len(left), min_x), [min_x]])
+    ys = np.concatenate([[min_y], np.full(len(top), min_y), right, np.full(len(bottom), max_y), left, [min_y]])
+    
+    return np.column_stack([xs, ys]), margin, start_pos, end_pos
+
+
+def generate_cascading_menu_path(condition, step_size=TUNNEL_STEP):
+    """Generate a cascading menu path for the menu navigation task.
+    
+    Port of generateCascadingMenuPath in src/utils/tunnelGenerator.js: down the main menu
+    to the target item, then straight to the target submenu item.
+    
+    Args:
+        condition (dict): Trial condition with mainMenuSize, subMenuSize, targetMainMenuIndex,
+            targetSubMenuIndex and optional mainMenuWindowSize, subMenuWindowSize, mainMenuOrigin
+        step_size (float): Step size along path
+        
+    Returns:
+        tuple: (path, width, start_pos, end_pos) where path is an (M, 2) array, width is the
+               effective tunnel width and start_pos/end_pos are (x, y) tuples
+    """
+    main_menu_x, main_menu_y = condition.get('mainMenuOrigin', [0.1, 0.1])
+    main_menu_width, main_menu_height = condition.get('mainMenuWindowSize', [0.08, 0.15])
+    sub_menu_width, sub_menu_height = condition.get('subMenuWindowSize', [0.08, 0.12])
+    target_main_index = condition['targetMainMenuIndex']
+    target_sub_index = condition['targetSubMenuIndex']
+    
+    # Item dimensions from window size (no gaps)
+    main_item_height = main_menu_height / condition['mainMenuSize']
+    sub_item_height = sub_menu_height / condition['subMenuSize']
+    
+    # Main menu items are stacked vertically; the submenu opens to the right of the
+    # main menu, aligned with the target item
+    main_item_x = main_menu_x + main_menu_width / 2
+    target_item_top = main_menu_y + target_main_index * main_item_height
+    start_pos = (main_item_x, main_menu_y + main_item_height / 2)
+    target_main_pos = (main_item_x, target_item_top + main_item_height / 2)
+    end_pos = (main_menu_x + main_menu_width + sub_menu_width / 2,
+               target_item_top + target_sub_index * sub_item_height + sub_item_height / 2)
+    
+    def interpolate(start, end, include_start):
+        steps = int(np.ceil(np.hypot(end[0] - start[0], end[1] - start[1]) / step_size))
+        if steps == 0:
+            t = np.zeros(1 if include_start else 0)
+        else:
+            t = np.arange(0 if include_start else 1, steps + 1) / steps
+        return np.column_stack([start[0] + (end[0] - start[0]) * t, start[1] + (end[1] - start[1]) * t])
+    
+    path = np.concatenate([interpolate(start_pos, target_main_pos, True),
+                           interpolate(target_main_pos, end_pos, False)])
+    
+    # Effective tunnel width: 30% of the smaller item height
+    width = min(main_item_height, sub_item_height) * 0.3
+    return path, width, start_pos, end_pos
+
+
+def _trim_inner_loops(boundary, centerline, half_widths):
+    """Collapse the loops an offset wall forms on the inside of turns tighter than the tunnel.
+    
+    Wall vertices closer to the centerline than their half width lie inside the tunnel; each
+    is replaced by the previous valid vertex so the wall keeps one vertex per centerline point.
+    """
+    distances = project_points_to_tunnel(boundary, centerline, 0.0)[0]
+    keep = distances >= half_widths * (1 - 1e-6)
+    if keep.all() or not keep.any():
+        return boundary
+    source = np.where(keep, np.arange(len(boundary)), 0)
+    np.maximum.accumulate(source, out=source)
+    source[:np.argmax(keep)] = np.argmax(keep)  # Leading run takes the first valid vertex
+    return boundary[source]
+
+
+def boundary_offsets(centerline, widths, closed=False):
+    """Offset a centerline to both tunnel walls.
+    
+    Each vertex moves along the bisector of the normals of its two adjacent segments, lengthened
+    by the miter factor so that walls stay parallel to every segment and 90-degree corners come
+    out square regardless of how unevenly the centerline is sampled.
+    
+    Args:
+        centerline (np.ndarray): (M, 2) centerline without repeated consecutive points
+        widths (np.ndarray): (M,) tunnel width at each centerline point
+        closed (bool): Whether the centerline is a closed loop (last point equals the first)
+        
+    Returns:
+        tuple: (upper_boundary, lower_boundary) (M, 2) arrays on the left and right of the
+               direction of travel
+    """
+    if len(centerline) < 2:
+        return centerline.copy(), centerline.copy()
+    
+    def unit_normals(directions):
+        lengths = np.hypot(directions[:, 0], directions[:, 1])
+        directions = directions / np.where(lengths > 0, lengths, 1.0)[:, None]
+        return np.column_stack([-directions[:, 1], directions[:, 0]])
+    
+    if closed:
+        ring = centerline[:-1]
+        outgoing = unit_normals(np.roll(ring, -1, axis=0) - ring)
+        incoming = np.roll(outgoing, 1, axis=0)
+    else:
+        ring = centerline
+        segment_normals = unit_normals(np.diff(ring, axis=0))
+        incoming = np.vstack([segment_normals[:1], segment_normals])
+        outgoing = np.vstack([segment_normals, segment_normals[-1:]])
+    
+    bisectors = incoming + outgoing
+    lengths = np.hypot(bisectors[:, 0], bisectors[:, 1])
+    bisectors = np.where(lengths[:, None] > 1e-12, bisectors / np.where(lengths > 1e-12, lengths, 1.0)[:, None],
+                         outgoing)
+    # Miter: 1 / cos(half the turn angle) keeps the wall at half the width from both segments
+    cos_half_turn = np.einsum('ij,ij->i', bisectors, outgoing)
+    miter = 1.0 / np.clip(cos_half_turn, 1.0 / MITER_LIMIT, 1.0)
+    
+    half_widths = np.asarray(widths, dtype=float)[:len(ring)] / 2.0
+    offsets = bisectors * (half_widths * miter)[:, None]
+    upper_boundary = _trim_inner_loops(ring + offsets, centerline, half_widths)
+    lower_boundary = _trim_inner_loops(ring - offsets, centerline, half_widths)
+    if closed:
+        upper_boundary = np.vstack([upper_boundary, upper_boundary[:1]])
+        lower_boundary = np.vstack([lower_boundary, lower_boundary[:1]])
+    return upper_boundary, lower_boundary
+
+
+def points_in_polygon(points, rings, max_pairs=MAX_PAIRS_PER_CHUNK):
+    """Even-odd ray casting test of many points against a polygon in one vectorized pass.
+    
+    Args:
+        points (array-like): (N, 2) array of (x, y) positions
+        rings (list): (K, 2) vertex arrays; rings after the first act as holes
+        max_pairs (int): Maximum number of point/edge pairs evaluated per chunk
+        
+    Returns:
+        np.ndarray: (N,) boolean mask of points inside the polygon
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    starts = np.concatenate([ring for ring in rings if len(ring) > 2])
+    ends = np.concatenate([np.roll(ring, -1, axis=0) for ring in rings if len(ring) > 2])
+    
+    # Horizontal edges never cross a horizontal ray
+    crossing_edges = starts[:, 1] != ends[:, 1]
+    x1, y1 = starts[crossing_edges, 0], starts[crossing_edges, 1]
+    x2, y2 = ends[crossing_edges, 0], ends[crossing_edges, 1]
+    slope = (x2 - x1) / (y2 - y1)
+    
+    inside = np.zeros(len(points), dtype=bool)
+    chunk_size = max(1, max_pairs // max(len(x1), 1))
+    for chunk_start in range(0, len(points), chunk_size):
+        chunk = points[chunk_start:chunk_start + chunk_size]
+        px = chunk[:, 0, None]
+        py = chunk[:, 1, None]
+        crosses = ((y1 > py) != (y2 > py)) & (px < x1 + (py - y1) * slope)
+        inside[chunk_start:chunk_start + len(chunk)] = np.count_nonzero(crosses, axis=1) % 2 == 1
+    return inside
+
+
+def points_in_tunnel(geometry, points):
+    """Test which points lie inside a tunnel using its precomputed boundary polygons.
+    
+    Args:
+        geometry (dict): Geometry as returned by get_tunnel_geometry
+        points (array-like): (N, 2) array of (x, y) positions
+        
+    Returns:
+        np.ndarray: (N,) boolean mask of points inside the tunnel
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    x_min, y_min, x_max, y_max = geometry['bbox']
+    inside = np.zeros(len(points), dtype=bool)
+    
+    # Only points inside the bounding box need the polygon test
+    candidates = np.flatnonzero((points[:, 0] >= x_min) & (points[:, 0] <= x_max) &
+                                (points[:, 1] >= y_min) & (points[:, 1] <= y_max))
+    for rings in geometry['polygons']:
+        remaining = candidates[~inside[candidates]]
+        if len(remaining) == 0:
+            break
+        inside[remaining] = points_in_polygon(points[remaining], rings)
+    return inside
+
+
+def draw_tunnel_geometry(ax, geometry, color='black', linestyle='-', linewidth=2, fill_color='lightgray',
+                         fill_alpha=0.3, label="Tunnel Boundary"):
+    """Draw the walls of a tunnel and shade its interior polygons.
+    
+    Args:
+        ax (matplotlib.axes.Axes): Axes to draw on
+        geometry (dict): Geometry as returned by get_tunnel_geometry
+        color (str): Wall line color
+        linestyle (str): Wall line style
+        linewidth (float): Wall line width
+        fill_color (str): Interior fill color, or None to leave the interior unfilled
+        fill_alpha (float): Interior fill opacity
+        label (str): Legend label of the walls
+    """
+    from matplotlib.patches import PathPatch
+    from matplotlib.path import Path as DrawingPath
+    
+    if len(geometry['upper_boundary']) > 1:
+        for boundary, boundary_label in ((geometry['upper_boundary'], label), (geometry['lower_boundary'], None)):
+            ax.plot(boundary[:, 0], boundary[:, 1], color=color, linestyle=linestyle, linewidth=linewidth,
+                    label=boundary_label)
+    
+    # Unconstrained tunnels have no interior worth shading
+    if fill_color is None or geometry['tunnel_type'] == 'unconstrained_pointing':
+        return
+    corridors = geometry['polygons'][:1] if geometry['tunnel_type'] == 'constrained_to_unconstrained' else geometry['polygons']
+    for rings in corridors:
+        vertices = np.concatenate([np.vstack([ring, ring[:1]]) for ring in rings])
+        codes = np.concatenate([[DrawingPath.MOVETO] + [DrawingPath.LINETO] * (len(ring) - 1) + [DrawingPath.CLOSEPOLY]
+                                for ring in rings])
+        ax.add_patch(PathPatch(DrawingPath(vertices, codes), facecolor=fill_color, edgecolor='none', alpha=fill_alpha))
+
+
+def geometry_key(condition):
+    """Normalize a trial condition to the fields that determine its tunnel.
+    
+    Args:
+        condition (dict): Trial condition
+        
+    Returns:
+        str: Canonical JSON key shared by all conditions with the same geometry
+    """
+    shape_fields = {key: value for key, value in (condition or {}).items() if key not in NON_GEOMETRY_FIELDS}
+    if shape_fields.get('tunnelType') not in SHAPED_TUNNEL_TYPES:
+        shape_fields['sineWavelength'] = sine_wavelength(condition)
+    return json.dumps(shape_fields, sort_keys=True)
+
+
+def _read_only(array):
+    array = np.ascontiguousarray(array, dtype=float)
+    array.setflags(write=False)
+    return array
+
+
+def _drop_repeated_points(centerline, widths):
+    if len(centerline) < 2:
+        return centerline, widths
+    keep = np.ones(len(centerline), dtype=bool)
+    keep[1:] = np.any(np.abs(np.diff(centerline, axis=0)) > 1e-9, axis=1)
+    return centerline[keep], widths[keep]
+
+
+@lru_cache(maxsize=None)
+def _build_tunnel_geometry(key):
+    condition = json.loads(key)
+    tunnel_type = condition.get('tunnelType')
+    segment_widths = None
+    start = target = None
+    unconstrained_from_x = None
+    
+    if tunnel_type in ('sequential', 'wide_to_narrow', 'narrow_to_wide', 'constrained_to_unconstrained'):
+        centerline, widths = generate_sequential_tunnel_path(condition)
+        if tunnel_type == 'constrained_to_unconstrained':
+            # First half is a corridor; the second half is open canvas
+            unconstrained_from_x = (TUNNEL_START_X + TUNNEL_END_X) / 2
+            tunnel_width = float(condition['segment1Width'])
+            target = (condition.get('distance', TUNNEL_END_X),
+                      TARGET_POSITION_Y.get(condition.get('targetPosition'), TUNNEL_Y_BASE))
+        else:
+            tunnel_type = 'sequential'
+            segment_widths = widths
+            tunnel_width = float(np.mean(widths))  # Average width for single-width consumers
+    elif tunnel_type == 'corner':
+        centerline, tunnel_width = generate_corner_path(condition.get('tunnelWidth', 0.015),
+                                                        num_corners=condition.get('numCorners') or 3,
+                                                        corner_offset=condition.get('cornerOffset') or 0.05)
+        widths = np.full(len(centerline), tunnel_width, dtype=float)
+    elif tunnel_type == 'lasso':
+        centerline, tunnel_width, start, target = generate_lasso_path(condition)
+        widths = np.full(len(centerline), tunnel_width, dtype=float)
+    elif tunnel_type == 'cascading_menu':
+        centerline, tunnel_width, start, target = generate_cascading_menu_path(condition)
+        widths = np.full(len(centerline), tunnel_width, dtype=float)
+    elif tunnel_type == 'unconstrained_pointing':
+        centerline = np.empty((0, 2))
+        widths = np.empty(0)
+        tunnel_width = 0.0
+        start = (0.0, TARGET_POSITION_Y['middle'])
+        target = (condition.get('distance', TUNNEL_END_X),
+                  TARGET_POSITION_Y.get(condition.get('targetPosition'), TUNNEL_Y_BASE))
+    else:
+        # straight, gentle/sharp sinusoidal and legacy conditions without a tunnel type
+        tunnel_type = 'curved'
+        tunnel_width = condition.get('tunnelWidth', 0.015)
+        centerline = generate_tunnel_path(condition.get('curvature', 0.01) or 0,
+                                          wavelength=condition['sineWavelength'])
+        widths = np.full(len(centerline), tunnel_width, dtype=float)
+    
+    app_path = np.asarray(centerline, dtype=float).reshape(-1, 2)
+    centerline, widths = _drop_repeated_points(app_path, widths)
+    if segment_widths is not None:
+        segment_widths = widths
+    closed = len(centerline) > 2 and np.allclose(centerline[0], centerline[-1])
+    
+    # Boundary polygons: the corridor band (a ring with a hole for closed loops), plus the
+    # open canvas area of partially unconstrained tunnels
+    polygons = []
+    if unconstrained_from_x is not None:
+        corridor = centerline[:, 0] < unconstrained_from_x
+        upper_boundary, lower_boundary = boundary_offsets(centerline[corridor], widths[corridor])
+        polygons.append([np.vstack([upper_boundary, lower_boundary[::-1]])])
+        polygons.append([np.array([(unconstrained_from_x, 0.0), (WINDOW_WIDTH, 0.0),
+                                   (WINDOW_WIDTH, WINDOW_HEIGHT), (unconstrained_from_x, WINDOW_HEIGHT)])])
+    elif len(centerline) == 0:
+        upper_boundary = lower_boundary = centerline
+        polygons.append([np.array([(0.0, 0.0), (WINDOW_WIDTH, 0.0), (WINDOW_WIDTH, WINDOW_HEIGHT), (0.0, WINDOW_HEIGHT)])])
+    else:
+        upper_boundary, lower_boundary = boundary_offsets(centerline, widths, closed)
+        if closed:
+            # Inner ring reversed so it is a hole under both even-odd and nonzero fill rules
+            polygons.append([upper_boundary[:-1], lower_boundary[-2::-1]])
+        else:
+            polygons.append([np.vstack([upper_boundary, lower_boundary[::-1]])])
+    
+    all_vertices = np.concatenate([ring for rings in polygons for ring in rings])
+    bbox = (*all_vertices.min(axis=0), *all_vertices.max(axis=0))
+    
+    if start is None:
+        start = centerline[0]
+    if target is None:
+        target = centerline[-1]
+    
+    return {
+        'key': key,
+        'tunnel_type': tunnel_type,
+        'centerline': _read_only(centerline),
+        'app_path': _read_only(app_path),
+        'widths': _read_only(widths),
+        'segment_widths': None if segment_widths is None else _read_only(segment_widths),
+        'tunnel_width': tunnel_width,
+        'closed': closed,
+        'arc_length': _read_only(cumulative_arc_length(centerline)),
+        'upper_boundary': _read_only(upper_boundary),
+        'lower_boundary': _read_only(lower_boundary),
+        'polygons': [[_read_only(ring) for ring in rings] for rings in polygons],
+        'bbox': tuple(float(value) for value in bbox),
+        'start': _read_only(start),
+        'target': _read_only(target),
+    }
+
+
+def get_tunnel_geometry(condition):
+    """Return the tunnel geometry of a trial condition, building it once per distinct tunnel.
+    
+    Covers every tunnel type of the experiment app (straight, gentle/sharp sinusoidal,
+    wide_to_narrow, narrow_to_wide, sequential, corner, lasso, cascading_menu,
+    unconstrained_pointing and constrained_to_unconstrained). The arrays are shared
+    between all callers and are read-only.
+    
+    Args:
+        condition (dict): Trial condition
+        
+    Returns:
+        dict: Geometry with keys key (geometry_key of the condition), tunnel_type ('curved',
+              'sequential', 'corner', 'lasso', 'cascading_menu', 'unconstrained_pointing' or
+              'constrained_to_unconstrained'), centerline (M, 2), app_path (the generator output
+              exactly as the app holds it, including repeated points), widths (M,) width at each
+              centerline point, segment_widths (per-point widths for sequential tunnels, else
+              None), tunnel_width (single representative width), closed (loop paths),
+              arc_length (M,), upper_boundary and lower_boundary (M, 2) wall polylines, polygons
+              (list of polygons, each a list of rings whose later rings are holes), bbox (x_min,
+              y_min, x_max, y_max) of the polygons, start and target (2,)
+    """
+    return _build_tunnel_geometry(geometry_key(condition))